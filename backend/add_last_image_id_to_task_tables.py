@@ -0,0 +1,77 @@
+"""
+为打标任务表和数据清洗任务表添加last_image_id字段（按图片ID顺序处理的断点，用于续跑）
+"""
+import pymysql
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 需要添加字段的表及字段位置
+TABLES = [
+    ('tagging_tasks', 'processed_count'),
+    ('data_cleaning_tasks', 'total_count')
+]
+
+def get_db_config():
+    """从环境变量读取数据库配置"""
+    return {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'port': int(os.getenv('MYSQL_PORT', 3306)),
+        'user': os.getenv('MYSQL_USER', 'root'),
+        'password': os.getenv('MYSQL_PASSWORD', ''),
+        'database': os.getenv('MYSQL_DATABASE', 'photo_platform')
+    }
+
+def add_column():
+    """添加last_image_id字段"""
+    db_config = get_db_config()
+    
+    connection = None
+    try:
+        connection = pymysql.connect(
+            host=db_config.get('host', 'localhost'),
+            port=db_config.get('port', 3306),
+            user=db_config.get('user', 'root'),
+            password=db_config.get('password', ''),
+            database=db_config.get('database', 'photo_platform'),
+            charset='utf8mb4'
+        )
+        
+        cursor = connection.cursor()
+        
+        for table_name, after_column in TABLES:
+            # 检查字段是否已存在
+            cursor.execute("""
+                SELECT COUNT(*) 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = %s 
+                AND TABLE_NAME = %s 
+                AND COLUMN_NAME = 'last_image_id'
+            """, (db_config.get('database', 'photo_platform'), table_name))
+            
+            exists = cursor.fetchone()[0] > 0
+            
+            if exists:
+                print(f"{table_name}: 字段 last_image_id 已存在，跳过添加")
+            else:
+                cursor.execute(f"""
+                    ALTER TABLE `{table_name}` 
+                    ADD COLUMN `last_image_id` INT NULL COMMENT '断点：最后处理完成的图片ID（按ID顺序处理，续跑时从该ID之后继续）' 
+                    AFTER `{after_column}`
+                """)
+                connection.commit()
+                print(f"{table_name}: 成功添加 last_image_id 字段")
+        
+    except Exception as e:
+        print(f"添加字段失败: {e}")
+        import traceback
+        traceback.print_exc()
+        if connection:
+            connection.rollback()
+    finally:
+        if connection:
+            connection.close()
+
+if __name__ == '__main__':
+    add_column()
@@ -260,6 +260,7 @@ def reset_task(task_id):
         task.status = 'pending'
         task.processed_count = 0
         task.total_count = 0
+        task.last_image_id = None
         task.last_error = None
         task.started_at = None
         task.finished_at = None
@@ -4,7 +4,7 @@ from werkzeug.utils import secure_filename
 import os
 import tempfile
 import traceback
-from app.services.image_analysis_service import ImageAnalysisService
+from app.services.image_analysis_service import ImageAnalysisService, detector_registry
 
 bp = Blueprint('image_cleaning_test', __name__)
 
@@ -141,3 +141,28 @@ def analyze_image():
         current_app.logger.error(f"图片分析失败: {error_detail}")
         return jsonify({'code': 500, 'message': str(e), 'detail': error_detail}), 500
 
+@bp.route('/detectors', methods=['GET'])
+def get_detectors():
+    """获取检测模型的加载状态"""
+    try:
+        return jsonify({'code': 200, 'message': 'success', 'data': detector_registry.health()})
+    except Exception as e:
+        error_detail = traceback.format_exc()
+        current_app.logger.error(f"获取检测模型状态失败: {error_detail}")
+        return jsonify({'code': 500, 'message': str(e), 'detail': error_detail}), 500
+
+@bp.route('/detectors/warmup', methods=['POST'])
+def warmup_detectors():
+    """预热检测模型（默认全部，可通过names指定）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        names = data.get('names')
+        if names is not None:
+            unknown = [name for name in names if name not in detector_registry.health()]
+            if unknown:
+                return jsonify({'code': 400, 'message': f"未知的检测模型: {', '.join(unknown)}"}), 400
+        return jsonify({'code': 200, 'message': '预热完成', 'data': detector_registry.warm_up(names)})
+    except Exception as e:
+        error_detail = traceback.format_exc()
+        current_app.logger.error(f"预热检测模型失败: {error_detail}")
+        return jsonify({'code': 500, 'message': str(e), 'detail': error_detail}), 500
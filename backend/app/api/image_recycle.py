@@ -4,6 +4,9 @@ from flask import Blueprint, request, jsonify, send_file, current_app
 from app.database import db
 from app.models.image_recycle import ImageRecycle
 from app.models.image import Image
+from app.services.image_recycle_service import (
+    RESTORE_CHUNK_SIZE, RESTORE_MAX_CHUNK_SIZE, build_recycle_query, count_restorable, restore_recycled_images
+)
 from app.utils.config_manager import get_local_image_dir
 import os
 import traceback
@@ -227,118 +230,71 @@ def restore_image(image_id):
 
 @bp.route('/batch/restore', methods=['POST'])
 def batch_restore_images():
-    """批量还原图片到images表"""
+    """
+    批量还原图片到images表
+    
+    按回收站记录ID（ids）或筛选条件（cleaning_reason、cleaning_task_id、keyword，all=true表示全部）选择记录，
+    每批记录用一个事务按集合还原；dry_run=true 时只返回统计。
+    记录很多时可传 max_chunks 分多次请求，每次用返回的 cursor 作为下一次的 after_id
+    """
     try:
-        data = request.get_json()
-        image_ids = data.get('ids', [])
+        data = request.get_json() or {}
+        image_ids = data.get('ids')
+        cleaning_reason = data.get('cleaning_reason')
+        cleaning_task_id = data.get('cleaning_task_id')
+        keyword = data.get('keyword')
         
-        if not image_ids:
+        if not image_ids and not (cleaning_reason or cleaning_task_id or keyword or data.get('all')):
             return jsonify({'code': 400, 'message': '请选择要还原的图片'}), 400
         
-        recycle_images = ImageRecycle.query.filter(ImageRecycle.id.in_(image_ids)).all()
+        if isinstance(cleaning_reason, str):
+            cleaning_reason = [cleaning_reason]
+        query = build_recycle_query(
+            ids=image_ids or None,
+            cleaning_reasons=cleaning_reason,
+            cleaning_task_id=cleaning_task_id,
+            keyword=keyword
+        )
+        after_id = data.get('after_id')
+        chunk_size = data.get('chunk_size', RESTORE_CHUNK_SIZE)
+        max_chunks = data.get('max_chunks')
         
-        if not recycle_images:
-            return jsonify({'code': 404, 'message': '未找到要还原的图片'}), 404
+        if after_id is not None and (not isinstance(after_id, int) or isinstance(after_id, bool) or after_id < 0):
+            return jsonify({'code': 400, 'message': 'after_id必须是非负整数'}), 400
+        if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or not 1 <= chunk_size <= RESTORE_MAX_CHUNK_SIZE:
+            return jsonify({'code': 400, 'message': f'chunk_size必须是 1-{RESTORE_MAX_CHUNK_SIZE} 之间的整数'}), 400
+        if max_chunks is not None and (not isinstance(max_chunks, int) or isinstance(max_chunks, bool) or max_chunks < 1):
+            return jsonify({'code': 400, 'message': 'max_chunks必须是正整数'}), 400
         
-        restored_count = 0
-        failed_count = 0
-        errors = []
+        if data.get('dry_run'):
+            return jsonify({
+                'code': 200,
+                'message': 'success',
+                'data': count_restorable(query, after_id)
+            })
         
-        for recycle_image in recycle_images:
-            try:
-                # 准备图片数据
-                image_data = {
-                    'filename': recycle_image.filename,
-                    'storage_path': recycle_image.storage_path,
-                    'original_url': recycle_image.original_url,
-                    'status': 'active',
-                    'created_at': recycle_image.created_at,
-                    'storage_mode': recycle_image.storage_mode,
-                    'source_site': recycle_image.source_site,
-                    'keyword': recycle_image.keyword,
-                    'hash_tags_json': recycle_image.hash_tags_json,
-                    'visit_url': recycle_image.visit_url,
-                    'image_hash': recycle_image.image_hash,
-                    'width': recycle_image.width,
-                    'height': recycle_image.height,
-                    'format': recycle_image.format
-                }
-                
-                # 如果original_image_id存在，尝试使用该id
-                if recycle_image.original_image_id:
-                    existing_image = Image.query.get(recycle_image.original_image_id)
-                    if existing_image:
-                        # 更新已存在的记录
-                        for key, value in image_data.items():
-                            setattr(existing_image, key, value)
-                        restored_image = existing_image
-                    else:
-                        # 创建新记录并指定id
-                        try:
-                            db.session.execute(
-                                text("""
-                                    INSERT INTO images (id, filename, storage_path, original_url, status, created_at, 
-                                                        storage_mode, source_site, keyword, hash_tags_json, visit_url, 
-                                                        image_hash, width, height, format)
-                                    VALUES (:id, :filename, :storage_path, :original_url, :status, :created_at,
-                                            :storage_mode, :source_site, :keyword, :hash_tags_json, :visit_url,
-                                            :image_hash, :width, :height, :format)
-                                """),
-                                {
-                                    'id': recycle_image.original_image_id,
-                                    'filename': image_data['filename'],
-                                    'storage_path': image_data['storage_path'],
-                                    'original_url': image_data['original_url'],
-                                    'status': image_data['status'],
-                                    'created_at': image_data['created_at'],
-                                    'storage_mode': image_data['storage_mode'],
-                                    'source_site': image_data['source_site'],
-                                    'keyword': image_data['keyword'],
-                                    'hash_tags_json': image_data['hash_tags_json'],
-                                    'visit_url': image_data['visit_url'],
-                                    'image_hash': image_data['image_hash'],
-                                    'width': image_data['width'],
-                                    'height': image_data['height'],
-                                    'format': image_data['format']
-                                }
-                            )
-                            db.session.commit()
-                            restored_image = Image.query.get(recycle_image.original_image_id)
-                        except Exception as e:
-                            db.session.rollback()
-                            # 如果插入失败，创建新记录
-                            restored_image = Image(**image_data)
-                            db.session.add(restored_image)
-                            db.session.commit()
-                            db.session.refresh(restored_image)
-                else:
-                    # 创建新记录
-                    restored_image = Image(**image_data)
-                    db.session.add(restored_image)
-                    db.session.commit()
-                    db.session.refresh(restored_image)
-                
-                # 从回收站删除
-                db.session.delete(recycle_image)
-                db.session.commit()
-                
-                restored_count += 1
-                
-            except Exception as e:
-                db.session.rollback()
-                error_msg = f"还原图片失败 (recycle_id={recycle_image.id}): {str(e)}"
-                errors.append(error_msg)
-                current_app.logger.error(error_msg, exc_info=True)
-                failed_count += 1
-                continue
+        # 首次请求（没有after_id）没有匹配的记录时返回404；带after_id继续时剩余为空表示已全部还原
+        if after_id is None and query.with_entities(ImageRecycle.id).first() is None:
+            return jsonify({'code': 404, 'message': '未找到要还原的图片'}), 404
+        
+        stats = restore_recycled_images(
+            query,
+            after_id=after_id,
+            chunk_size=chunk_size,
+            max_chunks=max_chunks
+        )
         
         return jsonify({
             'code': 200,
-            'message': f'批量还原完成：成功 {restored_count} 张，失败 {failed_count} 张',
+            'message': f"批量还原完成：成功 {stats['restored']} 张，失败 {stats['failed']} 张",
             'data': {
-                'restored_count': restored_count,
-                'failed_count': failed_count,
-                'errors': errors
+                'restored_count': stats['restored'],
+                'failed_count': stats['failed'],
+                'errors': stats['errors'],
+                'overwritten_count': stats['overwritten'],
+                'merged_count': stats['merged'],
+                'cursor': stats['cursor'],
+                'done': stats['done']
             }
         })
         
@@ -347,4 +303,3 @@ def batch_restore_images():
         error_detail = traceback.format_exc()
         current_app.logger.error(f"批量还原图片失败: {error_detail}")
         return jsonify({'code': 500, 'message': str(e), 'detail': error_detail}), 500
-
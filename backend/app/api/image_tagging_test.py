@@ -78,7 +78,8 @@ def tag_image():
                         'filename': filename,
                         'features': features_list,
                         'tagging_result': result['result'],
-                        'raw_response': result.get('raw_response', '')
+                        'raw_response': result.get('raw_response', ''),
+                        'cached': result.get('cached', False)
                     }
                 })
             else:
@@ -10,8 +10,12 @@ from app.models.sample_image_aesthetic_score import SampleImageAestheticScore, S
 from app.models.lut_applied_image_aesthetic_score import LutAppliedImageAestheticScore
 from app.models.lut_applied_image_aesthetic_score_task import LutAppliedImageAestheticScoreTask
 from app.models.lut_applied_image_preference import LutAppliedImagePreference
-from app.utils.config_manager import get_local_image_dir
+from app.utils.config_manager import get_local_image_dir, get_lut_applied_cache_max_bytes, get_lut_mosaic_cache_max_bytes
+from app.utils.disk_lru_cache import DiskLruCache
 from app.services.lut_application_service import LutApplicationService
+from app.services.aesthetic_scorer_client import extract_score, ScorerUnavailableError
+from app.services.aesthetic_score_cache_service import AestheticScoreCacheService
+from app.utils.content_hash import compute_file_hash, derive_hash
 from werkzeug.utils import secure_filename
 from PIL import Image as PILImage
 import traceback
@@ -19,8 +23,8 @@ import os
 import hashlib
 import threading
 import json
-import requests
 import re
+import time
 from datetime import datetime
 
 bp = Blueprint('sample_image', __name__)
@@ -295,7 +299,86 @@ def get_lut_storage_dir():
     lut_dir = os.path.join(os.path.dirname(base_dir), 'storage', 'luts')
     return lut_dir
 
-def apply_luts_to_image_task(application_id, sample_image_id):
+# LUT应用模式：eager 立即渲染并保存全部图片；lazy 只创建记录，首次访问时渲染并放入磁盘LRU缓存（需显式指定）
+LUT_APPLY_MODES = ('eager', 'lazy')
+DEFAULT_LUT_APPLY_MODE = 'eager'
+
+_lut_applied_image_cache = None
+_lut_applied_image_cache_lock = threading.Lock()
+
+def get_lut_applied_image_cache():
+    """获取懒加载LUT应用后图片的磁盘LRU缓存"""
+    global _lut_applied_image_cache
+    with _lut_applied_image_cache_lock:
+        if _lut_applied_image_cache is None:
+            base_dir = get_local_image_dir()
+            cache_dir = os.path.join(os.path.dirname(base_dir), 'storage', 'lut_applied_cache')
+            _lut_applied_image_cache = DiskLruCache(cache_dir, get_lut_applied_cache_max_bytes())
+        return _lut_applied_image_cache
+
+def _content_version(file_hash, file_path):
+    """文件内容版本：优先使用记录的哈希值，没有哈希时退回到文件修改时间和大小"""
+    if file_hash:
+        return file_hash[:16]
+    stat = os.stat(file_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def get_lut_applied_image_path(applied_image):
+    """
+    获取LUT应用后图片的文件路径
+    
+    懒加载记录在首次访问时才渲染，结果放入大小受限的磁盘LRU缓存；被淘汰后再次访问会重新渲染。
+    缓存键包含样本图片和LUT文件的内容版本，任一文件被替换后不会命中旧的渲染结果。
+    懒加载记录首次渲染后会补写file_size（由调用方提交）。
+    
+    Returns:
+        (文件路径, 错误信息)
+    """
+    if not applied_image.is_lazy:
+        file_path = os.path.join(get_lut_applied_image_storage_dir(), applied_image.storage_path)
+        if not os.path.exists(file_path):
+            return None, '文件不存在'
+        return file_path, None
+    
+    sample_image = SampleImage.query.get(applied_image.sample_image_id)
+    lut_file = LutFile.query.get(applied_image.lut_file_id)
+    if not sample_image or not lut_file:
+        return None, '样本图片或LUT文件不存在'
+    
+    sample_image_path = os.path.join(get_sample_image_storage_dir(), sample_image.storage_path)
+    lut_file_path = os.path.join(get_lut_storage_dir(), lut_file.storage_path.replace('/', os.sep))
+    if not os.path.exists(sample_image_path) or not os.path.exists(lut_file_path):
+        return None, '样本图片或LUT文件不存在'
+    
+    # 缓存键：样本图片ID/样本版本_LUT版本_文件名
+    cache_key = (
+        f"{applied_image.sample_image_id}/"
+        f"{_content_version(sample_image.file_hash, sample_image_path)}_"
+        f"{_content_version(lut_file.file_hash, lut_file_path)}_{applied_image.filename}"
+    )
+    
+    cache = get_lut_applied_image_cache()
+    file_path = cache.get(cache_key)
+    if not file_path:
+        temp_path = cache.temp_path_for(cache_key)
+        lut_service = LutApplicationService()
+        success, error_msg = lut_service.apply_lut_to_image(sample_image_path, lut_file_path, temp_path)
+        if not success:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None, error_msg or '渲染失败'
+        file_path = cache.put(cache_key, temp_path)
+    
+    if applied_image.file_size is None:
+        applied_image.file_size = os.path.getsize(file_path)
+    
+    return file_path, None
+
+# LUT应用任务：批量写入的记录数和进度提交的时间间隔（秒）
+LUT_APPLY_BATCH_SIZE = 50
+LUT_APPLY_PROGRESS_INTERVAL = 2.0
+
+def apply_luts_to_image_task(application_id, sample_image_id, mode=DEFAULT_LUT_APPLY_MODE):
     """后台任务：将LUT应用到图片"""
     import logging
     logger = logging.getLogger(__name__)
@@ -305,7 +388,7 @@ def apply_luts_to_image_task(application_id, sample_image_id):
         app_instance = create_app()
         with app_instance.app_context():
             try:
-                logger.info(f"开始执行LUT应用任务: application_id={application_id}, sample_image_id={sample_image_id}")
+                logger.info(f"开始执行LUT应用任务: application_id={application_id}, sample_image_id={sample_image_id}, mode={mode}")
                 
                 application = LutApplication.query.get(application_id)
                 if not application:
@@ -320,13 +403,12 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                     db.session.commit()
                     return
                 
-                # 获取所有LUT文件，预加载类别关联关系
-                from sqlalchemy.orm import joinedload
-                from app.models.lut_category import LutCategory
-                lut_files = LutFile.query.options(
-                    joinedload(LutFile.category)
-                ).all()
+                # 获取所有LUT文件（只查询需要的列，提交后不会因对象过期而逐个重新加载）
+                lut_files = db.session.query(
+                    LutFile.id, LutFile.category_id, LutFile.original_filename, LutFile.storage_path
+                ).order_by(LutFile.id).all()
                 total_count = len(lut_files)
+                lut_filenames = {lut_file.id: lut_file.original_filename for lut_file in lut_files}
                 logger.info(f"找到 {total_count} 个LUT文件")
                 
                 if total_count == 0:
@@ -343,6 +425,17 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                 db.session.commit()
                 logger.info(f"任务状态已更新为running，总LUT数: {total_count}")
                 
+                # 一次性预加载已应用过的LUT ID集合和类别名映射，避免每个LUT单独查询
+                applied_lut_ids = {
+                    row.lut_file_id for row in db.session.query(LutAppliedImage.lut_file_id).filter_by(
+                        sample_image_id=sample_image_id
+                    ).all()
+                }
+                category_names = {
+                    row.id: row.name for row in db.session.query(LutCategory.id, LutCategory.name).all()
+                }
+                logger.info(f"已应用过的LUT数: {len(applied_lut_ids)}, 类别数: {len(category_names)}")
+                
                 # 获取文件路径
                 sample_storage_dir = get_sample_image_storage_dir()
                 sample_image_path = os.path.join(sample_storage_dir, sample_image.storage_path)
@@ -350,37 +443,76 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                 lut_storage_dir = get_lut_storage_dir()
                 applied_storage_dir = get_lut_applied_image_storage_dir()
                 
+                # 为每个样本图片创建独立的目录（以样本图片ID命名），懒加载模式不落盘
+                sample_image_dir = os.path.join(applied_storage_dir, str(sample_image_id))
+                if mode != 'lazy':
+                    os.makedirs(sample_image_dir, exist_ok=True)
+                
                 lut_service = LutApplicationService()
                 
                 processed_count = 0
                 success_count = 0
                 skipped_count = 0  # 记录跳过的文件数量（已应用过的）
                 failed_files = []  # 记录失败的文件信息
+                pending_applied_images = []  # 待批量写入的应用后图片记录
+                last_flush_time = time.time()
                 logger.info(f"开始处理LUT文件，样本图片路径: {sample_image_path}")
                 logger.info(f"LUT存储目录: {lut_storage_dir}")
                 logger.info(f"应用后图片存储目录: {applied_storage_dir}")
                 
+                def flush_progress(force=False):
+                    """批量写入应用后图片记录并更新进度（按数量或时间间隔提交）"""
+                    nonlocal last_flush_time, success_count
+                    if not force and len(pending_applied_images) < LUT_APPLY_BATCH_SIZE \
+                            and time.time() - last_flush_time < LUT_APPLY_PROGRESS_INTERVAL:
+                        return
+                    # 提交前记下本批记录的信息，提交失败回滚后对象会被移出会话
+                    batch = [
+                        (item.lut_file_id, item.storage_path, item.is_lazy)
+                        for item in pending_applied_images
+                    ]
+                    try:
+                        if pending_applied_images:
+                            db.session.add_all(pending_applied_images)
+                        application.processed_lut_count = processed_count
+                        db.session.commit()
+                    except Exception as e:
+                        logger.error(f"批量写入LUT应用记录失败，本批 {len(batch)} 条记录作废: {str(e)}")
+                        db.session.rollback()
+                        # 回滚后这些记录不存在：删除已渲染的文件并移出已应用集合，计为失败
+                        for lut_file_id, storage_path, is_lazy in batch:
+                            if not is_lazy:
+                                output_path = os.path.join(applied_storage_dir, storage_path.replace('/', os.sep))
+                                try:
+                                    if os.path.exists(output_path):
+                                        os.remove(output_path)
+                                except OSError as remove_error:
+                                    logger.warning(f"删除未入库的图片失败: {output_path}, {remove_error}")
+                            applied_lut_ids.discard(lut_file_id)
+                            success_count -= 1
+                            failed_files.append({
+                                'filename': lut_filenames.get(lut_file_id),
+                                'lut_id': lut_file_id,
+                                'error': f'写入数据库失败: {str(e)}'
+                            })
+                    finally:
+                        pending_applied_images.clear()
+                    last_flush_time = time.time()
+                
                 for lut_file in lut_files:
+                    rendered_path = None  # 本次已渲染、尚未加入待写入记录的图片
                     try:
-                        logger.info(f"处理LUT文件 [{processed_count + 1}/{total_count}]: {lut_file.original_filename}")
-                        
                         # 检查该LUT文件是否已经应用到该样本图片
-                        existing_applied = LutAppliedImage.query.filter_by(
-                            lut_file_id=lut_file.id,
-                            sample_image_id=sample_image_id
-                        ).first()
-                        
-                        if existing_applied:
-                            logger.info(f"LUT文件 {lut_file.original_filename} (ID: {lut_file.id}) 已经应用到样本图片 {sample_image_id}，跳过")
+                        if lut_file.id in applied_lut_ids:
                             skipped_count += 1
                             processed_count += 1
-                            application.processed_lut_count = processed_count
-                            db.session.commit()
+                            flush_progress()
                             continue
                         
+                        logger.info(f"处理LUT文件 [{processed_count + 1}/{total_count}]: {lut_file.original_filename}")
+                        
                         # 构建LUT文件路径
                         lut_file_path = os.path.join(lut_storage_dir, lut_file.storage_path.replace('/', os.sep))
-                        logger.info(f"LUT文件路径: {lut_file_path}")
                         
                         if not os.path.exists(lut_file_path):
                             error_msg = f"LUT文件不存在: {lut_file_path}"
@@ -391,8 +523,7 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                                 'error': error_msg
                             })
                             processed_count += 1
-                            application.processed_lut_count = processed_count
-                            db.session.commit()
+                            flush_progress()
                             continue
                         
                         # 检查LUT文件格式
@@ -406,19 +537,12 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                                 'error': error_msg
                             })
                             processed_count += 1
-                            application.processed_lut_count = processed_count
-                            db.session.commit()
+                            flush_progress()
                             continue
                         
                         # 生成输出文件名：lut类别名_lut文件名_lut ID.jpg
                         # 获取LUT类别名（如果没有类别则使用"未分类"）
-                        category_name = "未分类"
-                        if lut_file.category_id:
-                            # 直接查询类别表获取名称
-                            category = LutCategory.query.get(lut_file.category_id)
-                            if category and category.name:
-                                category_name = category.name
-                        logger.info(f"LUT文件 {lut_file.id} 的类别名: {category_name} (category_id: {lut_file.category_id})")
+                        category_name = category_names.get(lut_file.category_id) or "未分类"
                         # 清理类别名和文件名中的特殊字符，避免文件系统问题
                         # secure_filename会移除中文字符，所以使用自定义清理逻辑
                         # 保留中文字符、字母、数字、下划线和连字符
@@ -438,13 +562,8 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                         if not lut_name_clean:
                             lut_name_clean = f"lut_{lut_file.id}"
                         
-                        # 为每个样本图片创建独立的目录（以样本图片ID命名）
-                        sample_image_dir = os.path.join(applied_storage_dir, str(sample_image_id))
-                        os.makedirs(sample_image_dir, exist_ok=True)
-                        
                         # 生成文件名：类别名_lut文件名_lut ID.jpg（简化文件名，因为已经在独立目录中）
                         output_filename = f"{category_name_clean}_{lut_name_clean}_{lut_file.id}.jpg"
-                        logger.info(f"生成文件名: {output_filename} (样本图片ID: {sample_image_id}, 类别名清理后: '{category_name_clean}', LUT名清理后: '{lut_name_clean}')")
                         
                         # 完整路径：存储目录/样本图片ID/文件名
                         output_path = os.path.join(sample_image_dir, output_filename)
@@ -452,8 +571,26 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                         # 存储路径（相对路径，用于数据库存储）：样本图片ID/文件名
                         storage_path = f"{sample_image_id}/{output_filename}"
                         
+                        if mode == 'lazy':
+                            # 懒加载：只创建元数据记录，图片在首次访问时渲染（LUT不改变图片尺寸）
+                            pending_applied_images.append(LutAppliedImage(
+                                lut_application_id=application_id,
+                                lut_file_id=lut_file.id,
+                                sample_image_id=sample_image_id,
+                                filename=output_filename,
+                                storage_path=storage_path,
+                                width=sample_image.width,
+                                height=sample_image.height,
+                                format='JPEG',
+                                is_lazy=True
+                            ))
+                            applied_lut_ids.add(lut_file.id)
+                            success_count += 1
+                            processed_count += 1
+                            flush_progress()
+                            continue
+                        
                         # 应用LUT
-                        logger.info(f"开始应用LUT: {lut_file.original_filename} -> {output_filename}")
                         success, error_msg = lut_service.apply_lut_to_image(
                             sample_image_path,
                             lut_file_path,
@@ -461,26 +598,27 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                         )
                         
                         if success:
-                            logger.info(f"LUT应用成功: {output_filename}")
-                            success_count += 1
+                            rendered_path = output_path
                             # 获取输出图片信息
-                            output_img = PILImage.open(output_path)
+                            with PILImage.open(output_path) as output_img:
+                                output_width, output_height = output_img.width, output_img.height
                             file_size = os.path.getsize(output_path)
                             
-                            # 创建数据库记录
-                            applied_image = LutAppliedImage(
+                            # 创建数据库记录（批量写入）
+                            pending_applied_images.append(LutAppliedImage(
                                 lut_application_id=application_id,
                                 lut_file_id=lut_file.id,
                                 sample_image_id=sample_image_id,
                                 filename=output_filename,
                                 storage_path=storage_path,  # 使用相对路径：样本图片ID/文件名
                                 file_size=file_size,
-                                width=output_img.width,
-                                height=output_img.height,
+                                width=output_width,
+                                height=output_height,
                                 format='JPEG'
-                            )
-                            db.session.add(applied_image)
-                            logger.info(f"已创建应用后图片记录: {applied_image.id}")
+                            ))
+                            applied_lut_ids.add(lut_file.id)
+                            rendered_path = None
+                            success_count += 1
                         else:
                             logger.error(f"应用LUT失败: {lut_file.original_filename}, 错误: {error_msg}")
                             failed_files.append({
@@ -490,20 +628,31 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                             })
                         
                         processed_count += 1
-                        application.processed_lut_count = processed_count
-                        db.session.commit()
+                        flush_progress()
                         
                     except Exception as e:
                         error_detail = traceback.format_exc()
                         logger.error(f"处理LUT文件失败: {lut_file.original_filename}, 错误: {error_detail}")
+                        db.session.rollback()
+                        # 已渲染但没有对应记录的图片不再保留
+                        if rendered_path:
+                            try:
+                                if os.path.exists(rendered_path):
+                                    os.remove(rendered_path)
+                            except OSError as remove_error:
+                                logger.warning(f"删除未入库的图片失败: {rendered_path}, {remove_error}")
                         failed_files.append({
                             'filename': lut_file.original_filename,
                             'lut_id': lut_file.id,
                             'error': str(e)
                         })
                         processed_count += 1
-                        application.processed_lut_count = processed_count
-                        db.session.commit()
+                        flush_progress()
+                
+                # 写入剩余的记录和最终进度
+                flush_progress(force=True)
+                if skipped_count > 0:
+                    logger.info(f"LUT文件已经应用到样本图片 {sample_image_id}，共跳过 {skipped_count} 个")
                 
                 # 更新任务状态和错误信息
                 application.status = 'completed'
@@ -547,7 +696,6 @@ def apply_luts_to_image_task(application_id, sample_image_id):
                 except Exception as inner_e:
                     logger.error(f"更新任务状态失败: {inner_e}")
     except Exception as outer_e:
-        import traceback
         logger.error(f"LUT应用任务外层异常: {traceback.format_exc()}")
 
 @bp.route('/<int:image_id>/apply-luts', methods=['POST'])
@@ -555,6 +703,11 @@ def apply_luts_to_image(image_id):
     """将图片应用到所有LUT文件"""
     try:
         sample_image = SampleImage.query.get_or_404(image_id)
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode', DEFAULT_LUT_APPLY_MODE)
+        
+        if mode not in LUT_APPLY_MODES:
+            return jsonify({'code': 400, 'message': f'不支持的应用模式: {mode}'}), 400
         
         # 检查是否已有运行中的任务
         existing = LutApplication.query.filter_by(
@@ -574,10 +727,10 @@ def apply_luts_to_image(image_id):
         db.session.commit()
         
         # 启动后台任务
-        current_app.logger.info(f"启动LUT应用后台任务: application_id={application.id}, sample_image_id={image_id}")
+        current_app.logger.info(f"启动LUT应用后台任务: application_id={application.id}, sample_image_id={image_id}, mode={mode}")
         thread = threading.Thread(
             target=apply_luts_to_image_task,
-            args=(application.id, image_id),
+            args=(application.id, image_id, mode),
             daemon=True,
             name=f"LutApplication-{application.id}"
         )
@@ -732,11 +885,14 @@ def get_lut_applied_image_content(applied_image_id):
     try:
         applied_image = LutAppliedImage.query.get_or_404(applied_image_id)
         
-        storage_dir = get_lut_applied_image_storage_dir()
-        file_path = os.path.join(storage_dir, applied_image.storage_path)
+        file_path, error_msg = get_lut_applied_image_path(applied_image)
         
-        if not os.path.exists(file_path):
-            return jsonify({'code': 404, 'message': '文件不存在'}), 404
+        if not file_path:
+            return jsonify({'code': 404, 'message': error_msg}), 404
+        
+        # 懒加载记录首次渲染后补写的文件大小
+        if db.session.is_modified(applied_image):
+            db.session.commit()
         
         return send_file(file_path)
     except Exception as e:
@@ -744,6 +900,102 @@ def get_lut_applied_image_content(applied_image_id):
         current_app.logger.error(f"获取LUT应用后的图片内容失败: {error_detail}")
         return jsonify({'code': 500, 'message': str(e), 'detail': error_detail}), 500
 
+_lut_mosaic_cache = None
+_lut_mosaic_cache_lock = threading.Lock()
+
+def get_lut_mosaic_cache():
+    """获取LUT对比图的磁盘LRU缓存"""
+    global _lut_mosaic_cache
+    with _lut_mosaic_cache_lock:
+        if _lut_mosaic_cache is None:
+            base_dir = get_local_image_dir()
+            cache_dir = os.path.join(os.path.dirname(base_dir), 'storage', 'lut_mosaics')
+            _lut_mosaic_cache = DiskLruCache(cache_dir, get_lut_mosaic_cache_max_bytes())
+        return _lut_mosaic_cache
+
+# LUT对比图参数限制
+MOSAIC_MAX_LUT_COUNT = 100
+MOSAIC_MIN_TILE_SIZE = 64
+MOSAIC_MAX_TILE_SIZE = 1024
+
+@bp.route('/<int:image_id>/lut-mosaic', methods=['GET'])
+def get_lut_mosaic(image_id):
+    """将样本图片缩小后通过选中的多个LUT渲染，返回一张带标签的拼接对比图"""
+    try:
+        sample_image = SampleImage.query.get_or_404(image_id)
+        
+        lut_file_ids_str = request.args.get('lut_file_ids', '', type=str)
+        tile_size = request.args.get('tile_size', 256, type=int)
+        columns = request.args.get('columns', type=int)
+        
+        try:
+            lut_file_ids = [int(x) for x in lut_file_ids_str.split(',') if x.strip()]
+        except ValueError:
+            return jsonify({'code': 400, 'message': 'lut_file_ids格式错误，应为逗号分隔的ID列表'}), 400
+        
+        if not lut_file_ids:
+            return jsonify({'code': 400, 'message': '请选择至少一个LUT文件'}), 400
+        if len(lut_file_ids) > MOSAIC_MAX_LUT_COUNT:
+            return jsonify({'code': 400, 'message': f'最多选择 {MOSAIC_MAX_LUT_COUNT} 个LUT文件'}), 400
+        if tile_size < MOSAIC_MIN_TILE_SIZE or tile_size > MOSAIC_MAX_TILE_SIZE:
+            return jsonify({'code': 400, 'message': f'tile_size必须在 {MOSAIC_MIN_TILE_SIZE}-{MOSAIC_MAX_TILE_SIZE} 之间'}), 400
+        
+        lut_files = {f.id: f for f in LutFile.query.filter(LutFile.id.in_(lut_file_ids)).all()}
+        missing_ids = [lut_id for lut_id in lut_file_ids if lut_id not in lut_files]
+        if missing_ids:
+            return jsonify({'code': 404, 'message': f'LUT文件不存在: {missing_ids}'}), 404
+        
+        storage_dir = get_sample_image_storage_dir()
+        image_path = os.path.join(storage_dir, sample_image.storage_path)
+        if not os.path.exists(image_path):
+            return jsonify({'code': 404, 'message': '文件不存在'}), 404
+        
+        lut_storage_dir = get_lut_storage_dir()
+        luts = []
+        for lut_id in lut_file_ids:
+            lut_file = lut_files[lut_id]
+            lut_file_path = os.path.join(lut_storage_dir, lut_file.storage_path.replace('/', os.sep))
+            if not os.path.exists(lut_file_path):
+                return jsonify({'code': 404, 'message': f'LUT文件不存在: {lut_id}'}), 404
+            label = os.path.splitext(lut_file.original_filename)[0]
+            luts.append((lut_id, label, lut_file_path))
+        
+        # 缓存键：(样本图片, LUT集合, 格子大小)，图片和LUT都按内容版本区分（没有哈希时使用修改时间和大小）
+        cache_source = json.dumps({
+            'sample_image': [sample_image.id, _content_version(sample_image.file_hash, image_path)],
+            'luts': [[lut_id, _content_version(lut_files[lut_id].file_hash, lut_file_path)]
+                     for lut_id, _, lut_file_path in luts],
+            'tile_size': tile_size,
+            'columns': columns
+        })
+        cache_key = hashlib.md5(cache_source.encode('utf-8')).hexdigest()
+        mosaic_key = f"{image_id}_{cache_key}.jpg"
+        mosaic_cache = get_lut_mosaic_cache()
+        mosaic_path = mosaic_cache.get(mosaic_key)
+        
+        if not mosaic_path:
+            # 先写入临时文件再原子替换，避免并发请求读到未写完的文件
+            temp_path = mosaic_cache.temp_path_for(mosaic_key)
+            lut_service = LutApplicationService()
+            success, error_msg = lut_service.render_lut_mosaic(
+                image_path,
+                [(label, lut_file_path) for _, label, lut_file_path in luts],
+                temp_path,
+                tile_size=tile_size,
+                columns=columns
+            )
+            if not success:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return jsonify({'code': 500, 'message': f'生成对比图失败: {error_msg}'}), 500
+            mosaic_path = mosaic_cache.put(mosaic_key, temp_path)
+        
+        return send_file(mosaic_path, mimetype='image/jpeg')
+    except Exception as e:
+        error_detail = traceback.format_exc()
+        current_app.logger.error(f"获取LUT对比图失败: {error_detail}")
+        return jsonify({'code': 500, 'message': str(e), 'detail': error_detail}), 500
+
 def evaluate_sample_images_aesthetic_score_task(task_id, evaluator_type, score_mode):
     """后台任务：对样本图片进行美学评分"""
     import logging
@@ -760,7 +1012,7 @@ def evaluate_sample_images_aesthetic_score_task(task_id, evaluator_type, score_m
                     return
                 
                 # 获取所有样本图片
-                sample_images = SampleImage.query.all()
+                sample_images = db.session.query(SampleImage.id, SampleImage.storage_path).all()
                 total_count = len(sample_images)
                 
                 task.total_image_count = total_count
@@ -768,105 +1020,72 @@ def evaluate_sample_images_aesthetic_score_task(task_id, evaluator_type, score_m
                 db.session.commit()
                 logger.info(f"开始处理样本图片美学评分，共 {total_count} 张图片")
                 
-                processed_count = 0
+                if evaluator_type != 'artimuse':
+                    task.status = 'failed'
+                    task.error_message = 'Q-Insight功能暂未实现'
+                    task.finished_at = datetime.now()
+                    db.session.commit()
+                    return
                 
-                for idx, sample_image in enumerate(sample_images, 1):
-                    try:
-                        logger.info(f"处理样本图片 [{idx}/{total_count}]: {sample_image.original_filename}")
-                        
-                        # 检查是否已经评分过
-                        existing_score = SampleImageAestheticScore.query.filter_by(
-                            sample_image_id=sample_image.id,
-                            evaluator_type=evaluator_type
-                        ).first()
-                        
-                        if existing_score:
-                            processed_count += 1
-                            task.processed_image_count = processed_count
-                            db.session.commit()
-                            logger.info(f"样本图片 {sample_image.id} 已评分过，跳过。进度: {processed_count}/{total_count}")
+                # 一次性查询已评分过的样本图片
+                scored_ids = {
+                    row.sample_image_id for row in db.session.query(SampleImageAestheticScore.sample_image_id).filter_by(
+                        evaluator_type=evaluator_type
+                    ).all()
+                }
+                processed_count = sum(1 for img in sample_images if img.id in scored_ids)
+                task.processed_image_count = processed_count
+                db.session.commit()
+                logger.info(f"已评分过 {processed_count} 张，跳过")
+                
+                sample_storage_dir = get_sample_image_storage_dir()
+                
+                def pending_images():
+                    for sample_image in sample_images:
+                        if sample_image.id in scored_ids:
                             continue
-                        
-                        # 获取图片文件路径
-                        sample_storage_dir = get_sample_image_storage_dir()
                         image_path = os.path.join(sample_storage_dir, sample_image.storage_path)
-                        
-                        if not os.path.exists(image_path) or not os.path.isfile(image_path):
+                        if not os.path.isfile(image_path):
                             logger.warning(f"样本图片文件不存在: {image_path}")
-                            processed_count += 1
-                            task.processed_image_count = processed_count
-                            db.session.commit()
+                            yield sample_image.id, None, None
                             continue
-                        
-                        # 根据评分模式选择接口
-                        if evaluator_type == 'artimuse':
-                            if score_mode == 'score_only':
-                                api_url = 'http://localhost:5001/api/evaluate_score'
-                            else:
-                                api_url = 'http://localhost:5001/api/evaluate'
-                        else:
-                            logger.error(f"Q-Insight评分器暂未实现")
-                            processed_count += 1
-                            task.processed_image_count = processed_count
-                            db.session.commit()
-                            continue
-                        
-                        # 调用ArtiMuse接口
-                        logger.info(f"开始评分样本图片 {sample_image.id}: {image_path}")
-                        
-                        with open(image_path, 'rb') as f:
-                            files = {'image': f}
-                            response = requests.post(api_url, files=files, timeout=300)
-                        
-                        if response.status_code == 200:
-                            try:
-                                result_data = response.json()
-                            except json.JSONDecodeError as e:
-                                logger.error(f"评分样本图片 {sample_image.id} 失败: 无法解析JSON响应 - {response.text[:200]}")
-                                processed_count += 1
-                                task.processed_image_count = processed_count
-                                db.session.commit()
-                                continue
-                            
-                            # 提取分数
-                            score = result_data.get('score') or result_data.get('aesthetic_score')
-                            
-                            if score is not None:
-                                # 保存评分结果
-                                aesthetic_score = SampleImageAestheticScore(
-                                    sample_image_id=sample_image.id,
+                        yield sample_image.id, compute_file_hash(image_path), image_path
+                
+                # 先查评分缓存，未命中的通过共享评分客户端并发评分，数据库写入在当前线程完成
+                cache_service = AestheticScoreCacheService()
+                try:
+                    for sample_image_id, result_data, error_msg, cached in cache_service.iter_scores(pending_images(), evaluator_type, score_mode):
+                        try:
+                            score = extract_score(result_data)
+                            if error_msg:
+                                logger.error(f"样本图片 {sample_image_id} 评分失败: {error_msg}")
+                            elif score is not None:
+                                db.session.add(SampleImageAestheticScore(
+                                    sample_image_id=sample_image_id,
                                     evaluator_type=evaluator_type,
                                     score=score,
                                     details_json=json.dumps(result_data, ensure_ascii=False)
-                                )
-                                db.session.add(aesthetic_score)
-                                logger.info(f"样本图片 {sample_image.id} 评分成功: {score}")
+                                ))
+                                logger.info(f"样本图片 {sample_image_id} 评分成功: {score}{'（缓存）' if cached else ''}")
                             else:
-                                logger.warning(f"样本图片 {sample_image.id} 评分结果中没有分数")
-                        else:
-                            logger.error(f"样本图片 {sample_image.id} 评分失败: HTTP {response.status_code} - {response.text[:200]}")
-                        
-                        processed_count += 1
-                        task.processed_image_count = processed_count
-                        db.session.commit()
-                        logger.info(f"进度更新: {processed_count}/{total_count}")
-                        
-                    except requests.exceptions.ConnectionError as e:
-                        logger.error(f"评分样本图片 {sample_image.id} 失败: 无法连接到ArtiMuse服务 (http://localhost:5001)，请确保服务正在运行")
-                        break
-                    except requests.exceptions.Timeout as e:
-                        logger.error(f"评分样本图片 {sample_image.id} 失败: 请求超时（超过300秒）")
-                        processed_count += 1
-                        task.processed_image_count = processed_count
-                        db.session.commit()
-                        continue
-                    except Exception as e:
-                        logger.error(f"评分样本图片 {sample_image.id} 失败: {str(e)}")
-                        logger.error(traceback.format_exc())
-                        processed_count += 1
-                        task.processed_image_count = processed_count
-                        db.session.commit()
-                        continue
+                                logger.warning(f"样本图片 {sample_image_id} 评分结果中没有分数")
+                            
+                            processed_count += 1
+                            task.processed_image_count = processed_count
+                            db.session.commit()
+                            logger.info(f"进度更新: {processed_count}/{total_count}")
+                        except Exception as e:
+                            db.session.rollback()
+                            logger.error(f"保存样本图片 {sample_image_id} 评分结果失败: {str(e)}")
+                            logger.error(traceback.format_exc())
+                except ScorerUnavailableError as e:
+                    # 评分服务熔断：任务未完成，标记为失败并记录原因，重新启动任务会跳过已评分的图片
+                    logger.error(f"样本图片美学评分中止: {e}")
+                    task.status = 'failed'
+                    task.error_message = f"评分服务不可用，任务已中止（已处理 {processed_count}/{total_count} 张）: {e}"
+                    task.finished_at = datetime.now()
+                    db.session.commit()
+                    return
                 
                 # 更新任务状态
                 task.status = 'completed'
@@ -1017,31 +1236,16 @@ def score_single_image(image_id):
         if not os.path.exists(image_path) or not os.path.isfile(image_path):
             return jsonify({'code': 404, 'message': '图片文件不存在'}), 404
         
-        # 根据评分模式选择接口
-        if evaluator_type == 'artimuse':
-            if score_mode == 'score_only':
-                api_url = 'http://localhost:5001/api/evaluate_score'
-            else:
-                api_url = 'http://localhost:5001/api/evaluate'
-        else:
-            return jsonify({'code': 400, 'message': 'Q-Insight功能暂未实现'}), 400
-        
-        # 调用ArtiMuse接口
+        # 调用ArtiMuse接口（优先使用评分缓存）
         current_app.logger.info(f"开始评分样本图片 {image_id}: {image_path}")
         
-        with open(image_path, 'rb') as f:
-            files = {'image': f}
-            response = requests.post(api_url, files=files, timeout=300)
+        result_data, error_msg, _ = AestheticScoreCacheService().score_image(
+            compute_file_hash(image_path), image_path, evaluator_type, score_mode
+        )
         
-        if response.status_code == 200:
-            try:
-                result_data = response.json()
-            except json.JSONDecodeError as e:
-                current_app.logger.error(f"评分样本图片 {image_id} 失败: 无法解析JSON响应 - {response.text[:200]}")
-                return jsonify({'code': 500, 'message': '无法解析评分结果'}), 500
-            
+        if not error_msg:
             # 提取分数
-            score = result_data.get('score') or result_data.get('aesthetic_score')
+            score = extract_score(result_data)
             
             if score is not None:
                 # 保存评分结果
@@ -1063,15 +1267,12 @@ def score_single_image(image_id):
             else:
                 return jsonify({'code': 500, 'message': '评分结果中没有分数'}), 500
         else:
-            current_app.logger.error(f"样本图片 {image_id} 评分失败: HTTP {response.status_code} - {response.text[:200]}")
-            return jsonify({'code': 500, 'message': f'评分失败: HTTP {response.status_code}'}), 500
+            current_app.logger.error(f"样本图片 {image_id} 评分失败: {error_msg}")
+            return jsonify({'code': 500, 'message': f'评分失败: {error_msg}'}), 500
             
-    except requests.exceptions.ConnectionError as e:
-        current_app.logger.error(f"评分样本图片 {image_id} 失败: 无法连接到ArtiMuse服务")
-        return jsonify({'code': 500, 'message': '无法连接到ArtiMuse服务，请确保服务正在运行'}), 500
-    except requests.exceptions.Timeout as e:
-        current_app.logger.error(f"评分样本图片 {image_id} 失败: 请求超时")
-        return jsonify({'code': 500, 'message': '请求超时（超过300秒）'}), 500
+    except ScorerUnavailableError as e:
+        current_app.logger.error(f"评分样本图片 {image_id} 失败: {e}")
+        return jsonify({'code': 500, 'message': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         error_detail = traceback.format_exc()
@@ -1141,38 +1342,34 @@ def score_lut_applied_image(applied_image_id):
                 'data': existing_score.to_dict()
             })
         
-        # 获取图片文件路径
-        applied_storage_dir = get_lut_applied_image_storage_dir()
-        image_path = os.path.join(applied_storage_dir, applied_image.storage_path)
-        
-        if not os.path.exists(image_path) or not os.path.isfile(image_path):
-            return jsonify({'code': 404, 'message': '图片文件不存在'}), 404
-        
-        # 根据评分模式选择接口
-        if evaluator_type == 'artimuse':
-            if score_mode == 'score_only':
-                api_url = 'http://localhost:5001/api/evaluate_score'
-            else:
-                api_url = 'http://localhost:5001/api/evaluate'
-        else:
-            return jsonify({'code': 400, 'message': 'Q-Insight功能暂未实现'}), 400
-        
-        # 调用ArtiMuse接口
-        current_app.logger.info(f"开始评分LUT应用后的图片 {applied_image_id}: {image_path}")
-        
-        with open(image_path, 'rb') as f:
-            files = {'image': f}
-            response = requests.post(api_url, files=files, timeout=300)
+        cache_service = AestheticScoreCacheService()
+        sample_image = SampleImage.query.get(applied_image.sample_image_id)
+        lut_file = LutFile.query.get(applied_image.lut_file_id)
+        sample_image_path = os.path.join(get_sample_image_storage_dir(), sample_image.storage_path) if sample_image else None
+        content_hash = derive_hash(
+            'lut_applied',
+            compute_file_hash(sample_image_path) if sample_image_path and os.path.isfile(sample_image_path) else None,
+            lut_file.file_hash if lut_file else None
+        )
         
-        if response.status_code == 200:
-            try:
-                result_data = response.json()
-            except json.JSONDecodeError as e:
-                current_app.logger.error(f"评分LUT应用后的图片 {applied_image_id} 失败: 无法解析JSON响应 - {response.text[:200]}")
-                return jsonify({'code': 500, 'message': '无法解析评分结果'}), 500
+        # 缓存命中时无需渲染和调用评分服务
+        result_data = cache_service.get(content_hash, evaluator_type, score_mode)
+        error_msg = None
+        if result_data is None:
+            # 获取图片文件路径（懒加载记录会在此时渲染）
+            image_path, error_msg = get_lut_applied_image_path(applied_image)
+            
+            if not image_path:
+                return jsonify({'code': 404, 'message': f'图片文件不存在: {error_msg}'}), 404
             
+            # 调用ArtiMuse接口
+            current_app.logger.info(f"开始评分LUT应用后的图片 {applied_image_id}: {image_path}")
+            
+            result_data, error_msg, _ = cache_service.score_image(content_hash, image_path, evaluator_type, score_mode)
+        
+        if not error_msg:
             # 提取分数
-            score = result_data.get('score') or result_data.get('aesthetic_score')
+            score = extract_score(result_data)
             
             if score is not None:
                 # 保存评分结果
@@ -1195,9 +1392,12 @@ def score_lut_applied_image(applied_image_id):
             else:
                 return jsonify({'code': 500, 'message': '评分结果中没有分数'}), 500
         else:
-            current_app.logger.error(f"评分LUT应用后的图片 {applied_image_id} 失败: HTTP {response.status_code} - {response.text[:200]}")
-            return jsonify({'code': 500, 'message': f'评分失败: HTTP {response.status_code}'}), 500
+            current_app.logger.error(f"评分LUT应用后的图片 {applied_image_id} 失败: {error_msg}")
+            return jsonify({'code': 500, 'message': f'评分失败: {error_msg}'}), 500
             
+    except ScorerUnavailableError as e:
+        current_app.logger.error(f"评分LUT应用后的图片 {applied_image_id} 失败: {e}")
+        return jsonify({'code': 500, 'message': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         error_detail = traceback.format_exc()
@@ -1263,100 +1463,87 @@ def evaluate_lut_applied_images_aesthetic_score_task(task_id, sample_image_id, e
                     logger.info("没有LUT应用后的图片需要评分")
                     return
                 
-                processed_count = 0
-                applied_storage_dir = get_lut_applied_image_storage_dir()
-                
-                # 根据评分模式选择接口
-                if evaluator_type == 'artimuse':
-                    if score_mode == 'score_only':
-                        api_url = 'http://localhost:5001/api/evaluate_score'
-                    else:
-                        api_url = 'http://localhost:5001/api/evaluate'
-                else:
+                if evaluator_type != 'artimuse':
                     task.status = 'failed'
                     task.error_message = 'Q-Insight功能暂未实现'
                     task.finished_at = datetime.now()
                     db.session.commit()
                     return
                 
-                for applied_image in applied_images:
-                    try:
-                        # 检查是否已经评分过
-                        existing_score = LutAppliedImageAestheticScore.query.filter_by(
-                            lut_applied_image_id=applied_image.id,
-                            evaluator_type=evaluator_type
-                        ).first()
-                        
-                        if existing_score:
-                            logger.info(f"LUT应用后的图片 {applied_image.id} 已评分过，跳过")
-                            processed_count += 1
-                            task.processed_image_count = processed_count
-                            db.session.commit()
-                            continue
-                        
-                        # 获取图片文件路径
-                        image_path = os.path.join(applied_storage_dir, applied_image.storage_path)
-                        
-                        if not os.path.exists(image_path) or not os.path.isfile(image_path):
-                            logger.warning(f"LUT应用后的图片文件不存在: {image_path}")
-                            processed_count += 1
-                            task.processed_image_count = processed_count
-                            db.session.commit()
+                # 一次性查询已评分过的图片
+                applied_image_ids = [applied_image.id for applied_image in applied_images]
+                scored_ids = {
+                    row.lut_applied_image_id for row in db.session.query(LutAppliedImageAestheticScore.lut_applied_image_id).filter(
+                        LutAppliedImageAestheticScore.lut_applied_image_id.in_(applied_image_ids),
+                        LutAppliedImageAestheticScore.evaluator_type == evaluator_type
+                    ).all()
+                }
+                processed_count = len(scored_ids)
+                task.processed_image_count = processed_count
+                db.session.commit()
+                logger.info(f"已评分过 {processed_count} 张，跳过")
+                
+                # LUT应用后的图片由样本图片和LUT文件确定性生成，用两者的哈希派生内容哈希，命中缓存时无需渲染
+                sample_image = SampleImage.query.get(sample_image_id)
+                sample_image_path = os.path.join(get_sample_image_storage_dir(), sample_image.storage_path) if sample_image else None
+                sample_content_hash = compute_file_hash(sample_image_path) if sample_image_path and os.path.isfile(sample_image_path) else None
+                lut_file_hashes = {
+                    row.id: row.file_hash for row in db.session.query(LutFile.id, LutFile.file_hash).filter(
+                        LutFile.id.in_({applied_image.lut_file_id for applied_image in applied_images})
+                    ).all()
+                }
+                
+                def resolve_image_path(applied_image):
+                    # 在当前线程（应用上下文中）准备图片，懒加载记录会在此时渲染
+                    def resolve():
+                        image_path, error_msg = get_lut_applied_image_path(applied_image)
+                        if not image_path:
+                            logger.warning(f"LUT应用后的图片文件不存在: {applied_image.storage_path}, {error_msg}")
+                        return image_path
+                    return resolve
+                
+                def pending_images():
+                    for applied_image in applied_images:
+                        if applied_image.id in scored_ids:
                             continue
-                        
-                        # 调用ArtiMuse接口
-                        logger.info(f"开始评分LUT应用后的图片 {applied_image.id}: {image_path}")
-                        
-                        with open(image_path, 'rb') as f:
-                            files = {'image': f}
-                            response = requests.post(api_url, files=files, timeout=300)
-                        
-                        if response.status_code == 200:
-                            try:
-                                result_data = response.json()
-                            except json.JSONDecodeError as e:
-                                logger.error(f"评分LUT应用后的图片 {applied_image.id} 失败: 无法解析JSON响应 - {response.text[:200]}")
-                                processed_count += 1
-                                task.processed_image_count = processed_count
-                                db.session.commit()
-                                continue
-                            
-                            # 提取分数
-                            score = result_data.get('score') or result_data.get('aesthetic_score')
-                            
-                            if score is not None:
-                                # 保存评分结果
-                                aesthetic_score = LutAppliedImageAestheticScore(
-                                    lut_applied_image_id=applied_image.id,
+                        content_hash = derive_hash('lut_applied', sample_content_hash, lut_file_hashes.get(applied_image.lut_file_id))
+                        yield applied_image.id, content_hash, resolve_image_path(applied_image)
+                
+                # 先查评分缓存，未命中的通过共享评分客户端并发评分，数据库写入在当前线程完成
+                cache_service = AestheticScoreCacheService()
+                try:
+                    for applied_image_id, result_data, error_msg, cached in cache_service.iter_scores(pending_images(), evaluator_type, score_mode):
+                        try:
+                            score = extract_score(result_data)
+                            if error_msg:
+                                logger.error(f"评分LUT应用后的图片 {applied_image_id} 失败: {error_msg}")
+                            elif score is not None:
+                                db.session.add(LutAppliedImageAestheticScore(
+                                    lut_applied_image_id=applied_image_id,
                                     evaluator_type=evaluator_type,
                                     score=score,
                                     details_json=json.dumps(result_data, ensure_ascii=False)
-                                )
-                                db.session.add(aesthetic_score)
-                                logger.info(f"LUT应用后的图片 {applied_image.id} 评分成功: {score}")
+                                ))
+                                logger.info(f"LUT应用后的图片 {applied_image_id} 评分成功: {score}{'（缓存）' if cached else ''}")
                             else:
-                                logger.warning(f"LUT应用后的图片 {applied_image.id} 评分结果中没有分数")
-                        else:
-                            logger.error(f"评分LUT应用后的图片 {applied_image.id} 失败: HTTP {response.status_code} - {response.text[:200]}")
-                        
-                        processed_count += 1
-                        task.processed_image_count = processed_count
-                        db.session.commit()
-                        logger.info(f"进度更新: {processed_count}/{total_count}")
-                        
-                    except requests.exceptions.ConnectionError as e:
-                        logger.error(f"评分LUT应用后的图片 {applied_image.id} 失败: 无法连接到ArtiMuse服务 (http://localhost:5001)，请确保服务正在运行")
-                        processed_count += 1
-                        task.processed_image_count = processed_count
-                        db.session.commit()
-                        continue
-                    except Exception as e:
-                        logger.error(f"评分LUT应用后的图片 {applied_image.id} 失败: {str(e)}")
-                        logger.error(traceback.format_exc())
-                        processed_count += 1
-                        task.processed_image_count = processed_count
-                        db.session.commit()
-                        continue
+                                logger.warning(f"LUT应用后的图片 {applied_image_id} 评分结果中没有分数")
+                            
+                            processed_count += 1
+                            task.processed_image_count = processed_count
+                            db.session.commit()
+                            logger.info(f"进度更新: {processed_count}/{total_count}")
+                        except Exception as e:
+                            db.session.rollback()
+                            logger.error(f"保存LUT应用后的图片 {applied_image_id} 评分结果失败: {str(e)}")
+                            logger.error(traceback.format_exc())
+                except ScorerUnavailableError as e:
+                    # 评分服务熔断：任务未完成，标记为失败并记录原因，重新启动任务会跳过已评分的图片
+                    logger.error(f"LUT应用后图片美学评分中止: {e}")
+                    task.status = 'failed'
+                    task.error_message = f"评分服务不可用，任务已中止（已处理 {processed_count}/{total_count} 张）: {e}"
+                    task.finished_at = datetime.now()
+                    db.session.commit()
+                    return
                 
                 # 更新任务状态
                 task.status = 'completed'
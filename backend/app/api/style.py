@@ -10,11 +10,13 @@ from app.models.feature import Feature
 from app.models.image_tagging_result import ImageTaggingResult
 from app.models.aesthetic_score import AestheticScore
 from app.utils.config_manager import get_local_image_dir
+from app.services.aesthetic_scorer_client import extract_score, ScorerUnavailableError
+from app.services.aesthetic_score_cache_service import AestheticScoreCacheService
+from app.utils.content_hash import compute_file_hash
 from sqlalchemy import func, or_ as sql_or, update
 import traceback
 import json
 import os
-import requests
 import threading
 from datetime import datetime
 
@@ -541,202 +543,110 @@ def evaluate_aesthetic_score(style_id):
                     processed_count = 0
                     total_images = len(style_images_list)
                     
-                    for idx, style_image in enumerate(style_images_list, 1):
-                        if not style_image.image:
-                            continue
-                        
+                    if evaluator_type != 'artimuse':
+                        # Q-Insight接口后续实现
+                        logger.error(f"[后台线程] Q-Insight评分器暂未实现")
+                        return
+                    
+                    # 一次性查询已评分过的图片
+                    scored_image_ids = {
+                        row.image_id for row in db.session.query(AestheticScore.image_id).filter_by(
+                            style_id=style_id,
+                            evaluator_type=evaluator_type
+                        ).all()
+                    }
+                    
+                    pending = []
+                    storage_base = get_local_image_dir()
+                    for style_image in style_images_list:
                         image = style_image.image
-                        
                         # 验证image.id不为None
-                        if not image.id:
-                            logger.warning(f"[后台线程] 图片对象没有ID，跳过")
+                        if not image or not image.id:
                             continue
-                        
-                        # 检查是否已经评分过
-                        existing_score = AestheticScore.query.filter_by(
-                            style_id=style_id,
-                            image_id=image.id,
-                            evaluator_type=evaluator_type
-                        ).first()
-                        
-                        if existing_score:
-                            # 跳过已评分的图片，但也要更新进度
+                        if image.id in scored_image_ids:
+                            # 跳过已评分的图片，但也要计入进度
                             processed_count += 1
-                            # 更新处理进度
-                            db.session.refresh(style_obj)
-                            style_obj.processed_image_count = processed_count
-                            db.session.commit()
-                            logger.info(f"[后台线程] 图片 {image.id} 已评分过，跳过。进度: {processed_count}/{total_images}")
                             continue
                         
                         # 获取图片文件路径
                         if not image.storage_path:
                             continue
-                        
                         relative_path = image.storage_path.replace('\\', '/')
-                        storage_base = get_local_image_dir()
                         relative_path = relative_path.lstrip('./').lstrip('.\\')
-                        file_path = os.path.join(storage_base, relative_path)
-                        file_path = os.path.normpath(file_path)
-                        
+                        file_path = os.path.normpath(os.path.join(storage_base, relative_path))
                         if not os.path.exists(file_path) or not os.path.isfile(file_path):
                             continue
-                        
-                        try:
-                            # 记录开始评分日志
-                            logger.info(f"[后台线程] 开始评分图片 {image.id} ({idx}/{total_images}): {file_path}")
-                            
-                            # 根据评分模式选择接口
-                            if evaluator_type == 'artimuse':
-                                if score_mode == 'score_only':
-                                    api_url = 'http://localhost:5001/api/evaluate_score'
-                                else:
-                                    api_url = 'http://localhost:5001/api/evaluate'
-                            else:
-                                # Q-Insight接口后续实现
-                                logger.error(f"[后台线程] Q-Insight评分器暂未实现")
+                        # 优先使用爬虫写入的内容哈希，同一张图片在多个风格中只评分一次
+                        content_hash = image.image_hash or compute_file_hash(file_path)
+                        pending.append((image.id, content_hash, file_path))
+                    
+                    style_obj.processed_image_count = processed_count
+                    db.session.commit()
+                    logger.info(f"[后台线程] 已评分过 {processed_count} 张，待评分 {len(pending)} 张")
+                    
+                    # 先查评分缓存，未命中的通过共享评分客户端并发评分，数据库写入在当前线程完成
+                    cache_service = AestheticScoreCacheService()
+                    try:
+                        for image_id, result_data, error_msg, cached in cache_service.iter_scores(pending, evaluator_type, score_mode):
+                            if error_msg:
+                                logger.error(f"[后台线程] 评分图片 {image_id} 失败: {error_msg}")
                                 continue
-                            
-                            # 调用ArtiMuse接口
-                            with open(file_path, 'rb') as f:
-                                files = {'image': f}
-                                response = requests.post(
-                                    api_url,
-                                    files=files,
-                                    timeout=300
-                                )
-                            
-                            if response.status_code == 200:
-                                try:
-                                    result_data = response.json()
-                                except json.JSONDecodeError as e:
-                                    logger.error(f"[后台线程] 评分图片 {image.id} 失败: 无法解析JSON响应 - {response.text[:200]}")
-                                    continue
-                                
-                                score = result_data.get('score') or result_data.get('aesthetic_score')
-                                
+                            try:
+                                score = extract_score(result_data)
                                 if score is None:
-                                    logger.warning(f"[后台线程] 评分图片 {image.id} 响应中没有score字段，响应数据: {result_data}")
+                                    logger.warning(f"[后台线程] 评分图片 {image_id} 响应中没有score字段，响应数据: {result_data}")
                                     # 仍然保存响应数据，但score为None
                                 else:
-                                    logger.info(f"[后台线程] 图片 {image.id} 评分成功: {score}")
-                                
-                                # 验证image.id不为None
-                                if not image.id:
-                                    logger.error(f"[后台线程] 图片对象没有ID，无法保存评分结果")
-                                    continue
+                                    logger.info(f"[后台线程] 图片 {image_id} 评分成功: {score}{'（缓存）' if cached else ''}")
                                 
+                                details_json = json.dumps(result_data, ensure_ascii=False)
                                 # 再次检查是否已经评分过（防止并发问题）
-                                existing_score_check = AestheticScore.query.filter_by(
+                                existing_score_id = db.session.query(AestheticScore.id).filter_by(
                                     style_id=style_id,
-                                    image_id=image.id,
+                                    image_id=image_id,
                                     evaluator_type=evaluator_type
-                                ).first()
+                                ).scalar()
                                 
-                                if existing_score_check:
-                                    # 验证existing_score_check的image_id不为None
-                                    if existing_score_check.image_id is None:
-                                        logger.warning(f"[后台线程] 发现image_id为None的记录（ID: {existing_score_check.id}），删除并重新创建")
-                                        db.session.delete(existing_score_check)
-                                        db.session.commit()
-                                        # 创建新记录
-                                        aesthetic_score = AestheticScore(
-                                            style_id=style_id,
-                                            image_id=image.id,
-                                            evaluator_type=evaluator_type,
+                                if existing_score_id:
+                                    # 使用SQL直接更新，明确指定所有字段
+                                    db.session.execute(
+                                        update(AestheticScore)
+                                        .where(AestheticScore.id == existing_score_id)
+                                        .values(
                                             score=score,
-                                            details_json=json.dumps(result_data, ensure_ascii=False)
+                                            details_json=details_json,
+                                            image_id=image_id,
+                                            style_id=style_id
                                         )
-                                        db.session.add(aesthetic_score)
-                                    else:
-                                        # 如果已存在且image_id有效，使用SQL直接更新，避免SQLAlchemy自动刷新问题
-                                        try:
-                                            # 刷新对象以确保获取最新状态
-                                            db.session.refresh(existing_score_check)
-                                            # 验证image_id不为None
-                                            if existing_score_check.image_id is None:
-                                                logger.warning(f"[后台线程] 记录ID {existing_score_check.id} 的image_id为None，删除并重新创建")
-                                                db.session.delete(existing_score_check)
-                                                db.session.flush()
-                                                aesthetic_score = AestheticScore(
-                                                    style_id=style_id,
-                                                    image_id=image.id,
-                                                    evaluator_type=evaluator_type,
-                                                    score=score,
-                                                    details_json=json.dumps(result_data, ensure_ascii=False)
-                                                )
-                                                db.session.add(aesthetic_score)
-                                            else:
-                                                # 使用SQL直接更新，明确指定所有字段
-                                                db.session.execute(
-                                                    update(AestheticScore)
-                                                    .where(AestheticScore.id == existing_score_check.id)
-                                                    .values(
-                                                        score=score,
-                                                        details_json=json.dumps(result_data, ensure_ascii=False),
-                                                        image_id=image.id,  # 明确设置image_id
-                                                        style_id=style_id   # 明确设置style_id
-                                                    )
-                                                )
-                                                logger.info(f"[后台线程] 更新已存在的评分记录，图片 {image.id}")
-                                        except Exception as e:
-                                            logger.error(f"[后台线程] 更新评分记录失败: {str(e)}")
-                                            # 如果更新失败，删除旧记录并创建新记录
-                                            try:
-                                                db.session.delete(existing_score_check)
-                                                db.session.flush()
-                                            except:
-                                                pass
-                                            aesthetic_score = AestheticScore(
-                                                style_id=style_id,
-                                                image_id=image.id,
-                                                evaluator_type=evaluator_type,
-                                                score=score,
-                                                details_json=json.dumps(result_data, ensure_ascii=False)
-                                            )
-                                            db.session.add(aesthetic_score)
+                                    )
+                                    logger.info(f"[后台线程] 更新已存在的评分记录，图片 {image_id}")
                                 else:
                                     # 保存评分结果
-                                    aesthetic_score = AestheticScore(
+                                    db.session.add(AestheticScore(
                                         style_id=style_id,
-                                        image_id=image.id,
+                                        image_id=image_id,
                                         evaluator_type=evaluator_type,
                                         score=score,
-                                        details_json=json.dumps(result_data, ensure_ascii=False)
-                                    )
-                                    db.session.add(aesthetic_score)
+                                        details_json=details_json
+                                    ))
                                 
                                 processed_count += 1
-                                
-                                # 每处理一张图片就更新进度
-                                db.session.commit()
-                                
-                                # 重新查询style对象并更新进度
-                                db.session.refresh(style_obj)
                                 style_obj.processed_image_count = processed_count
                                 db.session.commit()
-                                
                                 logger.info(f"[后台线程] 进度更新: {processed_count}/{total_images}")
-                                
-                                # 每处理10张图片提交一次评分结果（批量提交优化）
-                                if processed_count % 10 == 0:
-                                    logger.info(f"[后台线程] 已处理 {processed_count} 张图片，批量提交中...")
-                            else:
-                                logger.error(f"[后台线程] 评分图片 {image.id} 失败: HTTP {response.status_code} - {response.text[:200]}")
-                                continue
-                        except requests.exceptions.ConnectionError as e:
-                            logger.error(f"[后台线程] 评分图片 {image.id} 失败: 无法连接到ArtiMuse服务 (http://localhost:5001)，请确保服务正在运行")
-                            # 如果连接失败，停止后续处理
-                            logger.error("[后台线程] ArtiMuse服务不可用，停止美学评分任务")
-                            break
-                        except requests.exceptions.Timeout as e:
-                            logger.error(f"[后台线程] 评分图片 {image.id} 失败: 请求超时（超过300秒）")
-                            continue
-                        except Exception as e:
-                            logger.error(f"[后台线程] 评分图片 {image.id} 失败: {str(e)}")
-                            import traceback
-                            logger.error(traceback.format_exc())
-                            continue
+                            except Exception as e:
+                                db.session.rollback()
+                                logger.error(f"[后台线程] 保存图片 {image_id} 评分结果失败: {str(e)}")
+                                import traceback
+                                logger.error(traceback.format_exc())
+                    except ScorerUnavailableError as e:
+                        # 评分服务熔断：保存已完成的进度后中止，不按完成处理
+                        # （风格没有评分任务状态字段，已处理数小于总数即表示未完成，重新启动会跳过已评分的图片）
+                        db.session.refresh(style_obj)
+                        style_obj.processed_image_count = processed_count
+                        db.session.commit()
+                        logger.error(f"[后台线程] ArtiMuse服务不可用，风格 {style_id} 美学评分任务已中止，已处理 {processed_count}/{total_images} 张图片: {e}")
+                        return
                     
                     # 最终提交
                     db.session.commit()
@@ -26,3 +26,40 @@ class Config:
     # 图片存储路径
     IMAGE_STORAGE_PATH = os.getenv('IMAGE_STORAGE_PATH', './storage/images')
 
+    # ArtiMuse美学评分服务配置
+    ARTIMUSE_BASE_URL = os.getenv('ARTIMUSE_BASE_URL', 'http://localhost:5001')
+    ARTIMUSE_MAX_CONCURRENCY = int(os.getenv('ARTIMUSE_MAX_CONCURRENCY', 4))
+    ARTIMUSE_TIMEOUT = int(os.getenv('ARTIMUSE_TIMEOUT', 300))
+    ARTIMUSE_MAX_RETRIES = int(os.getenv('ARTIMUSE_MAX_RETRIES', 2))
+    # 评分器版本（参与评分缓存的键，升级评分模型后修改即可使旧缓存失效）
+    ARTIMUSE_SCORER_VERSION = os.getenv('ARTIMUSE_SCORER_VERSION', 'v1')
+    # 上传给评分服务前的预处理：最长边（0表示不处理，直接上传原图）、编码格式（JPEG/WEBP）和质量
+    ARTIMUSE_PAYLOAD_MAX_SIDE = int(os.getenv('ARTIMUSE_PAYLOAD_MAX_SIDE', 1024))
+    ARTIMUSE_PAYLOAD_FORMAT = os.getenv('ARTIMUSE_PAYLOAD_FORMAT', 'JPEG').upper()
+    ARTIMUSE_PAYLOAD_QUALITY = int(os.getenv('ARTIMUSE_PAYLOAD_QUALITY', 90))
+
+    # 数据清洗分析图片的并发进程数（不超过CPU核数；0表示使用全部CPU核数，1表示在任务线程中逐张分析）
+    # 每个进程各自加载一份检测模型（MTCNN、EAST等），内存随进程数成倍增长，默认最多4个进程
+    CLEANING_MAX_WORKERS = int(os.getenv('CLEANING_MAX_WORKERS', 4))
+    # 数据清洗级联检测（需显式开启）：按检测器耗时从低到高检测，任一特征匹配即回收、不再运行其余检测器
+    # （默认False：每张图片运行全部检测器，日志中保留完整检测详情，用于核查）
+    CLEANING_STOP_ON_MATCH = os.getenv('CLEANING_STOP_ON_MATCH', 'False').lower() == 'true'
+    # 数据清洗分析图片时的最长边（JPEG在解码时直接缩小，检测框换算回原图坐标；0表示按原图分辨率分析）
+    CLEANING_ANALYSIS_MAX_SIDE = int(os.getenv('CLEANING_ANALYSIS_MAX_SIDE', 1200))
+
+    # 大模型打标配置（阿里云百炼OpenAI兼容接口，可指向本地桩服务测试）
+    DASHSCOPE_BASE_URL = os.getenv('DASHSCOPE_BASE_URL', 'https://dashscope.aliyuncs.com/compatible-mode/v1')
+    TAGGING_MODEL = os.getenv('TAGGING_MODEL', 'qwen-vl-max')
+    # 批量打标的并发请求数（1表示逐张串行）
+    TAGGING_MAX_CONCURRENCY = int(os.getenv('TAGGING_MAX_CONCURRENCY', 4))
+    # 批量打标每次请求发送的图片数（1表示每次请求一张；>1时多图共用一份prompt，结果不合法的图片逐张重试）
+    TAGGING_BATCH_SIZE = int(os.getenv('TAGGING_BATCH_SIZE', 1))
+    # 大模型接口配额：每分钟请求数（0表示不限流）和允许的突发请求数
+    TAGGING_RATE_LIMIT_RPM = float(os.getenv('TAGGING_RATE_LIMIT_RPM', 0))
+    TAGGING_RATE_LIMIT_BURST = int(os.getenv('TAGGING_RATE_LIMIT_BURST', 4))
+    # 打标响应缓存有效期（天，0表示不缓存）；修改特征定义或模型后缓存键会自动变化
+    TAGGING_RESPONSE_CACHE_TTL_DAYS = float(os.getenv('TAGGING_RESPONSE_CACHE_TTL_DAYS', 30))
+    # 上传给大模型前的预处理：最长边（0表示不处理，直接上传原图）、编码格式（JPEG/WEBP）和质量
+    TAGGING_PAYLOAD_MAX_SIDE = int(os.getenv('TAGGING_PAYLOAD_MAX_SIDE', 1280))
+    TAGGING_PAYLOAD_FORMAT = os.getenv('TAGGING_PAYLOAD_FORMAT', 'JPEG').upper()
+    TAGGING_PAYLOAD_QUALITY = int(os.getenv('TAGGING_PAYLOAD_QUALITY', 85))
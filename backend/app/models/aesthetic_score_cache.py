@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from app.database import db
+from datetime import datetime
+import json
+
+class AestheticScoreCache(db.Model):
+    """美学评分缓存模型（按图片内容哈希共享，跨风格、样本图片和LUT应用后图片）"""
+    __tablename__ = 'aesthetic_score_cache'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment='主键ID')
+    content_hash = db.Column(db.String(64), nullable=False, comment='图片内容哈希值（SHA256）')
+    evaluator_type = db.Column(db.String(50), nullable=False, comment='评分器类型：artimuse, q_insight')
+    score_mode = db.Column(db.String(50), nullable=False, comment='评分模式：score_only, score_and_reason')
+    scorer_version = db.Column(db.String(50), nullable=False, comment='评分器版本')
+    score = db.Column(db.Numeric(10, 4), comment='美学评分分数')
+    details_json = db.Column(db.Text, comment='接口返回的详细信息JSON')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, comment='创建时间')
+    
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'evaluator_type', 'score_mode', 'scorer_version', name='uk_content_evaluator_mode_version'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        details_data = None
+        if self.details_json:
+            try:
+                details_data = json.loads(self.details_json) if isinstance(self.details_json, str) else self.details_json
+            except:
+                details_data = None
+        
+        return {
+            'id': self.id,
+            'content_hash': self.content_hash,
+            'evaluator_type': self.evaluator_type,
+            'score_mode': self.score_mode,
+            'scorer_version': self.scorer_version,
+            'score': float(self.score) if self.score is not None else None,
+            'details': details_data,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
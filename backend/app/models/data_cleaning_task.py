@@ -12,6 +12,7 @@ class DataCleaningTask(db.Model):
     status = db.Column(db.String(50), nullable=False, default='pending', comment='状态：pending, running, paused, completed, failed')
     processed_count = db.Column(db.Integer, nullable=False, default=0, comment='任务处理总数')
     total_count = db.Column(db.Integer, nullable=False, default=0, comment='需要清洗的图片总数')
+    last_image_id = db.Column(db.Integer, comment='断点：最后处理完成的图片ID（按ID顺序处理，续跑时从该ID之后继续）')
     note = db.Column(db.Text, comment='备注')
     last_error = db.Column(db.Text, comment='最后错误信息')
     started_at = db.Column(db.DateTime, comment='开始时间')
@@ -28,6 +29,7 @@ class DataCleaningTask(db.Model):
             'filter_keywords': json.loads(self.filter_keywords) if self.filter_keywords else [],
             'status': self.status,
             'processed_count': self.processed_count,
+            'last_image_id': self.last_image_id,
             'total_count': self.total_count,
             'note': self.note or '',
             'last_error': self.last_error or '',
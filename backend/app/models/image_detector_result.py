@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from app.database import db
+from datetime import datetime
+import json
+
+class ImageDetectorResult(db.Model):
+    """图片检测器结果缓存模型（按图片内容哈希共享，存储检测器的原始结果，供数据清洗重复使用）"""
+    __tablename__ = 'image_detector_results'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment='主键ID')
+    image_hash = db.Column(db.String(64), nullable=False, comment='图片内容哈希值（SHA256）')
+    detector = db.Column(db.String(50), nullable=False, comment='检测器：face, person, text, blur')
+    detector_version = db.Column(db.String(50), nullable=False, comment='检测器算法版本')
+    params_hash = db.Column(db.String(64), nullable=False, comment='检测参数哈希值（SHA256）')
+    params_json = db.Column(db.Text, comment='检测参数JSON')
+    result_json = db.Column(db.Text, nullable=False, comment='检测原始结果JSON（数量、位置、分数等）')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, comment='创建时间')
+    
+    __table_args__ = (
+        db.UniqueConstraint('image_hash', 'detector', 'detector_version', 'params_hash', name='uk_hash_detector_version_params'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        params_data = None
+        result_data = None
+        try:
+            params_data = json.loads(self.params_json) if self.params_json else None
+        except:
+            params_data = None
+        try:
+            result_data = json.loads(self.result_json) if self.result_json else None
+        except:
+            result_data = None
+        
+        return {
+            'id': self.id,
+            'image_hash': self.image_hash,
+            'detector': self.detector,
+            'detector_version': self.detector_version,
+            'params_hash': self.params_hash,
+            'params': params_data,
+            'result': result_data,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
@@ -46,6 +46,7 @@ class LutAppliedImage(db.Model):
     width = db.Column(db.Integer, comment='图片宽度')
     height = db.Column(db.Integer, comment='图片高度')
     format = db.Column(db.String(20), comment='图片格式')
+    is_lazy = db.Column(db.Boolean, nullable=False, default=False, comment='是否懒加载（首次访问时渲染并放入磁盘缓存）')
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, comment='创建时间')
     
     # 关联关系
@@ -66,6 +67,7 @@ class LutAppliedImage(db.Model):
             'width': self.width,
             'height': self.height,
             'format': self.format,
+            'is_lazy': self.is_lazy,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
 
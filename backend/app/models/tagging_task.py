@@ -13,6 +13,7 @@ class TaggingTask(db.Model):
     filter_keywords = db.Column(db.Text, comment='筛选条件关键字JSON，关键字列表')
     total_count = db.Column(db.Integer, nullable=False, default=0, comment='总图片数')
     processed_count = db.Column(db.Integer, nullable=False, default=0, comment='已处理图片数')
+    last_image_id = db.Column(db.Integer, comment='断点：最后处理完成的图片ID（按ID顺序处理，续跑时从该ID之后继续）')
     status = db.Column(db.String(50), nullable=False, default='pending', comment='状态：pending, running, paused, interrupted, completed, failed')
     note = db.Column(db.Text, comment='备注')
     last_error = db.Column(db.Text, comment='最后错误信息')
@@ -31,6 +32,7 @@ class TaggingTask(db.Model):
             'filter_keywords': json.loads(self.filter_keywords) if self.filter_keywords else [],
             'total_count': self.total_count,
             'processed_count': self.processed_count,
+            'last_image_id': self.last_image_id,
             'progress': round((self.processed_count / self.total_count * 100), 2) if self.total_count > 0 else 0,
             'status': self.status,
             'note': self.note or '',
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+美学评分缓存服务
+按 (内容哈希, 评分器类型, 评分模式, 评分器版本+上传图片处理参数) 缓存评分结果，所有评分路径在调用评分服务前先查询缓存。
+由 aesthetic_score_cache 表持久化，并带一层进程内LRU热缓存。
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from app.config import Config
+from app.database import db
+from app.models.aesthetic_score_cache import AestheticScoreCache
+from app.services.aesthetic_scorer_client import get_scorer_client, extract_score
+
+logger = logging.getLogger(__name__)
+
+# 进程内热缓存
+_HOT_CACHE_MAX = 10000
+_hot_cache = OrderedDict()
+_hot_cache_lock = threading.Lock()
+
+# 批量查询缓存时每次IN查询的哈希数量
+LOOKUP_CHUNK_SIZE = 500
+
+def _compatible_modes(score_mode: str) -> List[str]:
+    """可以满足该评分模式的缓存模式（带理由的评分结果同样包含分数）"""
+    if score_mode == 'score_only':
+        return ['score_only', 'score_and_reason']
+    return [score_mode]
+
+class AestheticScoreCacheService:
+    """美学评分缓存服务类"""
+    
+    def __init__(self, scorer_version: Optional[str] = None):
+        """
+        Args:
+            scorer_version: 缓存使用的评分器版本，默认为配置的评分器版本加上传图片的处理参数
+                （分辨率、格式、质量会影响评分结果）
+        """
+        if scorer_version is None:
+            preprocessor = get_scorer_client().preprocessor
+            scorer_version = f"{Config.ARTIMUSE_SCORER_VERSION}:{preprocessor.version_tag}"
+        self.scorer_version = scorer_version
+    
+    def _hot_get(self, content_hash, evaluator_type, score_mode):
+        with _hot_cache_lock:
+            for mode in _compatible_modes(score_mode):
+                key = (content_hash, evaluator_type, mode, self.scorer_version)
+                result_data = _hot_cache.get(key)
+                if result_data is not None:
+                    _hot_cache.move_to_end(key)
+                    return result_data
+        return None
+    
+    def _hot_put(self, content_hash, evaluator_type, score_mode, result_data):
+        with _hot_cache_lock:
+            key = (content_hash, evaluator_type, score_mode, self.scorer_version)
+            _hot_cache[key] = result_data
+            _hot_cache.move_to_end(key)
+            while len(_hot_cache) > _HOT_CACHE_MAX:
+                _hot_cache.popitem(last=False)
+    
+    def get_many(self, content_hashes: Iterable[str], evaluator_type: str, score_mode: str) -> Dict[str, Dict]:
+        """
+        批量查询缓存
+        
+        Returns:
+            {内容哈希: 评分结果JSON}，只包含命中的哈希
+        """
+        hits = {}
+        missing = []
+        for content_hash in set(h for h in content_hashes if h):
+            result_data = self._hot_get(content_hash, evaluator_type, score_mode)
+            if result_data is not None:
+                hits[content_hash] = result_data
+            else:
+                missing.append(content_hash)
+        
+        modes = _compatible_modes(score_mode)
+        for i in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+            chunk = missing[i:i + LOOKUP_CHUNK_SIZE]
+            rows = db.session.query(
+                AestheticScoreCache.content_hash, AestheticScoreCache.score_mode, AestheticScoreCache.details_json
+            ).filter(
+                AestheticScoreCache.content_hash.in_(chunk),
+                AestheticScoreCache.evaluator_type == evaluator_type,
+                AestheticScoreCache.score_mode.in_(modes),
+                AestheticScoreCache.scorer_version == self.scorer_version
+            ).all()
+            for row in rows:
+                if row.content_hash in hits:
+                    continue
+                try:
+                    result_data = json.loads(row.details_json) if row.details_json else None
+                except json.JSONDecodeError:
+                    result_data = None
+                if result_data is None:
+                    continue
+                hits[row.content_hash] = result_data
+                self._hot_put(row.content_hash, evaluator_type, row.score_mode, result_data)
+        
+        return hits
+    
+    def get(self, content_hash: Optional[str], evaluator_type: str, score_mode: str) -> Optional[Dict]:
+        """查询单个缓存"""
+        if not content_hash:
+            return None
+        return self.get_many([content_hash], evaluator_type, score_mode).get(content_hash)
+    
+    def put(self, content_hash: Optional[str], evaluator_type: str, score_mode: str, result_data: Dict):
+        """
+        写入缓存（在当前会话中执行，由调用方提交）
+        """
+        if not content_hash or not result_data:
+            return
+        details_json = json.dumps(result_data, ensure_ascii=False)
+        stmt = mysql_insert(AestheticScoreCache).values(
+            content_hash=content_hash,
+            evaluator_type=evaluator_type,
+            score_mode=score_mode,
+            scorer_version=self.scorer_version,
+            score=extract_score(result_data),
+            details_json=details_json
+        )
+        stmt = stmt.on_duplicate_key_update(score=stmt.inserted.score, details_json=stmt.inserted.details_json)
+        db.session.execute(stmt)
+        self._hot_put(content_hash, evaluator_type, score_mode, result_data)
+    
+    def score_image(self, content_hash: Optional[str], image_path: str, evaluator_type: str,
+                    score_mode: str) -> Tuple[Optional[Dict], Optional[str], bool]:
+        """
+        对单张图片评分，优先使用缓存
+        
+        Returns:
+            (评分结果JSON, 错误信息, 是否命中缓存)
+        """
+        result_data = self.get(content_hash, evaluator_type, score_mode)
+        if result_data is not None:
+            return result_data, None, True
+        
+        result_data, error_msg = get_scorer_client().score_image(image_path, score_mode, content_hash)
+        if not error_msg and extract_score(result_data) is not None:
+            self.put(content_hash, evaluator_type, score_mode, result_data)
+        return result_data, error_msg, False
+    
+    def iter_scores(self, items: Iterable[Tuple[object, Optional[str], object]], evaluator_type: str,
+                    score_mode: str, chunk_size: int = 200) -> Iterator[Tuple[object, Optional[Dict], Optional[str], bool]]:
+        """
+        批量评分，优先使用缓存；同一内容在一批中只评分一次，结果分发给所有对应的key
+        
+        必须在应用上下文中调用（缓存查询和写入使用当前数据库会话，由调用方提交）。
+        
+        Args:
+            items: (key, 内容哈希, 图片路径) 迭代器；图片路径也可以是无参函数，只在缓存未命中时调用
+            evaluator_type: 评分器类型
+            score_mode: 评分模式
+            chunk_size: 每批查询缓存的数量
+            
+        Yields:
+            (key, 评分结果JSON, 错误信息, 是否命中缓存)
+            
+        Raises:
+            ScorerUnavailableError: 评分服务熔断时
+        """
+        scorer = get_scorer_client()
+        items_iter = iter(items)
+        
+        while True:
+            chunk = []
+            for item in items_iter:
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    break
+            if not chunk:
+                break
+            
+            hits = self.get_many([content_hash for _, content_hash, _ in chunk], evaluator_type, score_mode)
+            
+            # 未命中的按内容分组，同一内容只评分一次
+            groups = OrderedDict()
+            for key, content_hash, image_path in chunk:
+                if content_hash and content_hash in hits:
+                    yield key, hits[content_hash], None, True
+                    continue
+                group_key = content_hash or ('key', key)
+                if group_key not in groups:
+                    groups[group_key] = {'content_hash': content_hash, 'image_path': image_path, 'keys': []}
+                groups[group_key]['keys'].append(key)
+            
+            if not groups:
+                continue
+            
+            def pending():
+                for group_key, group in groups.items():
+                    image_path = group['image_path']
+                    if callable(image_path):
+                        image_path = image_path()
+                    yield group_key, image_path, group['content_hash']
+            
+            for group_key, result_data, error_msg in scorer.iter_scores(pending(), score_mode):
+                group = groups[group_key]
+                if not error_msg and extract_score(result_data) is not None:
+                    self.put(group['content_hash'], evaluator_type, score_mode, result_data)
+                for key in group['keys']:
+                    yield key, result_data, error_msg, False
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+ArtiMuse美学评分客户端
+复用keep-alive连接，支持有界并发、失败重试（指数退避）和熔断；
+上传前将图片缩放、重新编码为评分服务所需的尺寸，并按内容哈希缓存
+"""
+import os
+import time
+import json
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import Config
+from app.utils.config_manager import get_scorer_payload_cache_max_bytes
+from app.utils.image_payload import ImagePayloadPreprocessor
+
+logger = logging.getLogger(__name__)
+
+# 评分模式对应的接口路径
+SCORE_MODE_ENDPOINTS = {
+    'score_only': '/api/evaluate_score',
+    'score_and_reason': '/api/evaluate'
+}
+
+class ScorerUnavailableError(Exception):
+    """评分服务不可用（熔断打开）"""
+    pass
+
+class ScorerPayloadPreprocessor(ImagePayloadPreprocessor):
+    """评分上传预处理：按评分服务配置的分辨率缩放并重新编码，结果按内容哈希缓存"""
+    
+    def __init__(self, max_side: Optional[int] = None, fmt: Optional[str] = None, quality: Optional[int] = None):
+        super().__init__(
+            'scorer_payloads',
+            Config.ARTIMUSE_PAYLOAD_MAX_SIDE if max_side is None else max_side,
+            fmt or Config.ARTIMUSE_PAYLOAD_FORMAT,
+            quality or Config.ARTIMUSE_PAYLOAD_QUALITY,
+            get_scorer_payload_cache_max_bytes
+        )
+
+class AestheticScorerClient:
+    """ArtiMuse美学评分客户端"""
+    
+    def __init__(self, base_url: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 timeout: Optional[int] = None, max_retries: Optional[int] = None,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            base_url: 评分服务地址
+            max_concurrency: 最大并发请求数
+            timeout: 单次请求超时（秒）
+            max_retries: 连接错误/超时/5xx时的最大重试次数
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断后多少秒允许再次尝试
+        """
+        self.base_url = (base_url or Config.ARTIMUSE_BASE_URL).rstrip('/')
+        self.max_concurrency = max(1, max_concurrency or Config.ARTIMUSE_MAX_CONCURRENCY)
+        self.timeout = timeout or Config.ARTIMUSE_TIMEOUT
+        self.max_retries = Config.ARTIMUSE_MAX_RETRIES if max_retries is None else max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.preprocessor = ScorerPayloadPreprocessor()
+        
+        # keep-alive会话，连接池大小与并发数一致
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # 熔断状态
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False  # 半开状态下是否已有试探请求在途
+    
+    def get_api_url(self, score_mode: str) -> str:
+        """根据评分模式获取接口地址"""
+        return self.base_url + SCORE_MODE_ENDPOINTS.get(score_mode, SCORE_MODE_ENDPOINTS['score_and_reason'])
+    
+    @property
+    def circuit_open(self) -> bool:
+        """熔断是否打开（打开期间请求直接失败，超过reset_timeout后进入半开状态）"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            return time.time() - self._opened_at < self.reset_timeout
+    
+    def _acquire_request(self) -> Tuple[bool, bool]:
+        """
+        判断是否放行请求
+        
+        熔断关闭时全部放行；打开期间全部拒绝；超过reset_timeout后（半开）只放行一个试探请求，
+        其余请求在试探成功之前继续被拒绝
+        
+        Returns:
+            (是否放行, 是否为试探请求)
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True, False
+            if time.time() - self._opened_at < self.reset_timeout or self._probe_in_flight:
+                return False, False
+            self._probe_in_flight = True
+            return True, True
+    
+    def _release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def _record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+    
+    def _record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.error(f"ArtiMuse服务连续失败 {self._consecutive_failures} 次，熔断 {self.reset_timeout} 秒")
+                self._opened_at = time.time()
+    
+    def score_image(self, image_path: str, score_mode: str = 'score_and_reason',
+                    content_hash: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        对单张图片评分
+        
+        Args:
+            image_path: 图片路径
+            score_mode: 评分模式 score_only / score_and_reason
+            content_hash: 图片内容哈希（用于缓存预处理结果），为空时计算
+            
+        Returns:
+            (评分结果JSON, 错误信息)
+            
+        Raises:
+            ScorerUnavailableError: 熔断打开时
+        """
+        allowed, probe = self._acquire_request()
+        if not allowed:
+            raise ScorerUnavailableError(f"ArtiMuse服务不可用 ({self.base_url})，已熔断")
+        try:
+            return self._score_image(image_path, score_mode, content_hash, probe)
+        finally:
+            if probe:
+                self._release_probe()
+    
+    def _score_image(self, image_path: str, score_mode: str, content_hash: Optional[str],
+                     probe: bool) -> Tuple[Optional[Dict], Optional[str]]:
+        """发送评分请求（试探请求只发送一次，失败后重新熔断）"""
+        api_url = self.get_api_url(score_mode)
+        last_error = None
+        
+        # 缩放、重新编码后再上传
+        upload_path = self.preprocessor.prepare(image_path, content_hash)
+        
+        for attempt in range(1 if probe else self.max_retries + 1):
+            if attempt > 0:
+                # 指数退避：1s, 2s, 4s...
+                time.sleep(min(2 ** (attempt - 1), 30))
+            try:
+                with open(upload_path, 'rb') as f:
+                    response = self.session.post(
+                        api_url,
+                        files={'image': (os.path.basename(upload_path), f)},
+                        timeout=self.timeout
+                    )
+            except requests.exceptions.ConnectionError:
+                last_error = f"无法连接到ArtiMuse服务 ({self.base_url})，请确保服务正在运行"
+                self._record_failure()
+                if self.circuit_open:
+                    break
+                continue
+            except requests.exceptions.Timeout:
+                last_error = f"请求超时（超过{self.timeout}秒）"
+                self._record_failure()
+                if self.circuit_open:
+                    break
+                continue
+            except requests.exceptions.RequestException as e:
+                # 其他请求错误（如响应传输中断）只影响这张图片，不重试
+                return None, f"请求ArtiMuse服务失败: {str(e)}"
+            except OSError as e:
+                # 读取上传文件失败（例如文件已被删除）
+                return None, f"读取图片失败: {str(e)}"
+            
+            if response.status_code >= 500:
+                last_error = f"HTTP {response.status_code} - {response.text[:200]}"
+                self._record_failure()
+                if self.circuit_open:
+                    break
+                continue
+            
+            # 服务可达，4xx属于请求本身的问题，不重试
+            self._record_success()
+            if response.status_code != 200:
+                return None, f"HTTP {response.status_code} - {response.text[:200]}"
+            try:
+                return response.json(), None
+            except json.JSONDecodeError:
+                return None, f"无法解析JSON响应 - {response.text[:200]}"
+        
+        return None, last_error
+    
+    def iter_scores(self, items: Iterable[Tuple],
+                    score_mode: str = 'score_and_reason') -> Iterator[Tuple[object, Optional[Dict], Optional[str]]]:
+        """
+        批量评分：以有界并发提交，按完成顺序返回结果
+        
+        items在调用方线程中逐个读取（可以是生成器，便于在应用上下文中按需准备图片），
+        同时在途的请求不超过max_concurrency个。
+        
+        Args:
+            items: (key, 图片路径) 或 (key, 图片路径, 内容哈希) 迭代器，图片路径为None时直接返回错误
+            score_mode: 评分模式
+            
+        Yields:
+            (key, 评分结果JSON, 错误信息)
+            
+        Raises:
+            ScorerUnavailableError: 熔断打开时（已完成的结果会先全部返回）
+        """
+        items_iter = iter(items)
+        ready = deque()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='AestheticScorer') as executor:
+            in_flight = {}
+            exhausted = False
+            unavailable = None
+            
+            while True:
+                # 补充在途请求
+                while not exhausted and unavailable is None and len(in_flight) < self.max_concurrency:
+                    try:
+                        item = next(items_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    key, image_path = item[0], item[1]
+                    content_hash = item[2] if len(item) > 2 else None
+                    if not image_path:
+                        ready.append((key, None, '图片文件不存在'))
+                        continue
+                    future = executor.submit(self.score_image, image_path, score_mode, content_hash)
+                    in_flight[future] = key
+                
+                while ready:
+                    yield ready.popleft()
+                
+                if not in_flight:
+                    break
+                
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = in_flight.pop(future)
+                    try:
+                        result_data, error_msg = future.result()
+                    except ScorerUnavailableError as e:
+                        unavailable = e
+                        continue
+                    except Exception as e:
+                        # 单张图片的意外错误不影响其余图片
+                        logger.error(f"评分图片失败 key={key}: {e}", exc_info=True)
+                        result_data, error_msg = None, str(e)
+                    yield key, result_data, error_msg
+            
+            if unavailable is not None:
+                raise unavailable
+
+_scorer_client = None
+_scorer_client_lock = threading.Lock()
+
+def get_scorer_client() -> AestheticScorerClient:
+    """获取进程共享的ArtiMuse评分客户端"""
+    global _scorer_client
+    with _scorer_client_lock:
+        if _scorer_client is None:
+            _scorer_client = AestheticScorerClient()
+        return _scorer_client
+
+def extract_score(result_data: Optional[Dict]):
+    """从评分结果中提取分数"""
+    if not result_data:
+        return None
+    return result_data.get('score') or result_data.get('aesthetic_score')
@@ -7,27 +7,45 @@ import os
 import json
 import logging
 import threading
-from datetime import datetime
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, List
+from app.config import Config
 from app.database import db
 from app.models.image import Image
 from app.models.tagging_task import TaggingTask
 from app.models.feature import Feature
-from app.models.image_tagging_result import ImageTaggingResult
-from app.models.image_tagging_result_detail import ImageTaggingResultDetail
 from app.models.image_tagging_result_history import ImageTaggingResultHistory
 from app.services.image_tagging_service import ImageTaggingService
+from app.services.tagging_result_writer import TaggingResultWriter
 from app.utils.config_manager import get_local_image_dir
+from app.utils.keyset import iter_id_chunks
 from sqlalchemy import func
 
 logger = logging.getLogger(__name__)
 
+# 每批读取的图片数（同时批量预取这些图片可复用的历史结果）
+TAGGING_PREFETCH_CHUNK_SIZE = 500
+# 任务内按图片内容去重时最多记住的打标调用数
+TAGGING_CONTENT_DEDUPE_SIZE = 10000
+# 检查任务状态（是否被中断）的最小间隔（秒）
+TASK_STATUS_POLL_INTERVAL = 2.0
+
 class BatchTaggingService:
     """批量打标服务类"""
     
-    def __init__(self):
-        """初始化服务"""
+    def __init__(self, max_concurrency: int = None, batch_size: int = None):
+        """
+        初始化服务
+        
+        Args:
+            max_concurrency: 并发调用大模型的数量，默认读取配置TAGGING_MAX_CONCURRENCY
+            batch_size: 每次请求发送的图片数（>1时启用多图批量打标），默认读取配置TAGGING_BATCH_SIZE
+        """
         self.tagging_service = ImageTaggingService()
+        self.max_concurrency = max(1, max_concurrency or Config.TAGGING_MAX_CONCURRENCY)
+        self.batch_size = max(1, batch_size or Config.TAGGING_BATCH_SIZE)
     
     def _get_image_absolute_path(self, image: Image) -> str:
         """
@@ -79,6 +97,258 @@ class BatchTaggingService:
             logger.error(f"获取图片路径失败 image_id={image.id}: {e}", exc_info=True)
             return None
     
+    def _is_task_interrupted(self, task_id: int) -> bool:
+        """检查任务是否已被中断（或已被删除）"""
+        # 先结束当前事务，避免在REPEATABLE READ下读到旧快照
+        db.session.commit()
+        status = db.session.query(TaggingTask.status).filter(TaggingTask.id == task_id).scalar()
+        return status is None or status == 'interrupted'
+    
+    def _prefetch_history(self, task_id: int, image_ids: List[int], feature_ids: List[int]) -> Dict:
+        """
+        批量预取一批图片可复用的历史打标结果
+        
+        Returns:
+            Dict: image_id -> {feature_id -> {tagging_value, source_task_id}}
+        """
+        # 每个图片每个特征的最新打标结果（排除当前任务）
+        history_subquery = db.session.query(
+            ImageTaggingResultHistory.image_id,
+            ImageTaggingResultHistory.feature_id,
+            func.max(ImageTaggingResultHistory.created_at).label('max_created_at')
+        ).filter(
+            ImageTaggingResultHistory.image_id.in_(image_ids),
+            ImageTaggingResultHistory.feature_id.in_(feature_ids),
+            ImageTaggingResultHistory.tagging_task_id != task_id
+        ).group_by(
+            ImageTaggingResultHistory.image_id,
+            ImageTaggingResultHistory.feature_id
+        ).subquery()
+        
+        history_rows = db.session.query(
+            ImageTaggingResultHistory.image_id,
+            ImageTaggingResultHistory.feature_id,
+            ImageTaggingResultHistory.tagging_value,
+            ImageTaggingResultHistory.tagging_task_id,
+            ImageTaggingResultHistory.source_task_id
+        ).join(
+            history_subquery,
+            db.and_(
+                ImageTaggingResultHistory.image_id == history_subquery.c.image_id,
+                ImageTaggingResultHistory.feature_id == history_subquery.c.feature_id,
+                ImageTaggingResultHistory.created_at == history_subquery.c.max_created_at
+            )
+        ).filter(
+            ImageTaggingResultHistory.tagging_task_id != task_id
+        ).all()
+        
+        history = {}
+        for row in history_rows:
+            # source_task_id：如果历史记录有source_task_id，说明是复用的，使用source_task_id；否则使用tagging_task_id（原始打标）
+            history.setdefault(row.image_id, {})[row.feature_id] = {
+                'tagging_value': row.tagging_value,
+                'source_task_id': row.source_task_id if row.source_task_id else row.tagging_task_id
+            }
+        
+        return history
+    
+    def _submit_image(self, executor: ThreadPoolExecutor, idx: int, total_count: int,
+                      image, tagging_features: List[Dict], prefetched_history: Dict,
+                      content_futures: OrderedDict, batch_buffers: Dict) -> Dict:
+        """
+        准备单张图片（路径、可复用的历史结果），需要调用大模型时提交到线程池
+        
+        Args:
+            prefetched_history: 当前批次预取的历史结果（见_prefetch_history），取用后从中移除
+            content_futures: 本任务内 (image_hash, 待打标特征ID) -> 打标调用，内容相同的图片共用一次调用
+            batch_buffers: 多图批量打标时按待打标特征分组、尚未提交的图片（见_submit_batch）
+        
+        Returns:
+            Dict: 待完成的条目，future为None表示无需调用大模型
+        """
+        entry = {
+            'idx': idx,
+            'image_id': image.id,
+            'image_path': None,
+            'features_reused': {},
+            'future': None,
+            'shared': False,  # 是否复用了本任务内相同内容图片的打标调用
+            'error': None
+        }
+        try:
+            # 获取图片绝对路径
+            image_path = self._get_image_absolute_path(image)
+            if not image_path:
+                logger.warning(f"跳过图片（文件不存在）: image_id={image.id}, storage_path={image.storage_path}")
+                return entry
+            entry['image_path'] = image_path
+            
+            # 记录图片路径
+            logger.info(f"[{idx + 1}/{total_count}] 开始打标图片: image_id={image.id}, path={image_path}")
+            
+            # 检查历史记录，看是否有该图片该特征的打标结果可以复用
+            history_map = prefetched_history.pop(image.id, {})
+            
+            # 检查哪些特征需要重新打标，哪些可以复用
+            features_to_tag = []  # 需要打标的特征
+            for feature in tagging_features:
+                feature_id = feature['id']
+                if feature_id in history_map:
+                    # 可以复用历史记录
+                    entry['features_reused'][feature_id] = history_map[feature_id]
+                    logger.info(f"复用历史打标结果: image_id={image.id}, feature_id={feature_id}, source_task_id={history_map[feature_id]['source_task_id']}")
+                else:
+                    # 需要重新打标
+                    features_to_tag.append(feature)
+            
+            if features_to_tag:
+                # 相同内容（image_hash）且待打标特征相同的图片只调用一次大模型
+                content_key = None
+                if image.image_hash:
+                    content_key = (image.image_hash, tuple(f['id'] for f in features_to_tag))
+                    future = content_futures.get(content_key)
+                    if future is not None:
+                        content_futures.move_to_end(content_key)
+                        entry['future'] = future
+                        entry['shared'] = True
+                        logger.info(f"图片内容与本任务已打标图片相同，复用打标调用: image_id={image.id}, image_hash={image.image_hash}")
+                        return entry
+                
+                # 调用打标服务（只打标需要打标的特征）
+                if self.batch_size > 1:
+                    # 攒够batch_size张待打标特征相同的图片后一次请求
+                    entry['future'] = Future()
+                    feature_key = tuple(f['id'] for f in features_to_tag)
+                    buffer = batch_buffers.setdefault(feature_key, {'features': features_to_tag, 'items': []})
+                    buffer['items'].append((entry['future'], image_path, image.image_hash))
+                    if len(buffer['items']) >= self.batch_size:
+                        self._submit_batch(executor, batch_buffers.pop(feature_key))
+                else:
+                    entry['future'] = executor.submit(self.tagging_service.tag_image, image_path, features_to_tag, image.image_hash)
+                if content_key is not None:
+                    content_futures[content_key] = entry['future']
+                    while len(content_futures) > TAGGING_CONTENT_DEDUPE_SIZE:
+                        content_futures.popitem(last=False)
+            else:
+                # 所有特征都可以复用，不需要调用AI
+                logger.info(f"所有特征都复用历史记录，跳过AI打标: image_id={image.id}")
+        except Exception as e:
+            entry['error'] = str(e)
+            logger.error(f"准备打标图片失败: image_id={image.id}, error={e}", exc_info=True)
+        return entry
+    
+    def _submit_batch(self, executor: ThreadPoolExecutor, buffer: Dict):
+        """提交一批待打标特征相同的图片，完成后把结果分发给每张图片的future"""
+        items = buffer['items']
+        batch_future = executor.submit(
+            self.tagging_service.tag_images,
+            [(image_path, content_hash) for _, image_path, content_hash in items],
+            buffer['features']
+        )
+        
+        def distribute(done_future):
+            try:
+                results = done_future.result()
+            except Exception as e:
+                results = [{'success': False, 'error': str(e), 'result': {}}] * len(items)
+            for (item_future, _, _), result in zip(items, results):
+                item_future.set_result(result)
+        
+        batch_future.add_done_callback(distribute)
+    
+    def _flush_batches(self, executor: ThreadPoolExecutor, batch_buffers: Dict):
+        """提交所有未攒满的批次"""
+        for feature_key in list(batch_buffers.keys()):
+            self._submit_batch(executor, batch_buffers.pop(feature_key))
+    
+    def _finish_entry(self, writer: TaggingResultWriter, entry: Dict, tagging_features: List[Dict], stats: Dict):
+        """
+        按提交顺序完成一张图片：等待大模型结果，将结果和处理进度交给写入器
+        """
+        image_id = entry['image_id']
+        try:
+            if entry['error']:
+                raise Exception(entry['error'])
+            
+            if not entry['image_path']:
+                stats['skipped'] += 1
+            else:
+                # 如果有需要打标的特征，等待打标服务返回
+                result_data = {}
+                tagging_failed = False
+                if entry['future'] is not None:
+                    tagging_result = entry['future'].result()
+                    if not tagging_result['success']:
+                        tagging_failed = True
+                        stats['failed'] += 1
+                        error_msg = tagging_result.get('error', '未知错误')
+                        stats['errors'].append({
+                            'image_id': image_id,
+                            'error': error_msg
+                        })
+                        logger.error(f"图片打标失败: image_id={image_id}, error={error_msg}")
+                    else:
+                        # 共用的调用结果会分发给多张图片，复制一份再合并
+                        result_data = dict(tagging_result['result'])
+                        if tagging_result.get('cached') and not entry['shared']:
+                            stats['cached'] += 1
+                
+                if not tagging_failed:
+                    # 合并打标结果（新打标的结果 + 复用的历史结果）
+                    feature_names = {f['id']: f['name'] for f in tagging_features}
+                    for feature_id, hist_data in entry['features_reused'].items():
+                        feature_name = feature_names.get(feature_id)
+                        if feature_name:
+                            result_data[feature_name] = hist_data['tagging_value']
+                    
+                    # 复用本任务内相同内容图片的结果时，新打标特征的来源任务记为当前任务
+                    writer.add(image_id, tagging_features, result_data, entry['features_reused'],
+                               source_task_id=writer.task_id if entry['shared'] else None)
+                    stats['success'] += 1
+                    if entry['shared']:
+                        stats['deduplicated'] += 1
+                    stats['processed'] += 1
+                    
+                    # 记录复用信息
+                    if entry['features_reused']:
+                        logger.info(f"图片打标完成（复用 {len(entry['features_reused'])} 个特征）: image_id={image_id}")
+                    logger.info(f"图片打标成功: image_id={image_id}")
+            
+        except Exception as e:
+            stats['failed'] += 1
+            stats['processed'] += 1
+            error_msg = str(e)
+            stats['errors'].append({
+                'image_id': image_id,
+                'error': error_msg
+            })
+            logger.error(f"处理图片失败: {e}", exc_info=True)
+        
+        # 更新处理计数，与缓冲的结果在同一事务中提交
+        writer.advance(entry['idx'] + 1, entry['image_id'])
+        if writer.should_flush():
+            self._flush_writer(writer, stats)
+    
+    def _flush_writer(self, writer: TaggingResultWriter, stats: Dict):
+        """
+        写入缓冲的打标结果，失败时将这批图片计为失败并停止任务
+        
+        写入失败的图片没有落库，断点（last_image_id）停留在上一次成功写入的位置；
+        如果继续处理，下一次成功写入会把断点推进到这批图片之后，续跑时就不会再处理它们
+        
+        Raises:
+            Exception: 写入失败
+        """
+        image_ids = writer.pending_image_ids
+        try:
+            writer.flush()
+        except Exception as e:
+            stats['success'] -= len(image_ids)
+            stats['failed'] += len(image_ids)
+            stats['errors'].extend({'image_id': image_id, 'error': str(e)} for image_id in image_ids)
+            logger.error(f"批量写入打标结果失败，停止任务: images={len(image_ids)}, error={e}", exc_info=True)
+            raise Exception(f"批量写入打标结果失败，已停止任务，续跑将从上次成功写入的位置继续: {e}") from e
+    
     def execute_tagging_task(self, task_id: int) -> Dict:
         """
         执行打标任务
@@ -107,9 +377,10 @@ class BatchTaggingService:
             
             # 如果任务是被中断的，从上次中断的位置继续
             start_index = 0
-            if task.status == 'interrupted':
+            resuming = task.status == 'interrupted'
+            if resuming:
                 # 从已处理的图片数继续
-                start_index = task.processed_count
+                start_index = task.processed_count or 0
                 logger.info(f"重启中断的任务: task_id={task_id}, 从第 {start_index + 1} 张图片开始")
             
             # 更新任务状态
@@ -169,19 +440,27 @@ class BatchTaggingService:
                 keyword_filters = db.or_(*[Image.keyword.like(f'%{kw}%') for kw in filter_keywords])
                 query = query.filter(keyword_filters)
             
-            images = query.all()
-            total_count = len(images)
+            total_count = query.count()
             
             keyword_info = filter_keywords if filter_keywords is not None else '全部'
             logger.info(f"打标任务 {task_id}: 关键字={keyword_info}, 找到 {total_count} 张符合条件的图片")
             
-            # 更新任务总数（如果是重启中断的任务，保持总数不变）
-            if task.status != 'interrupted':
-                task.total_count = total_count
+            # 按图片ID顺序处理，续跑时从最后处理完成的图片ID之后继续
+            start_after_id = None
+            if resuming:
+                start_after_id = task.last_image_id
+                if start_after_id is None and start_index > 0:
+                    # 旧任务没有记录last_image_id，按已处理数量换算
+                    row = query.with_entities(Image.id).order_by(Image.id).offset(start_index - 1).limit(1).first()
+                    start_after_id = row.id if row else None
+                    if start_after_id is None:
+                        start_index = 0
+            
+            # 更新任务总数（如果是重启中断的任务，保持已处理进度）
+            task.total_count = total_count
+            if not resuming:
                 task.processed_count = 0
-            else:
-                # 重启中断的任务，确保总数一致
-                task.total_count = total_count
+                task.last_image_id = None
             task.status = 'running'
             task.started_at = db.func.now()
             task.finished_at = None
@@ -195,6 +474,8 @@ class BatchTaggingService:
                 'success': 0,
                 'failed': 0,
                 'skipped': 0,
+                'deduplicated': 0,
+                'cached': 0,
                 'errors': []
             }
             
@@ -202,208 +483,73 @@ class BatchTaggingService:
             if start_index > 0:
                 logger.info(f"重启中断的任务，已处理 {start_index} 张图片，继续处理剩余 {total_count - start_index} 张")
             
-            # 处理每张图片（从start_index开始）
-            for idx, image in enumerate(images[start_index:], start=start_index):
-                try:
-                    # 检查任务是否被中断（每次循环都检查）
-                    task = TaggingTask.query.get(task_id)
-                    if not task or task.status == 'interrupted':
-                        logger.info(f"打标任务被中断: task_id={task_id}, 已处理 {idx}/{total_count} 张图片")
-                        # 更新任务状态
-                        if task:
-                            task.status = 'interrupted'
-                            task.finished_at = db.func.now()
-                            task.last_error = '任务被用户中断'
-                            db.session.commit()
-                        return {
-                            'success': False,
-                            'message': '任务已被中断',
-                            'stats': stats
-                        }
-                    
-                    # 更新处理计数
-                    task.processed_count = idx + 1
-                    db.session.commit()
-                    
-                    # 获取图片绝对路径
-                    image_path = self._get_image_absolute_path(image)
-                    if not image_path:
-                        stats['skipped'] += 1
-                        logger.warning(f"跳过图片（文件不存在）: image_id={image.id}, storage_path={image.storage_path}")
-                        continue
-                    
-                    # 记录图片路径
-                    logger.info(f"[{idx + 1}/{total_count}] 开始打标图片: image_id={image.id}, path={image_path}")
-                    
-                    # 检查历史记录，看是否有该图片该特征的打标结果可以复用
-                    feature_ids = [f['id'] for f in tagging_features]
-                    
-                    # 查询历史记录：每个图片每个特征的最新打标结果（排除当前任务）
-                    # 使用子查询获取每个特征的最新记录
-                    history_subquery = db.session.query(
-                        ImageTaggingResultHistory.feature_id,
-                        func.max(ImageTaggingResultHistory.created_at).label('max_created_at')
-                    ).filter(
-                        ImageTaggingResultHistory.image_id == image.id,
-                        ImageTaggingResultHistory.feature_id.in_(feature_ids),
-                        ImageTaggingResultHistory.tagging_task_id != task_id
-                    ).group_by(
-                        ImageTaggingResultHistory.feature_id
-                    ).subquery()
-                    
-                    history_records = db.session.query(ImageTaggingResultHistory).join(
-                        history_subquery,
-                        db.and_(
-                            ImageTaggingResultHistory.feature_id == history_subquery.c.feature_id,
-                            ImageTaggingResultHistory.created_at == history_subquery.c.max_created_at,
-                            ImageTaggingResultHistory.image_id == image.id,
-                            ImageTaggingResultHistory.tagging_task_id != task_id
-                        )
-                    ).all()
-                    
-                    # 构建历史记录映射：feature_id -> {tagging_value, source_task_id}
-                    history_map = {}
-                    for hist in history_records:
-                        # source_task_id：如果历史记录有source_task_id，说明是复用的，使用source_task_id；否则使用tagging_task_id（原始打标）
-                        source_task_id = hist.source_task_id if hist.source_task_id else hist.tagging_task_id
-                        history_map[hist.feature_id] = {
-                            'tagging_value': hist.tagging_value,
-                            'source_task_id': source_task_id,
-                            'history_record': hist  # 保存历史记录对象，用于后续使用
-                        }
-                    
-                    # 检查哪些特征需要重新打标，哪些可以复用
-                    features_to_tag = []  # 需要打标的特征
-                    features_reused = {}  # 可以复用的特征 {feature_id: {tagging_value, source_task_id}}
-                    
-                    for feature in tagging_features:
-                        feature_id = feature['id']
-                        if feature_id in history_map:
-                            # 可以复用历史记录
-                            features_reused[feature_id] = history_map[feature_id]
-                            logger.info(f"复用历史打标结果: image_id={image.id}, feature_id={feature_id}, source_task_id={history_map[feature_id]['source_task_id']}")
-                        else:
-                            # 需要重新打标
-                            features_to_tag.append(feature)
-                    
-                    # 如果有需要打标的特征，调用打标服务
-                    result_data = {}
-                    if features_to_tag:
-                        # 调用打标服务（只打标需要打标的特征）
-                        tagging_result = self.tagging_service.tag_image(image_path, features_to_tag)
-                        
-                        if not tagging_result['success']:
-                            stats['failed'] += 1
-                            error_msg = tagging_result.get('error', '未知错误')
-                            stats['errors'].append({
-                                'image_id': image.id,
-                                'error': error_msg
-                            })
-                            logger.error(f"图片打标失败: image_id={image.id}, error={error_msg}")
-                            continue
-                        
-                        result_data = tagging_result['result']
-                    else:
-                        # 所有特征都可以复用，不需要调用AI
-                        logger.info(f"所有特征都复用历史记录，跳过AI打标: image_id={image.id}")
-                    
-                    # 合并打标结果（新打标的结果 + 复用的历史结果）
-                    for feature_id, hist_data in features_reused.items():
-                        feature_name = None
-                        for f in tagging_features:
-                            if f['id'] == feature_id:
-                                feature_name = f['name']
-                                break
-                        if feature_name:
-                            result_data[feature_name] = hist_data['tagging_value']
-                    
-                    result_json_str = json.dumps(result_data, ensure_ascii=False)
-                    
-                    # 1. 更新或创建汇总记录（image_tagging_results）
-                    summary_result = ImageTaggingResult.query.filter_by(image_id=image.id).first()
-                    if summary_result:
-                        # 更新现有汇总记录
-                        summary_result.last_tagging_task_id = task_id
-                        summary_result.tagging_result_json = result_json_str
-                        summary_result.updated_at = datetime.now()
-                    else:
-                        # 创建新汇总记录
-                        summary_result = ImageTaggingResult(
-                            image_id=image.id,
-                            last_tagging_task_id=task_id,
-                            tagging_result_json=result_json_str
-                        )
-                        db.session.add(summary_result)
-                    
-                    # 2. 为每个特征保存或更新明细记录（image_tagging_results_detail）
-                    for feature in tagging_features:
-                        feature_id = feature['id']
-                        feature_name = feature['name']
-                        
-                        # 获取该特征的值
-                        feature_value = result_data.get(feature_name, None)
-                        
-                        # 判断是复用还是新打标
-                        is_reused = feature_id in features_reused
-                        # 如果是复用的，source_task_id是原始任务ID；如果是新打标的，source_task_id为None（表示是当前任务打标的）
-                        if is_reused:
-                            source_task_id = features_reused[feature_id]['source_task_id']
-                        else:
-                            source_task_id = None  # 新打标，没有来源任务
-                        
-                        # 检查是否已存在明细记录
-                        existing_detail = ImageTaggingResultDetail.query.filter_by(
-                            image_id=image.id,
-                            feature_id=feature_id
-                        ).first()
-                        
-                        if existing_detail:
-                            # 更新现有明细记录（只更新最后打标任务ID和值）
-                            existing_detail.tagging_value = str(feature_value) if feature_value is not None else None
-                            existing_detail.last_tagging_task_id = task_id
-                            existing_detail.updated_at = datetime.now()
+            logger.info(f"打标任务 {task_id}: 并发数={self.max_concurrency}, 每次请求图片数={self.batch_size}")
+            
+            # 按图片ID顺序处理每张图片（从last_image_id之后开始）
+            # 大模型调用提交到线程池并发执行，结果按图片顺序依次落库并推进processed_count和last_image_id，
+            # 保证中断后从last_image_id继续时不会遗漏或重复
+            pending = deque()
+            window = self.max_concurrency * self.batch_size * 2  # 最多预先提交的图片数
+            executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f'tagging-{task_id}')
+            feature_ids = [f['id'] for f in tagging_features]
+            writer = TaggingResultWriter(task_id)
+            content_futures = OrderedDict()
+            batch_buffers = {}
+            try:
+                # 只查询需要的列，按ID分批读取，内存占用与图片总数无关
+                image_chunks = iter_id_chunks(
+                    query.with_entities(Image.id, Image.storage_path, Image.image_hash),
+                    Image.id, start_after_id, TAGGING_PREFETCH_CHUNK_SIZE
+                )
+                idx = start_index
+                last_poll = None
+                for chunk in image_chunks:
+                    # 每批图片开始时，批量预取可复用的历史结果
+                    prefetched_history = self._prefetch_history(task_id, [row.id for row in chunk], feature_ids)
+                    for image in chunk:
+                        # 检查任务是否被中断（按时间间隔查询，避免每张图片都查询一次数据库）
+                        now = time.monotonic()
+                        if last_poll is None or now - last_poll >= TASK_STATUS_POLL_INTERVAL:
+                            last_poll = now
+                            interrupted = self._is_task_interrupted(task_id)
                         else:
-                            # 创建新明细记录
-                            new_detail = ImageTaggingResultDetail(
-                                image_id=image.id,
-                                feature_id=feature_id,
-                                tagging_value=str(feature_value) if feature_value is not None else None,
-                                last_tagging_task_id=task_id
-                            )
-                            db.session.add(new_detail)
-                        
-                        # 3. 保存历史记录（image_tagging_results_history）
-                        history_record = ImageTaggingResultHistory(
-                            tagging_task_id=task_id,
-                            image_id=image.id,
-                            feature_id=feature_id,
-                            tagging_value=str(feature_value) if feature_value is not None else None,
-                            source_task_id=source_task_id  # 如果是复用的，记录原始任务ID
-                        )
-                        db.session.add(history_record)
+                            interrupted = False
+                        if interrupted:
+                            # 已提交的请求会继续完成并保存，避免浪费已发出的调用
+                            self._flush_batches(executor, batch_buffers)
+                            while pending:
+                                self._finish_entry(writer, pending.popleft(), tagging_features, stats)
+                            self._flush_writer(writer, stats)
+                            logger.info(f"打标任务被中断: task_id={task_id}, 已处理 {stats['processed']}/{total_count} 张图片")
+                            task = TaggingTask.query.get(task_id)
+                            if task:
+                                task.status = 'interrupted'
+                                task.finished_at = db.func.now()
+                                task.last_error = '任务被用户中断'
+                                db.session.commit()
+                            return {
+                                'success': False,
+                                'message': '任务已被中断',
+                                'stats': stats
+                            }
                     
-                    # 提交数据库更改
-                    db.session.commit()
-                    stats['success'] += 1
-                    stats['processed'] += 1
+                        pending.append(self._submit_image(executor, idx, total_count, image, tagging_features,
+                                                          prefetched_history, content_futures, batch_buffers))
+                        idx += 1
                     
-                    # 记录复用信息
-                    if features_reused:
-                        reused_count = len(features_reused)
-                        logger.info(f"图片打标完成（复用 {reused_count} 个特征）: image_id={image.id}")
-                    
-                    logger.info(f"图片打标成功: image_id={image.id}")
-                    
-                except Exception as e:
-                    stats['failed'] += 1
-                    stats['processed'] += 1
-                    error_msg = str(e)
-                    stats['errors'].append({
-                        'image_id': image.id if 'image' in locals() else None,
-                        'error': error_msg
-                    })
-                    logger.error(f"处理图片失败: {e}", exc_info=True)
-                    db.session.rollback()
+                        # 队首已完成的结果立即落库；预提交数量达到上限时提交未攒满的批次并阻塞等待队首
+                        if len(pending) > window:
+                            self._flush_batches(executor, batch_buffers)
+                        while pending and (len(pending) > window or pending[0]['future'] is None or pending[0]['future'].done()):
+                            self._finish_entry(writer, pending.popleft(), tagging_features, stats)
+                
+                self._flush_batches(executor, batch_buffers)
+                while pending:
+                    self._finish_entry(writer, pending.popleft(), tagging_features, stats)
+                self._flush_writer(writer, stats)
+            finally:
+                # 异常退出时取消尚未开始的请求
+                executor.shutdown(wait=True, cancel_futures=True)
             
             # 更新任务状态（如果任务没有被中断）
             task = TaggingTask.query.get(task_id)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+数据清洗图片分析执行器
+把图片分析分发到进程池并发执行（人脸、文字、人物检测都是CPU密集型），
+每个工作进程各自加载一份检测模型；数据库操作仍由主进程完成
+"""
+import os
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内的图片分析服务（每个进程一份，检测模型在首次使用时加载）
+_worker_analysis = None
+
+def _init_worker():
+    global _worker_analysis
+    from app.services.image_analysis_service import ImageAnalysisService
+    _worker_analysis = ImageAnalysisService()
+
+def _analyze_in_worker(image_path: str, filter_features: List[str], stop_on_match: bool,
+                       cached_results: Optional[Dict[str, Dict]]) -> Dict:
+    return _worker_analysis.analyze_image(image_path, filter_features, stop_on_match=stop_on_match,
+                                          cached_results=cached_results)
+
+def resolve_cleaning_workers(max_workers: Optional[int] = None) -> int:
+    """清洗并发进程数：未指定时读取配置，0表示使用全部CPU核数，不超过CPU核数"""
+    if max_workers is None:
+        from app.config import Config
+        max_workers = Config.CLEANING_MAX_WORKERS
+    cpu_count = os.cpu_count() or 1
+    if max_workers <= 0:
+        return cpu_count
+    return min(max_workers, cpu_count)
+
+class CleaningExecutor:
+    """
+    图片分析执行器
+
+    max_workers > 1 时使用进程池（spawn方式启动，避免在后台线程中fork带锁的进程状态），
+    否则在当前进程中直接分析
+    """
+
+    def __init__(self, analysis_service, max_workers: int = 1, stop_on_match: bool = False):
+        """
+        Args:
+            analysis_service: 单进程模式下使用的图片分析服务
+            max_workers: 工作进程数
+            stop_on_match: 是否使用级联检测（任一特征匹配即停止）
+        """
+        self.analysis_service = analysis_service
+        self.max_workers = max_workers
+        self.stop_on_match = stop_on_match
+        self._pool = None
+        if max_workers > 1:
+            self._pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+            logger.info(f"清洗任务使用进程池分析图片: workers={max_workers}")
+
+    @property
+    def window(self) -> int:
+        """最多预先提交的图片数"""
+        return self.max_workers * 2
+
+    def submit(self, image_path: str, filter_features: List[str],
+               cached_results: Optional[Dict[str, Dict]] = None) -> Future:
+        """
+        提交一张图片的分析，返回Future（单进程模式下直接分析，返回已完成的Future）
+
+        cached_results为已缓存的检测器原始结果，这些检测器不再重新检测
+        """
+        if self._pool is not None:
+            return self._pool.submit(_analyze_in_worker, image_path, list(filter_features), self.stop_on_match,
+                                     cached_results)
+        future = Future()
+        try:
+            future.set_result(self.analysis_service.analyze_image(image_path, filter_features,
+                                                                  stop_on_match=self.stop_on_match,
+                                                                  cached_results=cached_results))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self):
+        if self._pool is not None:
+            # 未开始的分析直接取消（任务被重置时不再等待）
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
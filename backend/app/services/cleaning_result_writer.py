@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+清洗结果批量写入器
+跨图片缓冲待回收的图片，按批移动到回收站（每个清洗原因一条 INSERT ... SELECT，加一条 DELETE）；
+新检测出的检测器原始结果同样缓冲，随同一批次用多行 INSERT 写入检测结果缓存
+"""
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+from app.database import db
+from app.models.data_cleaning_task import DataCleaningTask
+from app.services.image_recycle_service import recycle_images
+from app.services.detector_result_cache_service import DetectorResultCacheService
+
+logger = logging.getLogger(__name__)
+
+class CleaningResultWriter:
+    """
+    清洗结果批量写入器
+
+    每次flush在同一个事务中移动缓冲的图片并推进任务的processed_count和last_image_id，
+    任务中断或进程退出时未flush的图片不会计入进度，重新执行时会重新分析
+    """
+
+    def __init__(self, task_id: int, batch_size: int = 200, flush_interval: float = 2.0,
+                 detector_cache: Optional[DetectorResultCacheService] = None):
+        """
+        Args:
+            task_id: 清洗任务ID
+            batch_size: 缓冲的待回收图片数（或检测结果缓存行数）达到该值时写入
+            flush_interval: 距上次写入超过该秒数时写入（保证进度及时更新）
+            detector_cache: 检测结果缓存服务，为空时不缓存检测结果
+        """
+        self.task_id = task_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.detector_cache = detector_cache
+        self._recycles = []
+        self._detector_rows = []
+        self._processed_count = None
+        self._last_image_id = None
+        self._last_flush = time.monotonic()
+
+    @property
+    def pending_recycles(self) -> List[Tuple[int, str]]:
+        """已缓冲、尚未移动的图片 (图片ID, 清洗原因)"""
+        return list(self._recycles)
+
+    def add(self, image_id: int, reason: str):
+        """缓冲一张待回收的图片"""
+        self._recycles.append((image_id, reason))
+
+    def add_detector_results(self, image_hash: Optional[str], detector_results: Dict[str, Dict]):
+        """缓冲一张图片新检测出的检测器原始结果"""
+        if self.detector_cache is not None:
+            self._detector_rows.extend(self.detector_cache.build_rows(image_hash, detector_results))
+
+    def advance(self, processed_count: int, last_image_id: Optional[int] = None):
+        """记录按顺序处理到的位置（已处理数量和最后一张图片ID），随下一次flush一起提交"""
+        self._processed_count = processed_count
+        if last_image_id is not None:
+            self._last_image_id = last_image_id
+
+    def should_flush(self) -> bool:
+        if len(self._recycles) >= self.batch_size or len(self._detector_rows) >= self.batch_size:
+            return True
+        return self._processed_count is not None and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self) -> int:
+        """
+        在一个事务中移动缓冲的图片并写入处理进度（任务已不是running状态时不再写入进度，
+        避免覆盖重置后的断点）
+
+        Returns:
+            int: 移动到回收站的图片数量
+
+        Raises:
+            Exception: 写入失败时回滚并抛出，缓冲会被清空，由调用方统计失败；
+                这批图片和进度都没有落库，调用方应停止任务，避免之后的写入把断点推进到它们之后
+        """
+        if not self._recycles and not self._detector_rows and self._processed_count is None:
+            return 0
+
+        try:
+            # 同一清洗原因的图片用一条 INSERT ... SELECT 移动
+            by_reason: Dict[str, List[int]] = {}
+            for image_id, reason in self._recycles:
+                by_reason.setdefault(reason, []).append(image_id)
+            recycled = 0
+            for reason, image_ids in by_reason.items():
+                recycled += recycle_images(image_ids, self.task_id, reason)
+
+            if self._detector_rows:
+                self.detector_cache.put_many(self._detector_rows)
+
+            if self._processed_count is not None:
+                progress = {'processed_count': self._processed_count}
+                if self._last_image_id is not None:
+                    progress['last_image_id'] = self._last_image_id
+                DataCleaningTask.query.filter_by(id=self.task_id, status='running').update(
+                    progress, synchronize_session=False
+                )
+
+            db.session.commit()
+            logger.debug(f"清洗结果批量写入: task_id={self.task_id}, recycled={recycled}, detector_rows={len(self._detector_rows)}, processed_count={self._processed_count}, last_image_id={self._last_image_id}")
+            return recycled
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            self._recycles = []
+            self._detector_rows = []
+            self._processed_count = None
+            self._last_image_id = None
+            self._last_flush = time.monotonic()
@@ -5,27 +5,43 @@
 """
 import os
 import json
+import time
 import logging
+from collections import deque
 from datetime import datetime
 from typing import List, Dict, Optional
 from sqlalchemy import or_
 
+from app.config import Config
 from app.database import db
 from app.models.image import Image
-from app.models.image_recycle import ImageRecycle
 from app.models.data_cleaning_task import DataCleaningTask
-from app.services.image_analysis_service import ImageAnalysisService
+from app.services.image_analysis_service import ImageAnalysisService, DETECTOR_FEATURES
+from app.services.cleaning_executor import CleaningExecutor, resolve_cleaning_workers
+from app.services.cleaning_result_writer import CleaningResultWriter
+from app.services.detector_result_cache_service import DetectorResultCacheService
 from app.utils.config_manager import get_local_image_dir
+from app.utils.keyset import iter_id_chunks
 
 logger = logging.getLogger(__name__)
 
+# 检查任务状态（是否被重置）的最小间隔（秒）
+TASK_STATUS_POLL_INTERVAL = 2.0
+
 class DataCleaningService:
     """数据清洗服务类"""
     
-    def __init__(self):
-        """初始化服务"""
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        初始化服务
+        
+        Args:
+            max_workers: 分析图片的并发进程数，默认读取配置CLEANING_MAX_WORKERS
+        """
         self.image_analysis = ImageAnalysisService()
+        self.detector_cache = DetectorResultCacheService()
         self.storage_base = get_local_image_dir()
+        self.max_workers = max_workers
     
     def _get_image_absolute_path(self, image: Image) -> Optional[str]:
         """
@@ -56,57 +72,6 @@ class DataCleaningService:
             logger.error(f"获取图片路径失败: {e}", exc_info=True)
             return None
     
-    def _move_to_recycle(self, image: Image, task_id: int, reason: str) -> bool:
-        """
-        将图片移动到回收站
-        
-        Args:
-            image: Image对象
-            task_id: 清洗任务ID
-            reason: 清洗原因
-            
-        Returns:
-            bool: 是否成功
-        """
-        try:
-            # 创建回收站记录
-            recycle_data = {
-                'original_image_id': image.id,
-                'filename': image.filename,
-                'storage_path': image.storage_path,
-                'original_url': image.original_url,
-                'status': 'recycled',
-                'created_at': image.created_at,
-                'storage_mode': image.storage_mode,
-                'source_site': image.source_site,
-                'keyword': image.keyword,
-                'hash_tags_json': image.hash_tags_json,
-                'visit_url': image.visit_url,
-                'image_hash': image.image_hash,
-                'width': image.width,
-                'height': image.height,
-                'format': image.format,
-                'cleaning_task_id': task_id,
-                'cleaning_reason': reason,
-                'recycled_at': datetime.now()
-            }
-            
-            recycle_obj = ImageRecycle(**recycle_data)
-            db.session.add(recycle_obj)
-            
-            # 从images表删除
-            db.session.delete(image)
-            
-            db.session.commit()
-            
-            logger.info(f"图片已移动到回收站: image_id={image.id}, reason={reason}")
-            return True
-            
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"移动图片到回收站失败: {e}", exc_info=True)
-            return False
-    
     def _get_filter_keywords(self, task: DataCleaningTask) -> Optional[List[str]]:
         """
         获取任务的筛选关键字列表
@@ -154,6 +119,123 @@ class DataCleaningService:
             logger.error(f"解析筛选特征失败: {e}", exc_info=True)
             return []
     
+    def _submit_image(self, executor: CleaningExecutor, idx: int, total_count: int, image: Image,
+                      filter_features: List[str], cached_results: Optional[Dict[str, Dict]] = None) -> Dict:
+        """
+        提交一张图片的分析
+        
+        Args:
+            cached_results: 该图片已缓存的检测器原始结果
+        
+        Returns:
+            Dict: 待处理条目 {idx, image_id, image_hash, image_path, future}，文件不存在时image_path和future为None
+        """
+        entry = {
+            'idx': idx,
+            'image_id': image.id,
+            'image_hash': image.image_hash,
+            'image_path': None,
+            'future': None
+        }
+        
+        # 获取图片绝对路径
+        image_path = self._get_image_absolute_path(image)
+        if not image_path:
+            logger.warning(f"跳过图片（文件不存在）: image_id={image.id}, storage_path={image.storage_path}")
+            return entry
+        
+        # 记录图片路径
+        logger.info(f"[{idx + 1}/{total_count}] 开始分析图片: image_id={image.id}, path={image_path}")
+        
+        # 分析图片
+        entry['image_path'] = image_path
+        entry['future'] = executor.submit(image_path, filter_features, cached_results)
+        return entry
+    
+    def _is_task_stopped(self, task_id: int) -> bool:
+        """检查任务是否已不在运行（被重置或已被删除）"""
+        # 先结束当前事务，避免在REPEATABLE READ下读到旧快照
+        db.session.commit()
+        status = db.session.query(DataCleaningTask.status).filter(DataCleaningTask.id == task_id).scalar()
+        return status != 'running'
+    
+    def _finish_image(self, writer: CleaningResultWriter, entry: Dict, stats: Dict):
+        """按顺序处理一张图片的分析结果：匹配时加入回收批次，然后推进处理进度和断点"""
+        image_id = entry['image_id']
+        image_path = entry['image_path']
+        try:
+            if not image_path:
+                stats['skipped'] += 1
+            else:
+                analysis_result = entry['future'].result()
+                
+                # 缓存新检测出的原始结果（缓冲后随回收和进度批量写入），之后重新清洗时不再重复检测
+                detector_results = analysis_result.pop('detector_results', None)
+                if detector_results:
+                    writer.add_detector_results(entry['image_hash'], detector_results)
+                
+                # 记录完整的分析结果
+                logger.info(f"图片分析结果 - image_id={image_id}, path={image_path}")
+                logger.info(f"  完整分析结果: {json.dumps(analysis_result, ensure_ascii=False, indent=2)}")
+                
+                # 记录分析结果详情
+                matched_features = analysis_result.get('matched_features', [])
+                details = analysis_result.get('details', {})
+                
+                logger.info(f"  匹配特征: {matched_features if matched_features else '无'}")
+                if 'face_count' in details:
+                    logger.info(f"  人脸数量: {details['face_count']}")
+                if 'has_text' in details:
+                    logger.info(f"  包含文字: {details['has_text']}")
+                if 'is_blur' in details:
+                    logger.info(f"  是否模糊: {details['is_blur']}, 模糊度值: {details.get('blur_value', 'N/A')}")
+                
+                # 检查是否匹配筛选条件
+                if matched_features:
+                    # 匹配到筛选条件，加入回收批次（与处理进度一起批量移动到回收站）
+                    reason = ', '.join(matched_features)
+                    writer.add(image_id, reason)
+                    logger.info(f"图片匹配筛选条件，加入回收批次: image_id={image_id}, path={image_path}, reason={reason}")
+                else:
+                    # 不匹配筛选条件，保留
+                    stats['skipped'] += 1
+                    logger.info(f"图片不匹配筛选条件，保留: image_id={image_id}, path={image_path}")
+                
+                stats['processed'] += 1
+            
+        except Exception as e:
+            error_msg = f"处理图片失败 image_id={image_id}: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            stats['errors'].append(error_msg)
+            stats['skipped'] += 1
+        
+        # 更新处理计数和断点（记录已处理完成的图片数和最后一张图片ID，失败后重新执行时从此继续），
+        # 与缓冲的回收在同一事务中提交
+        writer.advance(entry['idx'] + 1, image_id)
+        if writer.should_flush():
+            self._flush_writer(writer, stats)
+    
+    def _flush_writer(self, writer: CleaningResultWriter, stats: Dict):
+        """
+        批量移动缓冲的图片到回收站并写入进度，失败时将这批图片计为错误并停止任务
+        
+        写入失败的图片仍在图片表中，断点（last_image_id）停留在上一次成功写入的位置；
+        如果继续处理，下一次成功写入会把断点推进到这批图片之后，重新执行时就不会再清洗它们
+        
+        Raises:
+            Exception: 写入失败
+        """
+        recycles = writer.pending_recycles
+        try:
+            recycled = writer.flush()
+            stats['recycled'] += recycled
+            if recycled:
+                logger.info(f"✓ 图片已批量回收: {recycled} 张, task_id={writer.task_id}")
+        except Exception as e:
+            stats['errors'].extend(f"image_id={image_id}: 移动到回收站失败" for image_id, _ in recycles)
+            logger.error(f"批量移动图片到回收站失败，停止任务: images={len(recycles)}, error={e}", exc_info=True)
+            raise Exception(f"批量移动图片到回收站失败，已停止任务，重新执行将从上次成功写入的位置继续: {e}") from e
+    
     def execute_cleaning_task(self, task_id: int) -> Dict:
         """
         执行清洗任务
@@ -198,16 +280,23 @@ class DataCleaningService:
                 keyword_conditions = [Image.keyword.like(f'%{kw}%') for kw in filter_keywords]
                 query = query.filter(or_(*keyword_conditions))
             
-            # 获取所有符合条件的图片
-            images = query.all()
-            total_count = len(images)
+            # 失败后重新执行的任务从最后处理完成的图片ID之后继续（重置任务会清空断点）
+            start_after_id = task.last_image_id if task.status != 'pending' else None
+            start_index = (task.processed_count or 0) if start_after_id is not None else 0
+            if start_after_id is not None:
+                # 已处理的图片可能已被回收，总数按已处理数量加剩余数量计算
+                total_count = start_index + query.filter(Image.id > start_after_id).count()
+                logger.info(f"继续执行清洗任务: task_id={task_id}, 从图片ID {start_after_id} 之后继续，已处理 {start_index} 张")
+            else:
+                total_count = query.count()
             
             logger.info(f"找到 {total_count} 张符合条件的图片")
             
             # 更新任务状态和总数量
             task.status = 'running'
             task.started_at = datetime.now()
-            task.processed_count = 0
+            task.processed_count = start_index
+            task.last_image_id = start_after_id
             task.total_count = total_count
             task.last_error = None
             db.session.commit()
@@ -215,81 +304,60 @@ class DataCleaningService:
             # 统计信息
             stats = {
                 'total': total_count,
-                'processed': 0,
+                'processed': start_index,
                 'recycled': 0,
                 'skipped': 0,
                 'errors': []
             }
             
-            # 处理每张图片
-            for idx, image in enumerate(images):
-                try:
-                    # 检查任务状态，如果被重置为pending，停止执行
-                    db.session.refresh(task)
-                    if task.status != 'running':
-                        logger.info(f"任务状态已变为 {task.status}，停止执行: task_id={task_id}")
-                        stats['skipped'] += total_count - idx
-                        break
-                    
-                    # 更新处理计数
-                    task.processed_count = idx + 1
-                    db.session.commit()
-                    
-                    # 获取图片绝对路径
-                    image_path = self._get_image_absolute_path(image)
-                    if not image_path:
-                        stats['skipped'] += 1
-                        logger.warning(f"跳过图片（文件不存在）: image_id={image.id}, storage_path={image.storage_path}")
-                        continue
-                    
-                    # 记录图片路径
-                    logger.info(f"[{idx + 1}/{total_count}] 开始分析图片: image_id={image.id}, path={image_path}")
-                    
-                    # 分析图片
-                    analysis_result = self.image_analysis.analyze_image(image_path, filter_features)
-                    
-                    # 记录完整的分析结果
-                    import json
-                    logger.info(f"图片分析结果 - image_id={image.id}, path={image_path}")
-                    logger.info(f"  完整分析结果: {json.dumps(analysis_result, ensure_ascii=False, indent=2)}")
-                    
-                    # 记录分析结果详情
-                    matched_features = analysis_result.get('matched_features', [])
-                    details = analysis_result.get('details', {})
-                    
-                    logger.info(f"  匹配特征: {matched_features if matched_features else '无'}")
-                    if 'face_count' in details:
-                        logger.info(f"  人脸数量: {details['face_count']}")
-                    if 'has_text' in details:
-                        logger.info(f"  包含文字: {details['has_text']}")
-                    if 'is_blur' in details:
-                        logger.info(f"  是否模糊: {details['is_blur']}, 模糊度值: {details.get('blur_value', 'N/A')}")
-                    
-                    # 检查是否匹配筛选条件
-                    if matched_features:
-                        # 匹配到筛选条件，移动到回收站
-                        reason = ', '.join(matched_features)
-                        logger.info(f"图片匹配筛选条件，准备回收: image_id={image.id}, reason={reason}")
-                        if self._move_to_recycle(image, task_id, reason):
-                            stats['recycled'] += 1
-                            logger.info(f"✓ 图片已回收: image_id={image.id}, path={image_path}, reason={reason}")
-                        else:
-                            error_msg = f"image_id={image.id}: 移动到回收站失败"
-                            stats['errors'].append(error_msg)
-                            logger.error(error_msg)
-                    else:
-                        # 不匹配筛选条件，保留
-                        stats['skipped'] += 1
-                        logger.info(f"图片不匹配筛选条件，保留: image_id={image.id}, path={image_path}")
+            # 按图片ID分批读取并处理每张图片，内存占用与图片总数无关；
+            # 按ID而不是偏移量分页，已回收的图片不会导致后续图片被跳过。
+            # 图片分析分发到进程池并发执行，结果按图片顺序依次处理；待回收的图片和进度按批在同一事务中提交，
+            # 保证断点之前的图片都已处理完成。任务状态按时间间隔检查，不再每张图片查询一次
+            executor = CleaningExecutor(self.image_analysis, resolve_cleaning_workers(self.max_workers),
+                                        stop_on_match=Config.CLEANING_STOP_ON_MATCH)
+            detectors = [name for name, features in DETECTOR_FEATURES.items()
+                         if any(f in filter_features for f in features)]
+            writer = CleaningResultWriter(task_id, detector_cache=self.detector_cache)
+            pending = deque()
+            idx = start_index
+            stopped = False
+            last_poll = None
+            try:
+                for chunk in iter_id_chunks(query, Image.id, start_after_id):
+                    # 批量查询本批图片已缓存的检测结果，只检测缓存中没有的检测器
+                    cached = self.detector_cache.get_many([image.image_hash for image in chunk], detectors)
                     
-                    stats['processed'] += 1
+                    for image in chunk:
+                        # 检查任务状态，如果被重置为pending，停止执行
+                        now = time.monotonic()
+                        if last_poll is None or now - last_poll >= TASK_STATUS_POLL_INTERVAL:
+                            last_poll = now
+                            if self._is_task_stopped(task_id):
+                                logger.info(f"任务已不在运行状态，停止执行: task_id={task_id}")
+                                # 已提交但未处理完的图片也不再处理
+                                stats['skipped'] += total_count - idx + len(pending)
+                                pending.clear()
+                                stopped = True
+                                break
+                        
+                        pending.append(self._submit_image(executor, idx, total_count, image, filter_features,
+                                                          cached.get(image.image_hash)))
+                        idx += 1
+                        
+                        # 队首已完成的结果立即处理；预提交数量达到上限时阻塞等待队首
+                        while pending and (len(pending) > executor.window or pending[0]['future'] is None or pending[0]['future'].done()):
+                            self._finish_image(writer, pending.popleft(), stats)
                     
-                except Exception as e:
-                    error_msg = f"处理图片失败 image_id={image.id}: {str(e)}"
-                    logger.error(error_msg, exc_info=True)
-                    stats['errors'].append(error_msg)
-                    stats['skipped'] += 1
-                    continue
+                    if stopped:
+                        break
+                
+                while pending:
+                    self._finish_image(writer, pending.popleft(), stats)
+                # 任务已被重置时只移动已缓冲的图片，不再写入进度
+                self._flush_writer(writer, stats)
+            finally:
+                executor.shutdown()
             
             # 更新任务状态（如果任务没有被重置）
             db.session.refresh(task)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+图片检测器结果缓存服务
+按 (图片哈希, 检测器, 检测器版本, 检测参数) 缓存检测器的原始结果（数量、位置、分数等），
+数据清洗只检测缓存中没有的检测器；判定阈值作用于原始结果，调整阈值后重新清洗不需要重新检测。
+由 image_detector_results 表持久化。
+"""
+import json
+import hashlib
+import logging
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from app.config import Config
+from app.database import db
+from app.models.image_detector_result import ImageDetectorResult
+from app.services.image_analysis_service import DETECTOR_VERSIONS, get_detector_params
+
+logger = logging.getLogger(__name__)
+
+# 批量查询缓存时每次IN查询的哈希数量
+LOOKUP_CHUNK_SIZE = 500
+# 批量写入缓存时每条INSERT的行数
+WRITE_CHUNK_SIZE = 500
+
+def _to_builtin(value):
+    """json序列化numpy类型（检测框坐标、分数等）"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+class DetectorResultCacheService:
+    """图片检测器结果缓存服务类"""
+
+    def __init__(self, max_side: Optional[int] = None):
+        """
+        Args:
+            max_side: 分析图片时的最长边（参与缓存键），默认读取配置
+        """
+        if max_side is None:
+            max_side = Config.CLEANING_ANALYSIS_MAX_SIDE
+        # 各检测器的缓存键：(版本, 参数哈希, 参数JSON)
+        self._keys = {}
+        for name, version in DETECTOR_VERSIONS.items():
+            params_json = json.dumps(get_detector_params(name, max_side), sort_keys=True)
+            params_hash = hashlib.sha256(params_json.encode('utf-8')).hexdigest()
+            self._keys[name] = (version, params_hash, params_json)
+
+    def get_many(self, image_hashes: Iterable[str], detectors: Iterable[str]) -> Dict[str, Dict[str, Dict]]:
+        """
+        批量查询缓存
+
+        Returns:
+            {图片哈希: {检测器名: 原始结果}}，只包含命中的哈希
+        """
+        hits = {}
+        hashes = list(set(h for h in image_hashes if h))
+        conditions = []
+        for name in detectors:
+            version, params_hash, _ = self._keys[name]
+            conditions.append(and_(
+                ImageDetectorResult.detector == name,
+                ImageDetectorResult.detector_version == version,
+                ImageDetectorResult.params_hash == params_hash
+            ))
+        if not hashes or not conditions:
+            return hits
+
+        for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            chunk = hashes[i:i + LOOKUP_CHUNK_SIZE]
+            rows = db.session.query(
+                ImageDetectorResult.image_hash, ImageDetectorResult.detector, ImageDetectorResult.result_json
+            ).filter(
+                ImageDetectorResult.image_hash.in_(chunk),
+                or_(*conditions)
+            ).all()
+            for row in rows:
+                try:
+                    result_data = json.loads(row.result_json)
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                hits.setdefault(row.image_hash, {})[row.detector] = result_data
+
+        return hits
+
+    def build_rows(self, image_hash: Optional[str], detector_results: Dict[str, Dict]) -> List[Dict]:
+        """
+        生成一张图片待写入的缓存行（用于跨图片缓冲后批量写入）
+
+        Args:
+            image_hash: 图片内容哈希值
+            detector_results: {检测器名: 原始结果}
+        """
+        if not image_hash:
+            return []
+        rows = []
+        for name, result_data in detector_results.items():
+            version, params_hash, params_json = self._keys[name]
+            rows.append({
+                'image_hash': image_hash,
+                'detector': name,
+                'detector_version': version,
+                'params_hash': params_hash,
+                'params_json': params_json,
+                'result_json': json.dumps(result_data, default=_to_builtin)
+            })
+        return rows
+
+    def put_many(self, rows: List[Dict]):
+        """
+        批量写入缓存行（在当前会话中执行，由调用方提交），每 WRITE_CHUNK_SIZE 行一条多行 INSERT ... ON DUPLICATE KEY UPDATE
+
+        Args:
+            rows: build_rows 生成的缓存行
+        """
+        # 同一批中相同内容的图片只保留一行
+        unique_rows = {
+            (row['image_hash'], row['detector'], row['detector_version'], row['params_hash']): row
+            for row in rows
+        }
+        rows = list(unique_rows.values())
+        for i in range(0, len(rows), WRITE_CHUNK_SIZE):
+            stmt = mysql_insert(ImageDetectorResult).values(rows[i:i + WRITE_CHUNK_SIZE])
+            stmt = stmt.on_duplicate_key_update(result_json=stmt.inserted.result_json)
+            db.session.execute(stmt)
@@ -6,9 +6,13 @@
 import cv2
 import numpy as np
 import os
+import time
 import logging
+import threading
 from typing import Dict, List, Tuple, Optional
 from PIL import Image
+from app.config import Config
+from app.utils.model_registry import ModelRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -49,95 +53,321 @@ def imread_unicode(image_path: str):
         # 如果PIL失败，尝试使用OpenCV（可能不支持中文路径）
         return cv2.imread(image_path)
 
-class ImageAnalysisService:
-    """图像分析服务类"""
+EAST_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'frozen_east_text_detection.pb')
+
+def _load_mtcnn():
+    """加载MTCNN人脸检测器（对侧脸和多角度人脸检测效果很好，使用默认参数）"""
+    if not MTCNN_AVAILABLE:
+        logger.error("MTCNN未安装，数据清洗任务将无法进行人脸检测。请安装: pip install mtcnn")
+        return None
+    detector = MTCNN()
+    logger.info("MTCNN人脸检测器已加载（支持侧脸检测）")
+    return detector
+
+def _find_person_cascade() -> Optional[Tuple[str, str]]:
+    """查找Haar Cascade人物检测器文件（优先全身检测器，其次上半身检测器），返回 (路径, 说明)"""
+    for filename, label in (('haarcascade_fullbody.xml', '全身检测'), ('haarcascade_upperbody.xml', '上半身检测')):
+        cascade_path = cv2.data.haarcascades + filename
+        if os.path.exists(cascade_path):
+            return cascade_path, label
+    return None
+
+def _load_person_cascade():
+    """加载Haar Cascade人物检测器"""
+    found = _find_person_cascade()
+    if not found:
+        logger.warning("Haar Cascade人物检测器文件不存在，使用HOG作为备选")
+        return None
+    cascade_path, label = found
+    cascade = cv2.CascadeClassifier(cascade_path)
+    logger.info(f"Haar Cascade人物检测器已加载（{label}）")
+    return cascade
+
+def _load_hog():
+    """加载OpenCV HOG人物检测器"""
+    hog = cv2.HOGDescriptor()
+    hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    logger.info("OpenCV HOG人物检测器已加载（备选方案）")
+    return hog
+
+def _load_east():
+    """
+    加载EAST文字检测模型
+    可以从以下地址下载：https://github.com/opencv/opencv_extra/blob/master/testdata/dnn/frozen_east_text_detection.pb
+    """
+    if not os.path.exists(EAST_MODEL_PATH):
+        logger.warning(f"EAST模型文件不存在: {EAST_MODEL_PATH}")
+        return None
+    return cv2.dnn.readNet(EAST_MODEL_PATH)
+
+# 进程内共用的检测模型，每个进程首次使用时加载一次
+detector_registry = ModelRegistry()
+detector_registry.register('mtcnn', _load_mtcnn, 'MTCNN人脸检测')
+detector_registry.register('person_cascade', _load_person_cascade, 'Haar Cascade人物检测')
+detector_registry.register('hog', _load_hog, 'HOG人物检测')
+detector_registry.register('east', _load_east, 'EAST文字检测')
+
+# 检测器及其对应的筛选特征（完整模式下按此顺序检测）
+DETECTOR_FEATURES = {
+    'face': ('no_face', 'multiple_faces'),
+    'person': ('no_person', 'multiple_persons'),
+    'text': ('contains_text',),
+    'blur': ('blurry',)
+}
+
+# 检测器算法版本（修改检测算法后升级版本，使已缓存的检测结果失效）
+DETECTOR_VERSIONS = {
+    'face': 'v1',
+    'person': 'v1',
+    'text': 'v1',
+    'blur': 'v1'
+}
+
+# 判定阈值（作用于检测器的原始结果，调整阈值不需要重新检测）
+BLUR_THRESHOLD = 20.0
+TEXT_AREA_THRESHOLD = 0.5
+
+# 按原图分辨率检测的检测器（结果与分析分辨率无关）：
+# Sobel清晰度值随分辨率变化，缩小后无法可靠地换算回原图的清晰度；
+# HOG的检测窗口固定为64x128，缩小后小尺寸的人物会漏检
+FULL_RESOLUTION_DETECTORS = ('blur',)
+
+def needs_full_resolution(name: str) -> bool:
+    """检测器是否按原图分辨率检测（人物检测只有使用HOG备选方案时才需要）"""
+    if name == 'person':
+        return _find_person_cascade() is None
+    return name in FULL_RESOLUTION_DETECTORS
+
+def get_detector_params(name: str, max_side: int) -> Dict:
+    """影响检测器原始结果的参数（与版本一起作为检测结果缓存的键）"""
+    params = {'max_side': 0 if needs_full_resolution(name) else max_side}
+    if name == 'face':
+        params['backend'] = 'mtcnn'
+    elif name == 'person':
+        params['backend'] = 'haar' if _find_person_cascade() else 'hog'
+    elif name == 'text':
+        params['backend'] = 'east' if os.path.exists(EAST_MODEL_PATH) else 'contour'
+    return params
+
+# 各检测器的预估耗时（秒），级联模式在实测之前按此排序
+DEFAULT_DETECTOR_COSTS = {
+    'blur': 0.02,
+    'text': 0.15,
+    'person': 0.4,
+    'face': 0.5
+}
+
+# 进程内实测的检测器平均耗时（指数移动平均）
+_detector_costs = {}
+_detector_costs_lock = threading.Lock()
+
+def record_detector_cost(name: str, seconds: float, alpha: float = 0.1):
+    """记录一次检测器耗时"""
+    with _detector_costs_lock:
+        previous = _detector_costs.get(name)
+        _detector_costs[name] = seconds if previous is None else previous + alpha * (seconds - previous)
+
+def get_detector_costs() -> Dict[str, float]:
+    """各检测器耗时：有实测值时使用实测平均耗时，否则使用预估值"""
+    with _detector_costs_lock:
+        return {name: _detector_costs.get(name, cost) for name, cost in DEFAULT_DETECTOR_COSTS.items()}
+
+class ImageAnalysisContext:
+    """
+    单张图片的分析上下文
+    图片只从磁盘读取并解码一次，各检测器需要的BGR、RGB、灰度和缩放版本按需转换并缓存，
+    多个检测器共用（检测器不能原地修改这些数组）。
+    指定max_side时按缩小的分辨率解码（JPEG在解码时直接按比例缩小），
+    检测器在缩小的图片上检测，检测框通过to_original换算回原图坐标；
+    对分辨率敏感的检测器（模糊、HOG人物检测）使用full_bgr/full_gray按原图分辨率检测。
+    同时需要两种分辨率时先调用prepare(full_resolution=True)：只按原图解码一次，缩小版本由原图缩放得到
+    """
     
-    def __init__(self):
-        """初始化服务"""
-        # 初始化MTCNN人脸检测器（唯一的人脸检测方法）
-        self.mtcnn_detector = None
-        if MTCNN_AVAILABLE:
-            try:
-                # MTCNN对侧脸和多角度人脸检测效果很好
-                # 使用默认参数
-                self.mtcnn_detector = MTCNN()
-                logger.info("MTCNN人脸检测器已加载（支持侧脸检测）")
-            except Exception as e:
-                logger.error(f"无法加载MTCNN人脸检测器: {e}", exc_info=True)
-                self.mtcnn_detector = None
-                logger.error("MTCNN是数据清洗任务必需的人脸检测方法，请确保已安装: pip install mtcnn")
-        else:
-            logger.error("MTCNN未安装，数据清洗任务将无法进行人脸检测。请安装: pip install mtcnn")
-        
-        # 初始化人物检测器（使用Haar Cascade）
-        self.person_cascade = None
-        try:
-            # 尝试加载Haar Cascade人物检测器
-            # OpenCV的Haar Cascade主要用于人脸检测，但也可以尝试使用身体检测器
-            # 如果没有专门的人物检测器，可以使用Haar Cascade检测人体上半身或全身
-            cascade_path = cv2.data.haarcascades + 'haarcascade_fullbody.xml'
-            if os.path.exists(cascade_path):
-                self.person_cascade = cv2.CascadeClassifier(cascade_path)
-                logger.info("Haar Cascade人物检测器已加载（全身检测）")
+    def __init__(self, image_path: str, max_side: int = 0):
+        """
+        Args:
+            image_path: 图片路径
+            max_side: 分析用图片的最长边，0表示按原图分辨率分析
+        """
+        self.image_path = image_path
+        self.max_side = max_side
+        self.decode_count = 0
+        # 原图坐标 / 分析图坐标
+        self.scale_x = 1.0
+        self.scale_y = 1.0
+        # 检测失败（结果不可信、不应缓存）的检测器
+        self.failed_detectors = set()
+        self._loaded = False
+        self._bgr = None
+        self._rgb = None
+        self._gray = None
+        self._full_bgr = None
+        self._full_gray = None
+        self._resized = {}
+    
+    def prepare(self, full_resolution: bool = False):
+        """
+        预先解码图片（解码耗时不计入检测器耗时）
+        
+        Args:
+            full_resolution: 是否有检测器需要原图分辨率；为True时只按原图解码，缩小版本由原图缩放得到
+        """
+        if full_resolution:
+            self.full_bgr
+        self.bgr
+    
+    @property
+    def bgr(self) -> Optional[np.ndarray]:
+        """BGR格式的分析图（指定max_side时为缩小的图片），读取失败时为None"""
+        if not self._loaded:
+            self._loaded = True
+            if self.max_side > 0 and self._full_bgr is not None:
+                # 已按原图解码，直接缩小，不再读取文件
+                self._bgr = self._reduce(self._full_bgr)
             else:
-                # 如果全身检测器不存在，尝试上半身检测器
-                cascade_path = cv2.data.haarcascades + 'haarcascade_upperbody.xml'
-                if os.path.exists(cascade_path):
-                    self.person_cascade = cv2.CascadeClassifier(cascade_path)
-                    logger.info("Haar Cascade人物检测器已加载（上半身检测）")
+                self.decode_count += 1
+                if self.max_side > 0:
+                    self._bgr = self._decode_reduced()
                 else:
-                    # 如果都不存在，尝试使用HOG作为备选（因为Haar Cascade的人物检测器可能不存在）
-                    logger.warning("Haar Cascade人物检测器文件不存在，使用HOG作为备选")
-                    try:
-                        self.hog = cv2.HOGDescriptor()
-                        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
-                        logger.info("OpenCV HOG人物检测器已加载（备选方案）")
-                    except Exception as e:
-                        logger.warning(f"无法加载HOG人物检测器: {e}")
-                        self.hog = None
+                    self._bgr = imread_unicode(self.image_path)
+        return self._bgr
+    
+    @property
+    def full_bgr(self) -> Optional[np.ndarray]:
+        """BGR格式的原图分辨率图片，读取失败时为None；未缩小时与bgr相同"""
+        if self.max_side <= 0 or (self._loaded and self.scale_x == 1.0 and self.scale_y == 1.0):
+            return self.bgr
+        if self._full_bgr is None:
+            self.decode_count += 1
+            self._full_bgr = imread_unicode(self.image_path)
+        return self._full_bgr
+    
+    def _reduce(self, full_bgr: np.ndarray) -> np.ndarray:
+        """把原图分辨率的图片缩小到max_side，并记录缩放比例"""
+        orig_h, orig_w = full_bgr.shape[:2]
+        ratio = self.max_side / max(orig_w, orig_h)
+        if ratio >= 1.0:
+            return full_bgr
+        size = (max(1, int(round(orig_w * ratio))), max(1, int(round(orig_h * ratio))))
+        self.scale_x = orig_w / size[0]
+        self.scale_y = orig_h / size[1]
+        return cv2.resize(full_bgr, size, interpolation=cv2.INTER_AREA)
+    
+    @property
+    def full_gray(self) -> Optional[np.ndarray]:
+        """原图分辨率的灰度图"""
+        full_bgr = self.full_bgr
+        if full_bgr is not None and full_bgr is self._bgr:
+            return self.gray
+        if self._full_gray is None and full_bgr is not None:
+            self._full_gray = cv2.cvtColor(full_bgr, cv2.COLOR_BGR2GRAY)
+        return self._full_gray
+    
+    def _decode_reduced(self) -> Optional[np.ndarray]:
+        """按缩小的分辨率解码，失败时按原图读取"""
+        try:
+            with Image.open(self.image_path) as pil_img:
+                orig_w, orig_h = pil_img.size
+                # JPEG可在解码时直接按1/2、1/4、1/8缩小
+                pil_img.draft('RGB', (self.max_side, self.max_side))
+                img = pil_img.convert('RGB')
+                if max(img.size) > self.max_side:
+                    img.thumbnail((self.max_side, self.max_side), Image.BILINEAR)
+                img_array = np.array(img)
+            self.scale_x = orig_w / img_array.shape[1]
+            self.scale_y = orig_h / img_array.shape[0]
+            return cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
         except Exception as e:
-            logger.warning(f"无法加载Haar Cascade人物检测器: {e}")
-            self.person_cascade = None
-            # 如果Haar Cascade加载失败，尝试使用HOG作为备选
-            try:
-                self.hog = cv2.HOGDescriptor()
-                self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
-                logger.info("OpenCV HOG人物检测器已加载（备选方案）")
-            except Exception as e2:
-                logger.warning(f"无法加载HOG人物检测器: {e2}")
-                self.hog = None
+            logger.warning(f"缩小分辨率解码失败，按原图读取 {self.image_path}: {e}")
+            self.scale_x = self.scale_y = 1.0
+            return imread_unicode(self.image_path)
+    
+    @property
+    def scale(self) -> float:
+        """分析图相对原图的缩放比例（<=1）"""
+        return 1.0 / ((self.scale_x * self.scale_y) ** 0.5)
+    
+    def to_original(self, boxes: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        """把分析图上的检测框 (x, y, w, h) 换算回原图坐标"""
+        if self.scale_x == 1.0 and self.scale_y == 1.0:
+            return boxes
+        return [(int(round(x * self.scale_x)), int(round(y * self.scale_y)),
+                 int(round(w * self.scale_x)), int(round(h * self.scale_y))) for x, y, w, h in boxes]
+    
+    @property
+    def rgb(self) -> Optional[np.ndarray]:
+        if self._rgb is None and self.bgr is not None:
+            self._rgb = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+        return self._rgb
+    
+    @property
+    def gray(self) -> Optional[np.ndarray]:
+        if self._gray is None and self.bgr is not None:
+            self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
     
-    def detect_faces(self, image_path: str) -> Tuple[int, List[Tuple[int, int, int, int]]]:
+    def resized(self, width: int, height: int) -> Optional[np.ndarray]:
+        """缩放到指定尺寸的BGR图片"""
+        key = (width, height)
+        if key not in self._resized and self.bgr is not None:
+            self._resized[key] = cv2.resize(self.bgr, (width, height))
+        return self._resized.get(key)
+
+class ImageAnalysisService:
+    """图像分析服务类（检测模型由进程内的detector_registry在首次使用时加载，多个服务实例共用）"""
+    
+    @property
+    def mtcnn_detector(self):
+        """MTCNN人脸检测器（唯一的人脸检测方法）"""
+        return detector_registry.get('mtcnn')
+    
+    @property
+    def person_cascade(self):
+        """Haar Cascade人物检测器"""
+        return detector_registry.get('person_cascade')
+    
+    @property
+    def hog(self):
+        """HOG人物检测器（Haar Cascade人物检测器不可用时的备选方案）"""
+        if self.person_cascade is not None:
+            return None
+        return detector_registry.get('hog')
+    
+    def detect_faces(self, image_path: str, context: Optional[ImageAnalysisContext] = None) -> Tuple[int, List[Tuple[int, int, int, int]]]:
         """
         检测图片中的人脸数量
         
         Args:
             image_path: 图片路径
+            context: 图片分析上下文（多个检测器共用解码结果），为空时读取image_path
             
         Returns:
             Tuple[int, List]: (人脸数量, 人脸位置列表[(x, y, w, h), ...])
         """
         try:
             # 读取图片
-            img = imread_unicode(image_path)
+            context = context or ImageAnalysisContext(image_path)
+            img = context.bgr
             if img is None:
                 logger.error(f"无法读取图片: {image_path}")
+                context.failed_detectors.add('face')
                 return 0, []
             
             h, w = img.shape[:2]
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
             # 使用MTCNN检测人脸（支持侧脸和多角度）
             faces = []
             if not self.mtcnn_detector:
                 logger.warning("MTCNN人脸检测器未加载，无法进行人脸检测")
+                context.failed_detectors.add('face')
                 return 0, []
             
             try:
                 # MTCNN需要RGB格式
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+                img_rgb = context.rgb
                 # 执行检测
-                detections = self.mtcnn_detector.detect_faces(img_rgb)
+                with detector_registry.lock('mtcnn'):
+                    detections = self.mtcnn_detector.detect_faces(img_rgb)
                 
                 if detections:
                     for detection in detections:
@@ -178,16 +408,19 @@ class ImageAnalysisService:
                     logger.debug("MTCNN未检测到人脸")
             except Exception as e:
                 logger.error(f"MTCNN人脸检测失败: {e}", exc_info=True)
+                context.failed_detectors.add('face')
                 return 0, []
             
             # 去重：如果检测框重叠度很高，只保留一个
             if len(faces) > 1:
                 faces = self._remove_overlapping_faces(faces)
             
-            return len(faces), faces
+            return len(faces), context.to_original(faces)
             
         except Exception as e:
             logger.error(f"人脸检测失败 {image_path}: {e}", exc_info=True)
+            if context:
+                context.failed_detectors.add('face')
             return 0, []
     
     def _remove_overlapping_faces(self, faces: List[Tuple[int, int, int, int]], overlap_threshold: float = 0.5) -> List[Tuple[int, int, int, int]]:
@@ -250,6 +483,9 @@ class ImageAnalysisService:
         """
         计算多个矩形框的并集面积（考虑重叠）
         
+        按所有框的边界坐标把平面切分为网格，标记被任一框覆盖的格子后按格子面积求和，
+        结果精确且与图片尺寸无关
+        
         Args:
             boxes: 矩形框列表，每个框为 (x, y, w, h)
             
@@ -259,52 +495,101 @@ class ImageAnalysisService:
         if not boxes:
             return 0.0
         
-        # 使用numpy数组存储所有矩形框
-        boxes_array = np.array(boxes, dtype=np.int32)
+        boxes_array = np.array(boxes, dtype=np.int64).reshape(-1, 4)
+        boxes_array = boxes_array[(boxes_array[:, 2] > 0) & (boxes_array[:, 3] > 0)]
+        if len(boxes_array) == 0:
+            return 0.0
         
-        # 找到所有矩形框的边界
-        min_x = np.min(boxes_array[:, 0])
-        min_y = np.min(boxes_array[:, 1])
-        max_x = np.max(boxes_array[:, 0] + boxes_array[:, 2])
-        max_y = np.max(boxes_array[:, 1] + boxes_array[:, 3])
+        x1 = boxes_array[:, 0]
+        y1 = boxes_array[:, 1]
+        x2 = x1 + boxes_array[:, 2]
+        y2 = y1 + boxes_array[:, 3]
         
-        # 创建一个足够大的画布
-        canvas = np.zeros((max_y - min_y, max_x - min_x), dtype=np.uint8)
+        # 网格的分割坐标
+        xs = np.unique(np.concatenate([x1, x2]))
+        ys = np.unique(np.concatenate([y1, y2]))
         
-        # 将所有矩形框绘制到画布上（填充为1）
-        for x, y, w, h in boxes:
-            # 转换为相对于画布的坐标
-            rel_x = x - min_x
-            rel_y = y - min_y
-            # 确保坐标在画布范围内
-            rel_x = max(0, rel_x)
-            rel_y = max(0, rel_y)
-            rel_x2 = min(canvas.shape[1], rel_x + w)
-            rel_y2 = min(canvas.shape[0], rel_y + h)
-            
-            if rel_x2 > rel_x and rel_y2 > rel_y:
-                canvas[rel_y:rel_y2, rel_x:rel_x2] = 1
+        # 每个框覆盖的网格范围
+        xi1 = np.searchsorted(xs, x1)
+        xi2 = np.searchsorted(xs, x2)
+        yi1 = np.searchsorted(ys, y1)
+        yi2 = np.searchsorted(ys, y2)
+        
+        covered = np.zeros((len(ys) - 1, len(xs) - 1), dtype=bool)
+        for a, b, c, d in zip(yi1, yi2, xi1, xi2):
+            covered[a:b, c:d] = True
         
-        # 计算非零像素的数量（即并集面积）
-        union_area = np.sum(canvas > 0)
+        # 被覆盖格子的面积之和
+        union_area = np.diff(ys) @ covered @ np.diff(xs)
         
         return float(union_area)
     
-    def detect_text(self, image_path: str) -> Tuple[bool, List[Tuple[int, int, int, int]], float]:
+    def _decode_east_predictions(self, scores: np.ndarray, geometry: np.ndarray, min_confidence: float,
+                                 rW: float, rH: float, W: int, H: int) -> Tuple[List[Tuple[int, int, int, int]], List[float]]:
+        """
+        解析EAST输出的分数图和几何图（对整张输出图做向量化计算）
+        
+        Args:
+            scores: 分数图 (1, 1, rows, cols)
+            geometry: 几何图 (1, 5, rows, cols)，前4个通道为到上右下左边的距离，第5个为旋转角度
+            min_confidence: 最小置信度
+            rW, rH: 输入图缩放回原图的比例
+            W, H: 原图宽高
+            
+        Returns:
+            Tuple[List, List]: (检测框列表[(x, y, w, h), ...], 置信度列表)
+        """
+        # 选出分数足够高的位置，只对这些位置取几何数据
+        ys, xs = np.nonzero(scores[0, 0] >= min_confidence)
+        if len(ys) == 0:
+            return [], []
+        confidences = scores[0, 0, ys, xs].astype(np.float64)
+        d_top, d_right, d_bottom, d_left, angle = (geometry[0, c, ys, xs].astype(np.float64) for c in range(5))
+        
+        # 计算偏移量（每个像素对应4个像素）
+        offset_x = xs * 4.0
+        offset_y = ys * 4.0
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+        
+        # 边界框的宽高和终点、起点（与逐个计算时一样按int向零截断）
+        h_box = d_top + d_bottom
+        w_box = d_right + d_left
+        end_x = np.trunc(offset_x + cos * d_right + sin * d_bottom)
+        end_y = np.trunc(offset_y - sin * d_right + cos * d_bottom)
+        start_x = np.trunc(end_x - w_box)
+        start_y = np.trunc(end_y - h_box)
+        
+        # 缩放回原始图像尺寸，并确保坐标在图像范围内
+        start_x = np.clip(np.trunc(start_x * rW), 0, W).astype(np.int64)
+        start_y = np.clip(np.trunc(start_y * rH), 0, H).astype(np.int64)
+        end_x = np.clip(np.trunc(end_x * rW), 0, W).astype(np.int64)
+        end_y = np.clip(np.trunc(end_y * rH), 0, H).astype(np.int64)
+        
+        box_w = end_x - start_x
+        box_h = end_y - start_y
+        valid = (box_w > 0) & (box_h > 0)
+        rects = np.stack([start_x, start_y, box_w, box_h], axis=1)[valid]
+        return [tuple(int(v) for v in rect) for rect in rects], confidences[valid].tolist()
+    
+    def detect_text(self, image_path: str, context: Optional[ImageAnalysisContext] = None) -> Tuple[bool, List[Tuple[int, int, int, int]], float]:
         """
         使用EAST算法检测图片中的文字，并返回文字位置和面积占比
         
         Args:
             image_path: 图片路径
+            context: 图片分析上下文（多个检测器共用解码结果），为空时读取image_path
             
         Returns:
             Tuple[bool, List, float]: (是否包含文字, 文字位置列表[(x, y, w, h), ...], 文字面积占比)
         """
         try:
             # 读取图片
-            img = imread_unicode(image_path)
+            context = context or ImageAnalysisContext(image_path)
+            img = context.bgr
             if img is None:
                 logger.error(f"无法读取图片: {image_path}")
+                context.failed_detectors.add('text')
                 return False, [], 0.0
             
             h, w = img.shape[:2]
@@ -313,16 +598,11 @@ class ImageAnalysisService:
             
             # 尝试使用OpenCV DNN的EAST文本检测器
             try:
-                # EAST模型文件路径（需要下载EAST模型）
-                # 可以从以下地址下载：https://github.com/opencv/opencv_extra/blob/master/testdata/dnn/frozen_east_text_detection.pb
-                east_model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'frozen_east_text_detection.pb')
+                # EAST模型（需要下载EAST模型，进程内只加载一次）
+                net = detector_registry.get('east')
                 
-                if os.path.exists(east_model_path):
-                    # 加载EAST模型
-                    net = cv2.dnn.readNet(east_model_path)
-                    
+                if net is not None:
                     # 准备输入图像（EAST需要特定的输入尺寸，必须是32的倍数）
-                    orig = img.copy()
                     (H, W) = img.shape[:2]
                     
                     # 设置新的宽度和高度（EAST模型通常使用320x320）
@@ -331,7 +611,7 @@ class ImageAnalysisService:
                     rH = H / float(newH)
                     
                     # 调整图像大小
-                    resized = cv2.resize(img, (newW, newH))
+                    resized = context.resized(newW, newH)
                     
                     # 创建blob（EAST需要特定的预处理）
                     blob = cv2.dnn.blobFromImage(
@@ -339,78 +619,20 @@ class ImageAnalysisService:
                         (123.68, 116.78, 103.94), swapRB=True, crop=False
                     )
                     
-                    # 设置网络输入
-                    net.setInput(blob)
-                    
                     # 获取输出层（EAST模型有两个输出层）
                     layerNames = [
                         "feature_fusion/Conv_7/Sigmoid",  # 分数图
                         "feature_fusion/concat_3"          # 几何图
                     ]
                     
-                    # 前向传播
-                    (scores, geometry) = net.forward(layerNames)
+                    # 设置网络输入并前向传播（共用的网络对象，输入和推理需要加锁）
+                    with detector_registry.lock('east'):
+                        net.setInput(blob)
+                        (scores, geometry) = net.forward(layerNames)
                     
                     # 解析检测结果
-                    (numRows, numCols) = scores.shape[2:4]
-                    rects = []
-                    confidences = []
-                    
-                    # 最小置信度阈值
                     min_confidence = 0.5
-                    
-                    for y in range(0, numRows):
-                        # 提取分数和几何数据
-                        scoresData = scores[0, 0, y]
-                        xData0 = geometry[0, 0, y]
-                        xData1 = geometry[0, 1, y]
-                        xData2 = geometry[0, 2, y]
-                        xData3 = geometry[0, 3, y]
-                        anglesData = geometry[0, 4, y]
-                        
-                        for x in range(0, numCols):
-                            # 如果分数不够高，忽略
-                            if scoresData[x] < min_confidence:
-                                continue
-                            
-                            # 计算偏移量（每个像素对应4个像素）
-                            (offsetX, offsetY) = (x * 4.0, y * 4.0)
-                            
-                            # 提取旋转角度
-                            angle = anglesData[x]
-                            cos = np.cos(angle)
-                            sin = np.sin(angle)
-                            
-                            # 计算边界框的宽度和高度
-                            h_box = xData0[x] + xData2[x]
-                            w_box = xData1[x] + xData3[x]
-                            
-                            # 计算边界框的终点
-                            endX = int(offsetX + (cos * xData1[x]) + (sin * xData2[x]))
-                            endY = int(offsetY - (sin * xData1[x]) + (cos * xData2[x]))
-                            
-                            # 计算边界框的起点
-                            startX = int(endX - w_box)
-                            startY = int(endY - h_box)
-                            
-                            # 缩放回原始图像尺寸
-                            startX = int(startX * rW)
-                            startY = int(startY * rH)
-                            endX = int(endX * rW)
-                            endY = int(endY * rH)
-                            
-                            # 确保坐标在图像范围内
-                            startX = max(0, min(startX, W))
-                            startY = max(0, min(startY, H))
-                            endX = max(0, min(endX, W))
-                            endY = max(0, min(endY, H))
-                            
-                            box_w = endX - startX
-                            box_h = endY - startY
-                            
-                            if box_w > 0 and box_h > 0:
-                                rects.append((startX, startY, box_w, box_h))
-                                confidences.append(float(scoresData[x]))
+                    rects, confidences = self._decode_east_predictions(scores, geometry, min_confidence, rW, rH, W, H)
                     
                     # 应用非极大值抑制（NMS）去除重叠的检测框
                     if rects:
@@ -423,14 +645,16 @@ class ImageAnalysisService:
                     
                     logger.debug(f"EAST检测到 {len(text_locations)} 个文字区域")
                 else:
-                    logger.warning(f"EAST模型文件不存在: {east_model_path}")
-                    logger.warning("将使用备选方法进行文字检测")
+                    logger.warning("EAST模型不可用，将使用备选方法进行文字检测")
                     raise FileNotFoundError("EAST model not found")
                     
             except (FileNotFoundError, Exception) as e:
                 # 如果EAST不可用，使用备选方法（基于轮廓的简单检测）
                 logger.warning(f"EAST文字检测失败: {e}, 使用备选方法")
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                if os.path.exists(EAST_MODEL_PATH):
+                    # EAST模型存在但检测失败，备选方法的结果不作为EAST的结果缓存
+                    context.failed_detectors.add('text')
+                gray = context.gray
                 
                 # 使用形态学操作增强文字区域
                 kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
@@ -443,19 +667,21 @@ class ImageAnalysisService:
                 contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
                 
                 # 分析轮廓，判断是否可能是文字
+                # 最小面积按原图50像素计算（在缩小的图片上检测时按比例换算）
+                min_area = 50 * context.scale ** 2
                 for contour in contours:
                     x, y, cw, ch = cv2.boundingRect(contour)
                     area = cv2.contourArea(contour)
                     
                     # 过滤太小的轮廓
-                    if area < 50:
+                    if area < min_area:
                         continue
                     
                     # 文字通常具有特定的宽高比
                     aspect_ratio = cw / ch if ch > 0 else 0
                     
                     # 文字区域通常宽度大于高度，且面积适中
-                    if 0.2 < aspect_ratio < 10 and area > 50 and area < (w * h * 0.5):
+                    if 0.2 < aspect_ratio < 10 and area > min_area and area < (w * h * 0.5):
                         text_locations.append((int(x), int(y), int(cw), int(ch)))
             
             # 计算文字面积占比（考虑重叠）
@@ -466,17 +692,20 @@ class ImageAnalysisService:
                 logger.debug(f"文字并集面积: {union_area}, 图片面积: {img_area}, 占比: {text_area_ratio:.2%}")
             
             # 判断是否包含文字：文字面积占比超过50%
-            has_text = text_area_ratio > 0.5
+            has_text = text_area_ratio > TEXT_AREA_THRESHOLD
             
-            return has_text, text_locations, text_area_ratio
+            return has_text, context.to_original(text_locations), text_area_ratio
             
         except Exception as e:
             logger.error(f"文字检测失败 {image_path}: {e}", exc_info=True)
             import traceback
             logger.error(traceback.format_exc())
+            if context:
+                context.failed_detectors.add('text')
             return False, [], 0.0
     
-    def detect_blur(self, image_path: str, threshold: float = 20.0) -> Tuple[bool, float]:
+    def detect_blur(self, image_path: str, threshold: float = BLUR_THRESHOLD,
+                    context: Optional[ImageAnalysisContext] = None) -> Tuple[bool, float]:
         """
         使用 Sobel 梯度方法检测图片是否模糊
         
@@ -484,20 +713,20 @@ class ImageAnalysisService:
             image_path: 图片路径
             threshold: 模糊阈值，低于此值认为模糊（默认20.0）
                      注意：阈值针对 Sobel 梯度清晰度值，可根据数据分布调整
+            context: 图片分析上下文（多个检测器共用解码结果），为空时读取image_path
             
         Returns:
             Tuple[bool, float]: (是否模糊, 清晰度值)
         """
         try:
-            # 读取图片
-            img = imread_unicode(image_path)
-            if img is None:
+            # 读取图片（按原图分辨率检测，清晰度值与分析分辨率无关，阈值含义不变）
+            context = context or ImageAnalysisContext(image_path)
+            gray = context.full_gray
+            if gray is None:
                 logger.error(f"无法读取图片: {image_path}")
+                context.failed_detectors.add('blur')
                 return True, 0.0
             
-            # 转换为灰度图
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
             # 使用 Sobel 算子计算水平和垂直方向的梯度
             sobel_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
             sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
@@ -515,27 +744,32 @@ class ImageAnalysisService:
             
         except Exception as e:
             logger.error(f"模糊检测失败 {image_path}: {e}", exc_info=True)
+            if context:
+                context.failed_detectors.add('blur')
             return True, 0.0
     
-    def detect_persons(self, image_path: str) -> Tuple[int, List[Tuple[int, int, int, int]]]:
+    def detect_persons(self, image_path: str, context: Optional[ImageAnalysisContext] = None) -> Tuple[int, List[Tuple[int, int, int, int]]]:
         """
         检测图片中的人物数量
         
         Args:
             image_path: 图片路径
+            context: 图片分析上下文（多个检测器共用解码结果），为空时读取image_path
             
         Returns:
             Tuple[int, List]: (人物数量, 人物位置列表[(x, y, w, h), ...])
         """
         try:
             # 读取图片
-            img = imread_unicode(image_path)
+            context = context or ImageAnalysisContext(image_path)
+            img = context.bgr
             if img is None:
                 logger.error(f"无法读取图片: {image_path}")
+                context.failed_detectors.add('person')
                 return 0, []
             
             h, w = img.shape[:2]
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = context.gray
             persons = []
             
             # 使用Haar Cascade检测人物
@@ -574,16 +808,19 @@ class ImageAnalysisService:
                     
                     if persons:
                         logger.info(f"Haar Cascade检测到 {len(persons)} 个人物")
-                        return len(persons), persons
+                        return len(persons), context.to_original(persons)
                 except Exception as e:
                     logger.warning(f"Haar Cascade人物检测失败: {e}", exc_info=True)
+                    context.failed_detectors.add('person')
             
             # 如果Haar Cascade不可用或失败，使用HOG作为备选
-            if len(persons) == 0 and hasattr(self, 'hog') and self.hog:
+            if len(persons) == 0 and self.hog:
                 try:
-                    # HOG检测人物
+                    # HOG检测窗口固定为64x128，按原图分辨率检测，避免缩小后漏检小尺寸人物（检测框即原图坐标）
+                    full_img = context.full_bgr
+                    h, w = full_img.shape[:2]
                     (rects, weights) = self.hog.detectMultiScale(
-                        img,
+                        full_img,
                         winStride=(4, 4),
                         padding=(8, 8),
                         scale=1.05,
@@ -611,41 +848,45 @@ class ImageAnalysisService:
                         
                 except Exception as e:
                     logger.warning(f"HOG人物检测失败: {e}", exc_info=True)
+                    context.failed_detectors.add('person')
+            
+            if self.person_cascade is None and not self.hog:
+                logger.warning("人物检测器未加载，无法进行人物检测")
+                context.failed_detectors.add('person')
             
             if len(persons) == 0:
                 logger.debug("未检测到人物")
             
-            return len(persons), persons
+            return len(persons), context.to_original(persons)
             
         except Exception as e:
             logger.error(f"人物检测失败 {image_path}: {e}", exc_info=True)
+            if context:
+                context.failed_detectors.add('person')
             return 0, []
     
-    def analyze_image(self, image_path: str, filter_features: List[str]) -> Dict[str, any]:
-        """
-        分析图片，检测指定的特征
-        
-        Args:
-            image_path: 图片路径
-            filter_features: 要检测的特征列表，例如：['no_face', 'multiple_faces', 'contains_text', 'blurry']
-            
-        Returns:
-            Dict: 检测结果，包含匹配的特征和详细信息
-        """
-        result = {
-            'matched_features': [],
-            'details': {}
-        }
-        
-        if not os.path.exists(image_path):
-            logger.error(f"图片文件不存在: {image_path}")
-            return result
-        
-        logger.debug(f"开始分析图片: {image_path}, 检测特征: {filter_features}")
-        
+    def _compute_detector(self, name: str, image_path: str, context: ImageAnalysisContext) -> Dict:
+        """运行一个检测器，返回原始结果（数量、位置、分数等，不含按阈值的判定）"""
+        if name == 'face':
+            face_count, face_locations = self.detect_faces(image_path, context=context)
+            return {'face_count': face_count, 'face_locations': face_locations}
+        if name == 'person':
+            person_count, person_locations = self.detect_persons(image_path, context=context)
+            return {'person_count': person_count, 'person_locations': person_locations}
+        if name == 'text':
+            _, text_locations, text_area_ratio = self.detect_text(image_path, context=context)
+            return {'text_locations': text_locations, 'text_area_ratio': text_area_ratio}
+        if name == 'blur':
+            _, blur_value = self.detect_blur(image_path, context=context)
+            return {'blur_value': blur_value}
+        raise ValueError(f"未知的检测器: {name}")
+    
+    def _apply_detector_result(self, name: str, raw: Dict, filter_features: List[str], result: Dict):
+        """按阈值判定检测器的原始结果，把检测详情和匹配的特征写入result"""
         # 检测人脸
-        if 'no_face' in filter_features or 'multiple_faces' in filter_features:
-            face_count, face_locations = self.detect_faces(image_path)
+        if name == 'face':
+            face_count = raw['face_count']
+            face_locations = raw['face_locations']
             result['details']['face_count'] = face_count
             result['details']['face_locations'] = face_locations
             logger.debug(f"人脸检测结果: 数量={face_count}, 位置={face_locations}")
@@ -659,8 +900,9 @@ class ImageAnalysisService:
                 logger.debug(f"匹配特征: multiple_faces (多人脸, 数量={face_count})")
         
         # 检测人物
-        if 'no_person' in filter_features or 'multiple_persons' in filter_features:
-            person_count, person_locations = self.detect_persons(image_path)
+        elif name == 'person':
+            person_count = raw['person_count']
+            person_locations = raw['person_locations']
             result['details']['person_count'] = person_count
             result['details']['person_locations'] = person_locations
             logger.debug(f"人物检测结果: 数量={person_count}, 位置={person_locations}")
@@ -674,8 +916,10 @@ class ImageAnalysisService:
                 logger.debug(f"匹配特征: multiple_persons (多人物, 数量={person_count})")
         
         # 检测文字
-        if 'contains_text' in filter_features:
-            has_text, text_locations, text_area_ratio = self.detect_text(image_path)
+        elif name == 'text':
+            text_locations = raw['text_locations']
+            text_area_ratio = raw['text_area_ratio']
+            has_text = text_area_ratio > TEXT_AREA_THRESHOLD
             result['details']['has_text'] = has_text
             result['details']['text_locations'] = text_locations
             result['details']['text_area_ratio'] = text_area_ratio
@@ -685,15 +929,74 @@ class ImageAnalysisService:
                 logger.debug(f"匹配特征: contains_text (包含文字, 面积占比={text_area_ratio:.2%})")
         
         # 检测模糊
-        if 'blurry' in filter_features:
-            is_blur, blur_value = self.detect_blur(image_path)
+        elif name == 'blur':
+            blur_value = raw['blur_value']
+            is_blur = blur_value < BLUR_THRESHOLD
             result['details']['is_blur'] = is_blur
             result['details']['blur_value'] = blur_value
             logger.debug(f"模糊检测结果: 是否模糊={is_blur}, 模糊度值={blur_value}")
             if is_blur:
                 result['matched_features'].append('blurry')
                 logger.debug(f"匹配特征: blurry (图片模糊, 值={blur_value})")
+    
+    def analyze_image(self, image_path: str, filter_features: List[str], stop_on_match: bool = False,
+                      cached_results: Optional[Dict[str, Dict]] = None,
+                      context: Optional[ImageAnalysisContext] = None) -> Dict[str, any]:
+        """
+        分析图片，检测指定的特征
+        
+        Args:
+            image_path: 图片路径
+            filter_features: 要检测的特征列表，例如：['no_face', 'multiple_faces', 'contains_text', 'blurry']
+            stop_on_match: 级联模式：按检测器耗时从低到高依次检测，任一特征匹配即停止
+                           （清洗时任一特征匹配就会回收）；默认运行全部检测器，返回完整详情
+            cached_results: 已缓存的检测器原始结果 {检测器名: 原始结果}，这些检测器不再重新检测
+            context: 图片分析上下文，为空时按配置的分析分辨率创建
+            
+        Returns:
+            Dict: 检测结果，包含匹配的特征和详细信息（级联模式下只包含已运行检测器的详情）；
+                  detector_results 为本次新检测出的原始结果 {检测器名: 原始结果}（不含检测失败的），供调用方缓存
+        """
+        result = {
+            'matched_features': [],
+            'details': {},
+            'detector_results': {}
+        }
+        cached_results = cached_results or {}
+        
+        if not os.path.exists(image_path):
+            logger.error(f"图片文件不存在: {image_path}")
+            return result
+        
+        logger.debug(f"开始分析图片: {image_path}, 检测特征: {filter_features}")
+        
+        # 所有检测器共用一次解码结果（按配置的分辨率解码）
+        context = context or ImageAnalysisContext(image_path, max_side=Config.CLEANING_ANALYSIS_MAX_SIDE)
+        
+        detectors = [name for name, features in DETECTOR_FEATURES.items()
+                     if any(f in filter_features for f in features)]
+        # 有需要原图分辨率的检测器时只按原图解码一次，其余检测器使用由原图缩小的版本
+        full_resolution = any(needs_full_resolution(name) for name in detectors if name not in cached_results)
+        if stop_on_match:
+            # 已缓存的检测器没有检测成本，最先判定
+            costs = get_detector_costs()
+            detectors.sort(key=lambda name: (name not in cached_results, costs[name]))
+        
+        for name in detectors:
+            if name in cached_results:
+                raw = cached_results[name]
+            else:
+                # 需要检测时才解码，避免解码耗时计入第一个检测器的耗时
+                context.prepare(full_resolution)
+                start = time.perf_counter()
+                raw = self._compute_detector(name, image_path, context)
+                record_detector_cost(name, time.perf_counter() - start)
+                if name not in context.failed_detectors:
+                    result['detector_results'][name] = raw
+            self._apply_detector_result(name, raw, filter_features, result)
+            if stop_on_match and result['matched_features']:
+                logger.debug(f"级联检测命中，跳过其余检测器: {image_path}, 检测器={name}")
+                break
         
         logger.debug(f"图片分析完成: {image_path}, 匹配特征={result['matched_features']}")
         return result
-
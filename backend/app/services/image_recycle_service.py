@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+图片回收站服务
+在 images 和 images_recycle 之间按集合移动图片（INSERT ... SELECT + DELETE），
+每批图片只需几条语句，不逐行加载ORM对象
+"""
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import delete, insert, literal, or_, select, update
+from app.database import db
+from app.models.image import Image
+from app.models.image_recycle import ImageRecycle
+from app.utils.keyset import iter_id_chunks
+
+logger = logging.getLogger(__name__)
+
+# images 与 images_recycle 共有的图片信息列（不含id和status）
+IMAGE_COLUMNS = (
+    'filename', 'storage_path', 'original_url', 'created_at', 'storage_mode', 'source_site',
+    'keyword', 'hash_tags_json', 'visit_url', 'image_hash', 'width', 'height', 'format'
+)
+
+# 批量还原时每个事务处理的回收站记录数
+RESTORE_CHUNK_SIZE = 1000
+# 每批记录数的上限（IN列表和单个事务不宜过大）
+RESTORE_MAX_CHUNK_SIZE = 10000
+
+def recycle_images(image_ids: List[int], task_id: Optional[int], reason: str,
+                   recycled_at: Optional[datetime] = None) -> int:
+    """
+    将图片批量移动到回收站（在当前会话中执行，由调用方提交）
+    
+    Args:
+        image_ids: 图片ID列表
+        task_id: 清洗任务ID
+        reason: 清洗原因
+        recycled_at: 回收时间，默认当前时间
+        
+    Returns:
+        int: 从images表删除的图片数量
+    """
+    if not image_ids:
+        return 0
+    images = Image.__table__
+    source = select(
+        images.c.id,
+        *[images.c[name] for name in IMAGE_COLUMNS],
+        literal('recycled'),
+        literal(task_id, ImageRecycle.cleaning_task_id.type),
+        literal(reason, ImageRecycle.cleaning_reason.type),
+        literal(recycled_at or datetime.now(), ImageRecycle.recycled_at.type)
+    ).where(images.c.id.in_(image_ids))
+    columns = ['original_image_id', *IMAGE_COLUMNS, 'status', 'cleaning_task_id', 'cleaning_reason', 'recycled_at']
+    db.session.execute(insert(ImageRecycle.__table__).from_select(columns, source))
+    result = db.session.execute(delete(images).where(images.c.id.in_(image_ids)))
+    return result.rowcount
+
+def build_recycle_query(ids: Optional[List[int]] = None, cleaning_reasons: Optional[List[str]] = None,
+                        cleaning_task_id: Optional[int] = None, keyword: Optional[str] = None):
+    """
+    构建回收站记录查询（条件与回收站列表的筛选一致）
+    
+    Args:
+        ids: 回收站记录ID列表
+        cleaning_reasons: 清洗原因（模糊匹配，满足任一即可），例如 ['no_person', '无人物']
+        cleaning_task_id: 清洗任务ID
+        keyword: 文件名或关键词（模糊匹配）
+    """
+    query = ImageRecycle.query
+    if ids is not None:
+        query = query.filter(ImageRecycle.id.in_(ids))
+    if cleaning_reasons:
+        query = query.filter(or_(*[ImageRecycle.cleaning_reason.like(f'%{reason}%') for reason in cleaning_reasons]))
+    if cleaning_task_id:
+        query = query.filter(ImageRecycle.cleaning_task_id == cleaning_task_id)
+    if keyword:
+        query = query.filter(or_(
+            ImageRecycle.filename.like(f'%{keyword}%'),
+            ImageRecycle.keyword.like(f'%{keyword}%')
+        ))
+    return query
+
+def count_restorable(query, after_id: Optional[int] = None) -> Dict:
+    """
+    统计将要还原的记录（预演，不修改数据）
+    
+    Returns:
+        Dict: {matched: 匹配的记录数, overwrite_existing: 原图片ID仍在images表中、将覆盖更新的记录数,
+               without_original_id: 没有原图片ID、将分配新ID的记录数}
+    """
+    if after_id is not None:
+        query = query.filter(ImageRecycle.id > after_id)
+    return {
+        'matched': query.count(),
+        'overwrite_existing': query.join(Image, Image.id == ImageRecycle.original_image_id).count(),
+        'without_original_id': query.filter(ImageRecycle.original_image_id.is_(None)).count()
+    }
+
+def _restore_chunk(rows) -> Dict:
+    """在一个事务中还原一批回收站记录（rows按回收站ID升序，包含id和original_image_id）"""
+    recycle = ImageRecycle.__table__
+    images = Image.__table__
+    recycle_ids = [row.id for row in rows]
+    
+    # 优先沿用原图片ID；同一原图片ID有多条回收记录时以最后一条为准（与逐条还原的结果一致）
+    latest = {}
+    without_original = []
+    for row in rows:
+        if row.original_image_id is None:
+            without_original.append(row.id)
+        else:
+            latest[row.original_image_id] = row.id
+    existing = set()
+    if latest:
+        existing = set(db.session.execute(select(images.c.id).where(images.c.id.in_(list(latest)))).scalars())
+    update_ids = [recycle_id for image_id, recycle_id in latest.items() if image_id in existing]
+    insert_ids = [recycle_id for image_id, recycle_id in latest.items() if image_id not in existing]
+    
+    # 原图片ID仍在images表中：用回收站记录覆盖更新
+    if update_ids:
+        values = {images.c[name]: recycle.c[name] for name in IMAGE_COLUMNS}
+        values[images.c.status] = 'active'
+        db.session.execute(
+            update(images)
+            .where(images.c.id == recycle.c.original_image_id, recycle.c.id.in_(update_ids))
+            .values(values)
+        )
+    # 原图片ID已不存在：按原ID插入
+    if insert_ids:
+        db.session.execute(insert(images).from_select(
+            ['id', *IMAGE_COLUMNS, 'status'],
+            select(recycle.c.original_image_id, *[recycle.c[name] for name in IMAGE_COLUMNS], literal('active'))
+            .where(recycle.c.id.in_(insert_ids))
+        ))
+    # 没有原图片ID：由数据库分配新ID
+    if without_original:
+        db.session.execute(insert(images).from_select(
+            [*IMAGE_COLUMNS, 'status'],
+            select(*[recycle.c[name] for name in IMAGE_COLUMNS], literal('active'))
+            .where(recycle.c.id.in_(without_original))
+        ))
+    db.session.execute(delete(recycle).where(recycle.c.id.in_(recycle_ids)))
+    db.session.commit()
+    
+    return {
+        'restored': len(update_ids) + len(insert_ids) + len(without_original),
+        'overwritten': len(update_ids),
+        'merged': len(recycle_ids) - len(latest) - len(without_original)
+    }
+
+def restore_recycled_images(query, after_id: Optional[int] = None, chunk_size: int = RESTORE_CHUNK_SIZE,
+                            max_chunks: Optional[int] = None,
+                            on_chunk: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    按回收站ID升序分批还原图片到images表，每批一个事务；某一批失败时回滚该批并停止，
+    cursor停留在最后一个成功提交的批次，从cursor继续即可重试失败的批次
+    
+    Args:
+        query: 回收站记录查询（build_recycle_query构建）
+        after_id: 从该回收站ID之后开始（上次返回的cursor），None表示从头开始
+        chunk_size: 每批记录数
+        max_chunks: 最多处理的批数（None表示全部），未处理完时可用返回的cursor继续
+        on_chunk: 每批处理后的回调，参数为当前统计
+        
+    Returns:
+        Dict: {restored, overwritten, merged, failed, errors, cursor: 已成功还原的最后一个回收站ID, done: 是否已全部处理}
+    """
+    stats = {
+        'restored': 0,
+        'overwritten': 0,
+        'merged': 0,
+        'failed': 0,
+        'errors': [],
+        'cursor': after_id,
+        'done': False
+    }
+    chunks = iter_id_chunks(
+        query.with_entities(ImageRecycle.id, ImageRecycle.original_image_id),
+        ImageRecycle.id, after_id, chunk_size
+    )
+    processed_chunks = 0
+    for rows in chunks:
+        try:
+            result = _restore_chunk(rows)
+        except Exception as e:
+            # 失败的批次保留在回收站中；cursor不越过该批次，停止后从cursor继续即可重试
+            db.session.rollback()
+            stats['failed'] += len(rows)
+            error_msg = f"还原图片失败 (recycle_id={rows[0].id}~{rows[-1].id}): {str(e)}"
+            stats['errors'].append(error_msg)
+            logger.error(error_msg, exc_info=True)
+            if on_chunk:
+                on_chunk(stats)
+            break
+        stats['restored'] += result['restored']
+        stats['overwritten'] += result['overwritten']
+        stats['merged'] += result['merged']
+        stats['cursor'] = rows[-1].id
+        processed_chunks += 1
+        if on_chunk:
+            on_chunk(stats)
+        if max_chunks is not None and processed_chunks >= max_chunks:
+            break
+    else:
+        stats['done'] = True
+    
+    logger.info(f"批量还原回收站图片: restored={stats['restored']}, failed={stats['failed']}, cursor={stats['cursor']}, done={stats['done']}")
+    return stats
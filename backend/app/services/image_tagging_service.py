@@ -7,12 +7,47 @@ import os
 import json
 import base64
 import logging
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, List, Optional, Tuple
 from openai import OpenAI
 from PIL import Image
+from app.config import Config
+from app.services.model_response_cache import get_model_response_cache
+from app.utils.config_manager import get_tagging_payload_cache_max_bytes
+from app.utils.content_hash import compute_file_hash
+from app.utils.image_payload import ImagePayloadPreprocessor
+from app.utils.rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+_rate_limiter = None
+_singleton_lock = threading.Lock()
+_payload_preprocessor = None
+
+def get_tagging_rate_limiter() -> TokenBucket:
+    """获取进程内共享的大模型调用限流器（所有打标调用共用同一份API配额）"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _singleton_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucket.per_minute(Config.TAGGING_RATE_LIMIT_RPM, Config.TAGGING_RATE_LIMIT_BURST)
+    return _rate_limiter
+
+def get_tagging_payload_preprocessor() -> ImagePayloadPreprocessor:
+    """获取进程内共享的打标上传图片预处理器（缩放、重新编码并按内容哈希缓存）"""
+    global _payload_preprocessor
+    if _payload_preprocessor is None:
+        with _singleton_lock:
+            if _payload_preprocessor is None:
+                _payload_preprocessor = ImagePayloadPreprocessor(
+                    'tagging_payloads',
+                    Config.TAGGING_PAYLOAD_MAX_SIDE,
+                    Config.TAGGING_PAYLOAD_FORMAT,
+                    Config.TAGGING_PAYLOAD_QUALITY,
+                    get_tagging_payload_cache_max_bytes
+                )
+    return _payload_preprocessor
+
 def encode_image_to_base64(image_path: str) -> str:
     """将图片文件编码为 base64 字符串"""
     try:
@@ -44,26 +79,20 @@ class ImageTaggingService:
         api_key = os.getenv('DASHSCOPE_API_KEY', 'sk-49b9d09679d54394a7d253c96e1a2596')
         self.client = OpenAI(
             api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+            base_url=Config.DASHSCOPE_BASE_URL,
         )
-        self.model = "qwen-vl-max"  # 使用qwen-vl-max模型
+        self.model = Config.TAGGING_MODEL  # 默认使用qwen-vl-max模型
+        self.rate_limiter = get_tagging_rate_limiter()
+        self.response_cache = get_model_response_cache()
+        self.payload_preprocessor = get_tagging_payload_preprocessor()
     
-    def _build_prompt(self, features: List[Dict]) -> str:
+    def _describe_features(self, features: List[Dict]) -> Tuple[List[str], List[str]]:
         """
-        根据特征列表构建prompt
+        构建特征描述行和输出字段行
         
-        Args:
-            features: 特征列表，每个特征包含 name, description, values_json 等信息
-            
         Returns:
-            str: 构建的prompt
+            Tuple: (特征描述列表, 输出字段列表)
         """
-        prompt_parts = []
-        prompt_parts.append("你是一位资深的摄影师和图像分析专家，你熟悉摄影的各种理论知识。")
-        prompt_parts.append("请仔细分析这张图片，并根据要求输出相应的特征信息。")
-        prompt_parts.append("")
-        
-        # 构建特征描述
         feature_descriptions = []
         output_fields = []
         
@@ -92,6 +121,26 @@ class ImageTaggingService:
             feature_descriptions.append(f"- {feature_desc}")
             output_fields.append(f'"{name}": "对应的值"')
         
+        return feature_descriptions, output_fields
+    
+    def _build_prompt(self, features: List[Dict]) -> str:
+        """
+        根据特征列表构建prompt
+        
+        Args:
+            features: 特征列表，每个特征包含 name, description, values_json 等信息
+            
+        Returns:
+            str: 构建的prompt
+        """
+        prompt_parts = []
+        prompt_parts.append("你是一位资深的摄影师和图像分析专家，你熟悉摄影的各种理论知识。")
+        prompt_parts.append("请仔细分析这张图片，并根据要求输出相应的特征信息。")
+        prompt_parts.append("")
+        
+        # 构建特征描述
+        feature_descriptions, output_fields = self._describe_features(features)
+        
         if feature_descriptions:
             prompt_parts.append("需要分析的特征包括：")
             prompt_parts.extend(feature_descriptions)
@@ -106,33 +155,91 @@ class ImageTaggingService:
         
         return "\n".join(prompt_parts)
     
-    def tag_image(self, image_path: str, features: List[Dict]) -> Dict:
+    def _build_batch_prompt(self, features: List[Dict], image_count: int) -> str:
+        """
+        构建多图批量打标的prompt，要求按图片顺序输出JSON数组
+        
+        Args:
+            features: 特征列表
+            image_count: 本次请求的图片数
+            
+        Returns:
+            str: 构建的prompt
+        """
+        prompt_parts = []
+        prompt_parts.append("你是一位资深的摄影师和图像分析专家，你熟悉摄影的各种理论知识。")
+        prompt_parts.append(f"上面依次给出了{image_count}张图片，请逐张仔细分析，并根据要求分别输出每张图片的特征信息。")
+        prompt_parts.append("")
+        
+        feature_descriptions, output_fields = self._describe_features(features)
+        
+        if feature_descriptions:
+            prompt_parts.append("需要分析的特征包括：")
+            prompt_parts.extend(feature_descriptions)
+            prompt_parts.append("")
+        
+        prompt_parts.append(f"请按下面格式输出结果，使用JSON格式，results数组必须包含{image_count}个元素，按图片顺序排列，"
+                            "index为图片序号（从1开始），不要增加额外的字段，也不要删除任何字段：")
+        prompt_parts.append("{")
+        prompt_parts.append('    "results": [')
+        prompt_parts.append("        {")
+        prompt_parts.append('            "index": 1,')
+        for field in output_fields:
+            prompt_parts.append(f"            {field},")
+        prompt_parts.append("        },")
+        prompt_parts.append("        ...")
+        prompt_parts.append("    ]")
+        prompt_parts.append("}")
+        
+        return "\n".join(prompt_parts)
+    
+    def tag_image(self, image_path: str, features: List[Dict], content_hash: Optional[str] = None,
+                  use_cache: bool = True) -> Dict:
         """
         对图片进行打标
         
         Args:
             image_path: 图片路径
             features: 特征列表，每个特征包含 name, description, values_json 等信息
+            content_hash: 图片内容哈希（SHA256，与Image.image_hash一致），为空时根据文件计算
+            use_cache: 是否使用响应缓存
             
         Returns:
-            Dict: 打标结果
+            Dict: 打标结果，命中缓存时 cached 为True
         """
         try:
             # 检查图片文件是否存在
             if not os.path.exists(image_path):
                 raise FileNotFoundError(f"图片文件不存在: {image_path}")
             
-            # 将图片编码为 base64
-            base64_image = encode_image_to_base64(image_path)
-            mime_type = get_image_mime_type(image_path)
+            # 构建prompt（特征按名称排序，保证同一组特征生成相同的prompt和缓存键）
+            prompt = self._build_prompt(sorted(features, key=lambda f: f.get('name', '')))
+            
+            # 先查响应缓存，命中时不调用大模型
+            if use_cache and self.response_cache.enabled:
+                content_hash = content_hash or compute_file_hash(image_path)
+                cached = self.response_cache.get(content_hash, prompt, self.model, self.payload_preprocessor.version_tag)
+                if cached:
+                    logger.info(f"命中打标响应缓存: image_path={image_path}, features={[f['name'] for f in features]}")
+                    return {
+                        'success': True,
+                        'result': cached['result'],
+                        'raw_response': cached.get('raw_response'),
+                        'cached': True
+                    }
             
-            # 构建prompt
-            prompt = self._build_prompt(features)
+            # 按模型可用的分辨率缩放、重新编码后再编码为 base64
+            if self.payload_preprocessor.enabled:
+                content_hash = content_hash or compute_file_hash(image_path)
+            upload_path = self.payload_preprocessor.prepare(image_path, content_hash)
+            base64_image = encode_image_to_base64(upload_path)
+            mime_type = get_image_mime_type(upload_path)
             
             logger.info(f"开始调用大模型进行打标: image_path={image_path}, features={[f['name'] for f in features]}")
             logger.debug(f"Prompt: {prompt}")
             
-            # 调用大模型API
+            # 调用大模型API（先获取限流令牌，多线程并发调用时共享配额）
+            self.rate_limiter.acquire()
             completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -159,6 +266,7 @@ class ImageTaggingService:
             result_content = completion.choices[0].message.content
             logger.debug(f"大模型返回结果: {result_content}")
             
+            parsed = True
             try:
                 result_json = json.loads(result_content)
             except json.JSONDecodeError as e:
@@ -170,11 +278,17 @@ class ImageTaggingService:
                     result_json = json.loads(json_match.group())
                 else:
                     result_json = {"raw_content": result_content, "error": "无法解析JSON"}
+                    parsed = False
+            
+            # 只缓存成功解析的结果
+            if use_cache and parsed:
+                self.response_cache.put(content_hash, prompt, self.model, self.payload_preprocessor.version_tag, result_json, result_content)
             
             return {
                 'success': True,
                 'result': result_json,
-                'raw_response': result_content
+                'raw_response': result_content,
+                'cached': False
             }
             
         except Exception as e:
@@ -184,4 +298,111 @@ class ImageTaggingService:
                 'error': str(e),
                 'result': {}
             }
-
+    
+    def _request_batch(self, images: List[Tuple[str, Optional[str]]], features: List[Dict]) -> Dict[int, Dict]:
+        """
+        一次请求对多张图片打标
+        
+        Args:
+            images: [(图片路径, 内容哈希)]
+        
+        Returns:
+            Dict: 图片序号（从0开始）-> 校验通过的打标结果；缺失或不合法的图片不在结果中
+        """
+        content = []
+        for i, (image_path, content_hash) in enumerate(images, start=1):
+            upload_path = self.payload_preprocessor.prepare(image_path, content_hash)
+            content.append({"type": "text", "text": f"图片{i}："})
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{get_image_mime_type(upload_path)};base64,{encode_image_to_base64(upload_path)}"
+                }
+            })
+        prompt = self._build_batch_prompt(features, len(images))
+        content.append({"type": "text", "text": prompt})
+        
+        logger.info(f"开始调用大模型进行批量打标: images={len(images)}, features={[f['name'] for f in features]}")
+        self.rate_limiter.acquire()
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": content}],
+            response_format={"type": "json_object"}
+        )
+        result_content = completion.choices[0].message.content
+        logger.debug(f"大模型批量返回结果: {result_content}")
+        
+        # 校验：results数组中每个元素需有合法的index且包含全部特征字段
+        feature_names = [f['name'] for f in features]
+        items = json.loads(result_content).get('results')
+        if not isinstance(items, list):
+            raise ValueError('返回结果缺少results数组')
+        
+        valid = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('index')) - 1
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= index < len(images) or index in valid:
+                continue
+            if any(name not in item for name in feature_names):
+                continue
+            valid[index] = {name: item[name] for name in feature_names}
+        return valid
+    
+    def tag_images(self, images: List[Tuple[str, Optional[str]]], features: List[Dict]) -> List[Dict]:
+        """
+        批量打标：一次请求发送多张图片，校验每张图片的结果，不合法的图片再逐张重试
+        
+        Args:
+            images: [(图片路径, 内容哈希)]，内容哈希为空时根据文件计算
+            features: 特征列表
+            
+        Returns:
+            List[Dict]: 与images一一对应的打标结果，格式同tag_image
+        """
+        features = sorted(features, key=lambda f: f.get('name', ''))
+        prompt = self._build_prompt(features)
+        payload_version = self.payload_preprocessor.version_tag
+        results = [None] * len(images)
+        to_request = []  # [(序号, 路径, 内容哈希)]
+        
+        for i, (image_path, content_hash) in enumerate(images):
+            if not os.path.exists(image_path):
+                results[i] = {'success': False, 'error': f"图片文件不存在: {image_path}", 'result': {}}
+                continue
+            content_hash = content_hash or compute_file_hash(image_path)
+            cached = self.response_cache.get(content_hash, prompt, self.model, payload_version) if self.response_cache.enabled else None
+            if cached:
+                results[i] = {'success': True, 'result': cached['result'], 'raw_response': cached.get('raw_response'), 'cached': True}
+            else:
+                to_request.append((i, image_path, content_hash))
+        
+        if len(to_request) > 1:
+            try:
+                valid = self._request_batch([(image_path, content_hash) for _, image_path, content_hash in to_request], features)
+            except Exception as e:
+                logger.warning(f"批量打标请求失败，改为逐张打标: images={len(to_request)}, error={e}")
+                valid = {}
+            
+            for position, (i, image_path, content_hash) in enumerate(to_request):
+                if position in valid:
+                    result_json = valid[position]
+                    raw_response = json.dumps(result_json, ensure_ascii=False)
+                    # 按单图prompt写入缓存，单图和批量打标共用
+                    self.response_cache.put(content_hash, prompt, self.model, payload_version, result_json, raw_response)
+                    results[i] = {'success': True, 'result': result_json, 'raw_response': raw_response, 'cached': False}
+            
+            failed_count = len(to_request) - len(valid)
+            if failed_count:
+                logger.warning(f"批量打标有 {failed_count}/{len(to_request)} 张图片结果缺失或不合法，逐张重试")
+        
+        # 单张请求以及批量结果不合法的图片逐张打标
+        for i, image_path, content_hash in to_request:
+            if results[i] is None:
+                results[i] = self.tag_image(image_path, features, content_hash)
+        
+        return results
@@ -4,19 +4,32 @@ LUT应用服务
 用于将LUT文件应用到图片上
 """
 import os
+import threading
 import numpy as np
 from PIL import Image
 import logging
-from typing import Tuple, Optional
+from collections import OrderedDict
+from typing import Tuple, Optional, Sequence, Union
 
 logger = logging.getLogger(__name__)
 
+# LUT链烘焙结果缓存（进程内LRU），键为链上各LUT文件哈希组成的元组
+_BAKED_LUT_CACHE_MAX = 64
+_baked_lut_cache = OrderedDict()
+_baked_lut_cache_lock = threading.Lock()
+
 class LutApplicationService:
     """LUT应用服务类"""
     
     def __init__(self):
         pass
     
+    @staticmethod
+    def _lut_file_key(lut_path: str) -> Tuple[str, int, int]:
+        """LUT文件的缓存键：(绝对路径, 修改时间, 文件大小)"""
+        stat = os.stat(lut_path)
+        return os.path.abspath(lut_path), stat.st_mtime_ns, stat.st_size
+    
     def load_lut_cube(self, lut_path: str) -> Optional[np.ndarray]:
         """
         加载.cube格式的LUT文件
@@ -82,13 +95,172 @@ class LutApplicationService:
             logger.error(f"加载LUT文件失败 {lut_path}: {e}")
             return None
     
-    def apply_lut_to_image(self, image_path: str, lut_path: str, output_path: str) -> Tuple[bool, Optional[str]]:
+    @staticmethod
+    def sample_lut(lut_array: np.ndarray, rgb: np.ndarray) -> np.ndarray:
+        """
+        使用三线性插值在LUT中采样颜色
+        
+        Args:
+            lut_array: 3D LUT数组 (size, size, size, 3)，索引顺序 [b, g, r]
+            rgb: 输入颜色数组 (..., 3)，取值范围 0-1
+            
+        Returns:
+            采样后的颜色数组 (..., 3)
+        """
+        lut_size = lut_array.shape[0]
+        coords = np.clip(rgb, 0.0, 1.0) * (lut_size - 1)
+        lower = np.floor(coords).astype(np.int32)
+        lower = np.clip(lower, 0, lut_size - 2) if lut_size > 1 else lower
+        upper = np.minimum(lower + 1, lut_size - 1)
+        frac = (coords - lower).astype(np.float32)
+        
+        r0, g0, b0 = lower[..., 0], lower[..., 1], lower[..., 2]
+        r1, g1, b1 = upper[..., 0], upper[..., 1], upper[..., 2]
+        fr, fg, fb = frac[..., 0:1], frac[..., 1:2], frac[..., 2:3]
+        
+        # 先沿R插值，再沿G，最后沿B
+        c00 = lut_array[b0, g0, r0] * (1 - fr) + lut_array[b0, g0, r1] * fr
+        c01 = lut_array[b1, g0, r0] * (1 - fr) + lut_array[b1, g0, r1] * fr
+        c10 = lut_array[b0, g1, r0] * (1 - fr) + lut_array[b0, g1, r1] * fr
+        c11 = lut_array[b1, g1, r0] * (1 - fr) + lut_array[b1, g1, r1] * fr
+        c0 = c00 * (1 - fg) + c10 * fg
+        c1 = c01 * (1 - fg) + c11 * fg
+        return c0 * (1 - fb) + c1 * fb
+    
+    def compose_luts(self, lut_paths: Sequence[str], lut_size: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        将有序的LUT链烘焙为单个3D LUT：从恒等网格开始，依次通过链上每个LUT采样
+        
+        烘焙结果按链上各LUT文件的路径、修改时间和大小缓存，应用多个LUT叠加的效果与应用单个LUT的开销相同。
+        
+        Args:
+            lut_paths: 按应用顺序排列的LUT文件路径列表
+            lut_size: 烘焙网格大小，默认取链上最大的LUT_3D_SIZE
+            
+        Returns:
+            3D LUT数组 (size, size, size, 3) 或 None
+        """
+        try:
+            if not lut_paths:
+                logger.error("LUT链为空")
+                return None
+            
+            for lut_path in lut_paths:
+                if not os.path.exists(lut_path):
+                    logger.error(f"LUT文件不存在: {lut_path}")
+                    return None
+                lut_ext = os.path.splitext(lut_path)[1].lower()
+                if lut_ext != '.cube':
+                    logger.error(f"不支持的LUT格式: {lut_ext}")
+                    return None
+            
+            # 按文件路径、修改时间和大小缓存，LUT文件被替换后自动失效（不必每次读取文件计算哈希）
+            cache_key = (tuple(self._lut_file_key(p) for p in lut_paths), lut_size)
+            with _baked_lut_cache_lock:
+                cached = _baked_lut_cache.get(cache_key)
+                if cached is not None:
+                    _baked_lut_cache.move_to_end(cache_key)
+                    return cached
+            
+            lut_arrays = []
+            for lut_path in lut_paths:
+                lut_array = self.load_lut_cube(lut_path)
+                if lut_array is None:
+                    return None
+                lut_arrays.append(lut_array)
+            
+            if len(lut_arrays) == 1 and lut_size in (None, lut_arrays[0].shape[0]):
+                baked = lut_arrays[0]
+            else:
+                size = lut_size or max(arr.shape[0] for arr in lut_arrays)
+                # 恒等网格，索引顺序 [b, g, r]，最后一维为 (r, g, b)
+                axis = np.linspace(0.0, 1.0, size, dtype=np.float32)
+                b_grid, g_grid, r_grid = np.meshgrid(axis, axis, axis, indexing='ij')
+                baked = np.stack([r_grid, g_grid, b_grid], axis=-1)
+                for lut_array in lut_arrays:
+                    baked = self.sample_lut(lut_array, baked)
+                baked = np.clip(baked, 0.0, 1.0).astype(np.float32)
+            
+            with _baked_lut_cache_lock:
+                _baked_lut_cache[cache_key] = baked
+                _baked_lut_cache.move_to_end(cache_key)
+                while len(_baked_lut_cache) > _BAKED_LUT_CACHE_MAX:
+                    _baked_lut_cache.popitem(last=False)
+            
+            logger.info(f"LUT链烘焙完成: {len(lut_paths)} 个LUT, 网格大小 {baked.shape[0]}")
+            return baked
+            
+        except Exception as e:
+            logger.error(f"烘焙LUT链失败 {list(lut_paths)}: {e}")
+            return None
+    
+    def load_lut(self, lut_source: Union[str, Sequence[str], np.ndarray]) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """
+        加载LUT：支持单个LUT文件路径、LUT文件路径链（烘焙为单个LUT）或已加载的LUT数组
+        
+        Returns:
+            (3D LUT数组, 错误信息)
+        """
+        if isinstance(lut_source, np.ndarray):
+            return lut_source, None
+        
+        if isinstance(lut_source, (list, tuple)):
+            lut_array = self.compose_luts(lut_source)
+            if lut_array is None:
+                return None, "烘焙LUT链失败"
+            return lut_array, None
+        
+        if not os.path.exists(lut_source):
+            return None, f"LUT文件不存在: {lut_source}"
+        
+        lut_ext = os.path.splitext(lut_source)[1].lower()
+        if lut_ext != '.cube':
+            return None, f"不支持的LUT格式: {lut_ext}"
+        
+        lut_array = self.load_lut_cube(lut_source)
+        if lut_array is None:
+            return None, "加载LUT文件失败"
+        return lut_array, None
+    
+    def apply_lut_array(self, img_array: np.ndarray, lut_array: np.ndarray) -> np.ndarray:
+        """
+        将LUT数组应用到图片数组
+        
+        Args:
+            img_array: RGB图片数组 (height, width, 3)，取值范围 0-1
+            lut_array: 3D LUT数组 (size, size, size, 3)，索引顺序 [b, g, r]
+            
+        Returns:
+            应用LUT后的uint8图片数组
+        """
+        lut_size = lut_array.shape[0]
+        
+        # 将RGB值映射到LUT索引
+        # .cube格式的LUT索引顺序是B-G-R（最外层B，中间G，最内层R）
+        r_indices = (img_array[:, :, 0] * (lut_size - 1)).astype(np.int32)
+        g_indices = (img_array[:, :, 1] * (lut_size - 1)).astype(np.int32)
+        b_indices = (img_array[:, :, 2] * (lut_size - 1)).astype(np.int32)
+        
+        # 确保索引在范围内
+        r_indices = np.clip(r_indices, 0, lut_size - 1)
+        g_indices = np.clip(g_indices, 0, lut_size - 1)
+        b_indices = np.clip(b_indices, 0, lut_size - 1)
+        
+        # 使用高级索引获取LUT值
+        # 注意：.cube格式的LUT数组索引顺序是 [b, g, r]，而不是 [r, g, b]
+        output_array = lut_array[b_indices, g_indices, r_indices]
+        
+        # 将值限制在0-1范围内并转换为0-255
+        output_array = np.clip(output_array, 0, 1)
+        return (output_array * 255).astype(np.uint8)
+    
+    def apply_lut_to_image(self, image_path: str, lut_path: Union[str, Sequence[str], np.ndarray], output_path: str) -> Tuple[bool, Optional[str]]:
         """
         将LUT应用到图片
         
         Args:
             image_path: 输入图片路径
-            lut_path: LUT文件路径
+            lut_path: LUT文件路径；也可以是LUT文件路径列表（按顺序叠加，烘焙为单个LUT后应用）或已加载的LUT数组
             output_path: 输出图片路径
             
         Returns:
@@ -103,8 +275,9 @@ class LutApplicationService:
                 logger.error(error_msg)
                 return False, error_msg
             
-            if not os.path.exists(lut_path):
-                error_msg = f"LUT文件不存在: {lut_path}"
+            # 加载LUT（单个文件、LUT链或LUT数组）
+            lut_array, error_msg = self.load_lut(lut_path)
+            if lut_array is None:
                 logger.error(error_msg)
                 return False, error_msg
             
@@ -117,51 +290,93 @@ class LutApplicationService:
             
             img_array = np.array(img, dtype=np.float32) / 255.0
             
-            # 获取LUT文件扩展名
-            lut_ext = os.path.splitext(lut_path)[1].lower()
+            # 应用LUT（使用向量化操作）
+            output_array = self.apply_lut_array(img_array, lut_array)
             
-            # 加载LUT
-            if lut_ext == '.cube':
-                lut_array = self.load_lut_cube(lut_path)
-            else:
-                return False, f"不支持的LUT格式: {lut_ext}"
+            logger.info(f"应用LUT: 输入形状 {img_array.shape}, 输出形状 {output_array.shape}")
             
-            if lut_array is None:
-                return False, "加载LUT文件失败"
+            # 保存图片
+            output_img = Image.fromarray(output_array)
+            output_img.save(output_path, quality=95)
             
-            lut_size = lut_array.shape[0]
+            return True, None
             
-            # 应用LUT（使用向量化操作）
-            height, width = img_array.shape[:2]
+        except Exception as e:
+            logger.error(f"应用LUT失败: {e}")
+            return False, str(e)
+
+    
+    def render_lut_mosaic(self, image_path: str, luts: Sequence[Tuple[str, Union[str, Sequence[str]]]],
+                          output_path: str, tile_size: int = 256, columns: Optional[int] = None) -> Tuple[bool, Optional[str]]:
+        """
+        将一张图片缩小后依次应用多个LUT，拼接为带标签的对比图（contact sheet）
+        
+        图片只解码和缩放一次，所有LUT都在缩小后的数组上应用。
+        
+        Args:
+            image_path: 输入图片路径
+            luts: (标签, LUT) 列表，LUT可以是文件路径或LUT链
+            output_path: 输出图片路径
+            tile_size: 每个格子的最长边像素
+            columns: 列数，默认取接近正方形的列数
             
-            # 将RGB值映射到LUT索引
-            # .cube格式的LUT索引顺序是B-G-R（最外层B，中间G，最内层R）
-            r_indices = (img_array[:, :, 0] * (lut_size - 1)).astype(np.int32)
-            g_indices = (img_array[:, :, 1] * (lut_size - 1)).astype(np.int32)
-            b_indices = (img_array[:, :, 2] * (lut_size - 1)).astype(np.int32)
+        Returns:
+            (成功标志, 错误信息)
+        """
+        try:
+            from PIL import ImageDraw, ImageFont
             
-            # 确保索引在范围内
-            r_indices = np.clip(r_indices, 0, lut_size - 1)
-            g_indices = np.clip(g_indices, 0, lut_size - 1)
-            b_indices = np.clip(b_indices, 0, lut_size - 1)
+            if not os.path.exists(image_path):
+                return False, f"输入图片不存在: {image_path}"
+            if not luts:
+                return False, "LUT列表为空"
             
-            # 使用高级索引获取LUT值
-            # 注意：.cube格式的LUT数组索引顺序是 [b, g, r]，而不是 [r, g, b]
-            output_array = lut_array[b_indices, g_indices, r_indices]
+            # 解码并缩小一次
+            img = Image.open(image_path)
+            img.draft('RGB', (tile_size, tile_size))
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail((tile_size, tile_size), Image.LANCZOS)
+            img_array = np.array(img, dtype=np.float32) / 255.0
+            tile_h, tile_w = img_array.shape[:2]
             
-            logger.info(f"应用LUT: 输入形状 {img_array.shape}, 输出形状 {output_array.shape}")
+            # 加载字体（优先使用支持中文的字体）
+            label_height = max(16, tile_size // 12)
+            font = None
+            for font_name in ('msyh.ttc', 'simhei.ttf', 'NotoSansCJK-Regular.ttc', 'DejaVuSans.ttf'):
+                try:
+                    font = ImageFont.truetype(font_name, label_height - 4)
+                    break
+                except OSError:
+                    continue
+            if font is None:
+                font = ImageFont.load_default()
             
-            # 将值限制在0-1范围内并转换为0-255
-            output_array = np.clip(output_array, 0, 1)
-            output_array = (output_array * 255).astype(np.uint8)
+            count = len(luts)
+            if not columns:
+                columns = int(np.ceil(np.sqrt(count)))
+            columns = max(1, min(columns, count))
+            rows = int(np.ceil(count / columns))
             
-            # 保存图片
-            output_img = Image.fromarray(output_array)
-            output_img.save(output_path, quality=95)
+            cell_h = tile_h + label_height
+            mosaic = Image.new('RGB', (columns * tile_w, rows * cell_h), (255, 255, 255))
+            draw = ImageDraw.Draw(mosaic)
+            
+            for idx, (label, lut_source) in enumerate(luts):
+                x = (idx % columns) * tile_w
+                y = (idx // columns) * cell_h
+                lut_array, error_msg = self.load_lut(lut_source)
+                if lut_array is None:
+                    logger.warning(f"对比图中LUT加载失败: {label}, {error_msg}")
+                    draw.rectangle([x, y, x + tile_w - 1, y + tile_h - 1], fill=(200, 200, 200))
+                else:
+                    tile = Image.fromarray(self.apply_lut_array(img_array, lut_array))
+                    mosaic.paste(tile, (x, y))
+                draw.text((x + 4, y + tile_h + 2), str(label), fill=(0, 0, 0), font=font)
             
+            mosaic.save(output_path, quality=90)
             return True, None
             
         except Exception as e:
-            logger.error(f"应用LUT失败: {e}")
+            logger.error(f"生成LUT对比图失败: {e}")
             return False, str(e)
-
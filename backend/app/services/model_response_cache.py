@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+大模型打标响应缓存
+按 (图片内容哈希, prompt哈希, 模型名, 上传图片的预处理版本) 缓存解析后的打标结果，存储在磁盘上，
+受过期时间和总大小限制；相同图片、相同特征定义的重复分析直接返回缓存结果
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+from app.config import Config
+from app.utils.config_manager import get_local_image_dir, get_model_response_cache_max_bytes
+from app.utils.disk_lru_cache import DiskLruCache
+
+logger = logging.getLogger(__name__)
+
+class ModelResponseCache:
+    """大模型打标响应的磁盘缓存（线程安全，可在打标工作线程中直接使用）"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            cache_dir: 缓存目录，默认 storage/model_responses
+            max_bytes: 缓存总大小上限（字节），默认读取config.json
+            ttl_seconds: 缓存有效期（秒），<=0 表示禁用缓存，默认读取配置TAGGING_RESPONSE_CACHE_TTL_DAYS
+        """
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self.ttl_seconds = Config.TAGGING_RESPONSE_CACHE_TTL_DAYS * 86400 if ttl_seconds is None else ttl_seconds
+        self._cache = None
+        self._cache_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _get_cache(self) -> DiskLruCache:
+        with self._cache_lock:
+            if self._cache is None:
+                cache_dir = self._cache_dir
+                if not cache_dir:
+                    base_dir = get_local_image_dir()
+                    cache_dir = os.path.join(os.path.dirname(base_dir), 'storage', 'model_responses')
+                max_bytes = self._max_bytes or get_model_response_cache_max_bytes()
+                self._cache = DiskLruCache(cache_dir, max_bytes)
+            return self._cache
+
+    @staticmethod
+    def make_key(content_hash: str, prompt: str, model: str, payload_version: str) -> str:
+        """生成缓存键：图片内容哈希 + prompt、模型与预处理版本的哈希"""
+        prompt_hash = hashlib.sha256(f'{model}\n{payload_version}\n{prompt}'.encode('utf-8')).hexdigest()[:32]
+        return f"{content_hash[:2]}/{content_hash}_{prompt_hash}.json"
+
+    def get(self, content_hash: str, prompt: str, model: str, payload_version: str) -> Optional[Dict]:
+        """
+        查询缓存
+
+        Args:
+            payload_version: 上传图片的预处理版本（ImagePayloadPreprocessor.version_tag），
+                分辨率或编码参数不同的结果不共用
+
+        Returns:
+            Dict: {'result': 解析后的打标结果, 'raw_response': 原始返回}，未命中或已过期返回None
+        """
+        if not self.enabled or not content_hash:
+            return None
+        try:
+            path = self._get_cache().get(self.make_key(content_hash, prompt, model, payload_version))
+            if not path:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if time.time() - entry.get('created_at', 0) > self.ttl_seconds:
+                return None
+            return entry
+        except Exception as e:
+            logger.warning(f"读取大模型响应缓存失败: content_hash={content_hash}, error={e}")
+            return None
+
+    def put(self, content_hash: str, prompt: str, model: str, payload_version: str, result: Dict,
+            raw_response: Optional[str] = None):
+        """写入缓存（失败只记录日志）"""
+        if not self.enabled or not content_hash:
+            return
+        try:
+            cache = self._get_cache()
+            key = self.make_key(content_hash, prompt, model, payload_version)
+            temp_path = cache.temp_path_for(key)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'model': model,
+                    'payload_version': payload_version,
+                    'result': result,
+                    'raw_response': raw_response,
+                    'created_at': time.time()
+                }, f, ensure_ascii=False)
+            cache.put(key, temp_path)
+        except Exception as e:
+            logger.warning(f"写入大模型响应缓存失败: content_hash={content_hash}, error={e}")
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_model_response_cache() -> ModelResponseCache:
+    """获取进程内共享的大模型响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ModelResponseCache()
+    return _response_cache
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+打标结果批量写入器
+跨图片缓冲汇总、明细和历史记录，按批使用多行 INSERT ... ON DUPLICATE KEY UPDATE 落库
+"""
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from app.database import db
+from app.models.tagging_task import TaggingTask
+from app.models.image_tagging_result import ImageTaggingResult
+from app.models.image_tagging_result_detail import ImageTaggingResultDetail
+from app.models.image_tagging_result_history import ImageTaggingResultHistory
+
+logger = logging.getLogger(__name__)
+
+class TaggingResultWriter:
+    """
+    打标结果批量写入器
+
+    每次flush在同一个事务中写入缓冲的结果并推进任务的processed_count和last_image_id，
+    任务中断或进程退出时未flush的图片不会计入进度，续跑时会重新处理
+    """
+
+    def __init__(self, task_id: int, batch_size: int = 100, flush_interval: float = 2.0):
+        """
+        Args:
+            task_id: 打标任务ID
+            batch_size: 缓冲的图片数达到该值时写入
+            flush_interval: 距上次写入超过该秒数时写入（保证进度及时更新）
+        """
+        self.task_id = task_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._summaries = []
+        self._details = []
+        self._histories = []
+        self._image_ids = []
+        self._processed_count = None
+        self._last_image_id = None
+        self._last_flush = time.monotonic()
+
+    @property
+    def pending_image_ids(self) -> List[int]:
+        """已缓冲、尚未写入的图片ID"""
+        return list(self._image_ids)
+
+    def add(self, image_id: int, tagging_features: List[Dict], result_data: Dict, features_reused: Dict,
+            source_task_id: Optional[int] = None):
+        """
+        缓冲一张图片的打标结果
+
+        Args:
+            image_id: 图片ID
+            tagging_features: 任务的打标特征列表
+            result_data: 合并后的打标结果 {feature_name: value}
+            features_reused: 复用的特征 {feature_id: {tagging_value, source_task_id}}
+            source_task_id: 非复用特征的来源任务ID，None表示由当前任务对该图片打标
+        """
+        now = datetime.now()
+        self._summaries.append({
+            'image_id': image_id,
+            'last_tagging_task_id': self.task_id,
+            'tagging_result_json': json.dumps(result_data, ensure_ascii=False),
+            'created_at': now,
+            'updated_at': now
+        })
+
+        for feature in tagging_features:
+            feature_id = feature['id']
+            feature_value = result_data.get(feature['name'], None)
+            tagging_value = str(feature_value) if feature_value is not None else None
+
+            self._details.append({
+                'image_id': image_id,
+                'feature_id': feature_id,
+                'tagging_value': tagging_value,
+                'last_tagging_task_id': self.task_id,
+                'created_at': now,
+                'updated_at': now
+            })
+
+            # 如果是复用的，source_task_id是原始任务ID
+            if feature_id in features_reused:
+                feature_source_task_id = features_reused[feature_id]['source_task_id']
+            else:
+                feature_source_task_id = source_task_id
+            self._histories.append({
+                'tagging_task_id': self.task_id,
+                'image_id': image_id,
+                'feature_id': feature_id,
+                'tagging_value': tagging_value,
+                'source_task_id': feature_source_task_id,
+                'created_at': now
+            })
+
+        self._image_ids.append(image_id)
+
+    def advance(self, processed_count: int, last_image_id: Optional[int] = None):
+        """记录按顺序处理到的位置（已处理数量和最后一张图片ID），随下一次flush一起提交"""
+        self._processed_count = processed_count
+        if last_image_id is not None:
+            self._last_image_id = last_image_id
+
+    def should_flush(self) -> bool:
+        if len(self._image_ids) >= self.batch_size:
+            return True
+        return self._processed_count is not None and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        """
+        在一个事务中写入缓冲的结果和处理进度
+
+        Raises:
+            Exception: 写入失败时回滚并抛出，缓冲会被清空，由调用方统计失败；
+                这批图片和进度都没有落库，调用方应停止任务，避免之后的写入把断点推进到它们之后
+        """
+        if not self._image_ids and self._processed_count is None:
+            return
+
+        try:
+            if self._summaries:
+                stmt = mysql_insert(ImageTaggingResult.__table__).values(self._summaries)
+                stmt = stmt.on_duplicate_key_update(
+                    last_tagging_task_id=stmt.inserted.last_tagging_task_id,
+                    tagging_result_json=stmt.inserted.tagging_result_json,
+                    updated_at=stmt.inserted.updated_at
+                )
+                db.session.execute(stmt)
+
+            if self._details:
+                stmt = mysql_insert(ImageTaggingResultDetail.__table__).values(self._details)
+                stmt = stmt.on_duplicate_key_update(
+                    tagging_value=stmt.inserted.tagging_value,
+                    last_tagging_task_id=stmt.inserted.last_tagging_task_id,
+                    updated_at=stmt.inserted.updated_at
+                )
+                db.session.execute(stmt)
+
+            if self._histories:
+                db.session.execute(ImageTaggingResultHistory.__table__.insert().values(self._histories))
+
+            if self._processed_count is not None:
+                progress = {'processed_count': self._processed_count}
+                if self._last_image_id is not None:
+                    progress['last_image_id'] = self._last_image_id
+                TaggingTask.query.filter_by(id=self.task_id).update(progress, synchronize_session=False)
+
+            db.session.commit()
+            logger.debug(f"打标结果批量写入: task_id={self.task_id}, images={len(self._image_ids)}, processed_count={self._processed_count}, last_image_id={self._last_image_id}")
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            self._summaries = []
+            self._details = []
+            self._histories = []
+            self._image_ids = []
+            self._processed_count = None
+            self._last_image_id = None
+            self._last_flush = time.monotonic()
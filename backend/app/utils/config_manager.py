@@ -141,3 +141,58 @@ def get_package_storage_dir():
     
     return package_dir
 
+
+def get_lut_applied_cache_max_bytes():
+    """
+    获取LUT应用后图片（懒加载模式）磁盘缓存的大小上限
+    
+    Returns:
+        int: 缓存大小上限（字节），默认2048MB
+    """
+    config = get_config()
+    max_mb = config.get('lut_applied_cache_max_mb', 2048)
+    return int(max_mb) * 1024 * 1024
+
+def get_lut_mosaic_cache_max_bytes():
+    """
+    获取LUT对比图磁盘缓存的大小上限
+    
+    Returns:
+        int: 缓存大小上限（字节），默认512MB
+    """
+    config = get_config()
+    max_mb = config.get('lut_mosaic_cache_max_mb', 512)
+    return int(max_mb) * 1024 * 1024
+
+def get_scorer_payload_cache_max_bytes():
+    """
+    获取评分服务上传图片（预处理后）磁盘缓存的大小上限
+    
+    Returns:
+        int: 缓存大小上限（字节），默认1024MB
+    """
+    config = get_config()
+    max_mb = config.get('scorer_payload_cache_max_mb', 1024)
+    return int(max_mb) * 1024 * 1024
+
+def get_model_response_cache_max_bytes():
+    """
+    获取大模型打标响应磁盘缓存的大小上限
+    
+    Returns:
+        int: 缓存大小上限（字节），默认256MB
+    """
+    config = get_config()
+    max_mb = config.get('model_response_cache_max_mb', 256)
+    return int(max_mb) * 1024 * 1024
+
+def get_tagging_payload_cache_max_bytes():
+    """
+    获取大模型打标上传图片（预处理后）磁盘缓存的大小上限
+    
+    Returns:
+        int: 缓存大小上限（字节），默认1024MB
+    """
+    config = get_config()
+    max_mb = config.get('tagging_payload_cache_max_mb', 1024)
+    return int(max_mb) * 1024 * 1024
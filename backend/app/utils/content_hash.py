@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+图片内容哈希工具
+统一使用SHA256（与爬虫写入Image.image_hash的算法一致）
+"""
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+def compute_file_hash(file_path):
+    """
+    计算文件内容的SHA256哈希值
+    
+    Args:
+        file_path: 文件路径
+    
+    Returns:
+        str: 哈希值，计算失败返回None
+    """
+    try:
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            # 分块读取，避免大文件占用过多内存
+            while chunk := f.read(65536):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+    except Exception as e:
+        logger.error(f"计算文件哈希失败 {file_path}: {e}")
+        return None
+
+def derive_hash(*parts):
+    """
+    由多个组成部分派生出一个哈希值（用于由确定性流程生成的图片，例如样本图片+LUT）
+    
+    Returns:
+        str: 哈希值，任一组成部分为空时返回None
+    """
+    if any(part is None or part == '' for part in parts):
+        return None
+    return hashlib.sha256(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
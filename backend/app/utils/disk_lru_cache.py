@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+磁盘LRU缓存
+按文件最近访问时间（mtime）淘汰，保证缓存目录总大小不超过上限
+"""
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DiskLruCache:
+    """基于目录的大小受限LRU文件缓存"""
+    
+    def __init__(self, root_dir, max_bytes):
+        """
+        Args:
+            root_dir: 缓存根目录
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 首次写入时扫描统计
+        os.makedirs(root_dir, exist_ok=True)
+    
+    def path_for(self, key):
+        """获取缓存键对应的文件路径（key为相对路径，使用正斜杠分隔）"""
+        return os.path.join(self.root_dir, key.replace('/', os.sep))
+    
+    def temp_path_for(self, key):
+        """获取写入用的临时文件路径（与目标文件同目录、同扩展名，便于原子替换）"""
+        path = self.path_for(key)
+        directory, filename = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f".{os.urandom(4).hex()}_{filename}")
+    
+    def get(self, key):
+        """
+        查询缓存，命中时刷新访问时间
+        
+        Returns:
+            文件路径或None
+        """
+        path = self.path_for(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+    
+    def put(self, key, temp_path):
+        """
+        将已写好的临时文件放入缓存，并在超出上限时淘汰最久未访问的文件
+        
+        Returns:
+            缓存文件路径
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+        
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan()[1]
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep_path=path)
+        return path
+    
+    def _scan(self):
+        """扫描缓存目录，返回 ([(mtime, size, path)], 总大小)"""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+                total += stat.st_size
+        return entries, total
+    
+    def _evict(self, keep_path=None):
+        """淘汰最久未访问的文件，直到总大小降到上限的90%以下"""
+        entries, total = self._scan()
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, file_path in sorted(entries):
+            if total <= target:
+                break
+            if file_path == keep_path:
+                continue
+            try:
+                os.remove(file_path)
+                total -= size
+                removed += 1
+            except OSError as e:
+                logger.warning(f"淘汰缓存文件失败: {file_path}, 错误: {e}")
+        self._total_bytes = total
+        if removed:
+            logger.info(f"磁盘缓存淘汰 {removed} 个文件，当前大小: {total / 1024 / 1024:.1f}MB, 目录: {self.root_dir}")
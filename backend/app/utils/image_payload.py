@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+上传图片预处理
+按目标服务需要的分辨率缩放、重新编码并去除元数据，结果按图片内容哈希缓存在磁盘上，
+供美学评分、大模型打标等需要上传图片的客户端复用
+"""
+import os
+import logging
+import threading
+from typing import Callable, Optional
+from app.utils.config_manager import get_local_image_dir
+from app.utils.content_hash import compute_file_hash
+from app.utils.disk_lru_cache import DiskLruCache
+
+logger = logging.getLogger(__name__)
+
+# 支持的上传格式及对应的扩展名
+PAYLOAD_FORMATS = {
+    'JPEG': '.jpg',
+    'WEBP': '.webp'
+}
+
+class ImagePayloadPreprocessor:
+    """上传图片预处理：缩放、重新编码（不保留exif等元数据），结果按内容哈希缓存"""
+
+    def __init__(self, cache_name: str, max_side: int, fmt: str, quality: int,
+                 max_bytes_getter: Callable[[], int]):
+        """
+        Args:
+            cache_name: 缓存目录名（位于storage目录下）
+            max_side: 最长边像素，0表示不处理，直接上传原图
+            fmt: 编码格式（JPEG/WEBP）
+            quality: 编码质量
+            max_bytes_getter: 返回缓存大小上限（字节）的函数，首次使用缓存时调用
+        """
+        self.cache_name = cache_name
+        self.max_side = max_side
+        self.format = fmt.upper()
+        if self.format not in PAYLOAD_FORMATS:
+            logger.warning(f"不支持的上传格式: {self.format}，使用JPEG")
+            self.format = 'JPEG'
+        self.quality = quality
+        self._max_bytes_getter = max_bytes_getter
+        self._cache = None
+        self._cache_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_side > 0
+
+    @property
+    def version_tag(self) -> str:
+        """上传图片的处理参数标识（分辨率、格式、质量），参数改变后评分结果需要重新计算"""
+        if not self.enabled:
+            return 'original'
+        return f"{self.format}_{self.max_side}_q{self.quality}"
+
+    def _get_cache(self) -> DiskLruCache:
+        with self._cache_lock:
+            if self._cache is None:
+                base_dir = get_local_image_dir()
+                cache_dir = os.path.join(os.path.dirname(base_dir), 'storage', self.cache_name)
+                self._cache = DiskLruCache(cache_dir, self._max_bytes_getter())
+            return self._cache
+
+    def prepare(self, image_path: str, content_hash: Optional[str] = None) -> str:
+        """
+        获取上传用的图片路径；预处理失败或无需处理时返回原图路径
+
+        Args:
+            image_path: 原图路径
+            content_hash: 原图内容哈希，为空时计算
+        """
+        if not self.enabled:
+            return image_path
+        try:
+            from PIL import Image as PILImage, ImageOps
+
+            content_hash = content_hash or compute_file_hash(image_path)
+            if not content_hash:
+                return image_path
+
+            cache = self._get_cache()
+            cache_key = f"{content_hash[:2]}/{content_hash}_{self.max_side}_q{self.quality}{PAYLOAD_FORMATS[self.format]}"
+            cached_path = cache.get(cache_key)
+            if cached_path:
+                return cached_path
+
+            with PILImage.open(image_path) as img:
+                # 已经足够小的图片同样重新编码，原图可能带有exif（GPS位置等）元数据
+                # JPEG可在解码时直接按比例缩小
+                img.draft('RGB', (self.max_side, self.max_side))
+                # 去掉exif前先按方向信息旋转，避免丢失拍摄方向
+                img = ImageOps.exif_transpose(img).convert('RGB')
+                img.thumbnail((self.max_side, self.max_side), PILImage.LANCZOS)
+
+                temp_path = cache.temp_path_for(cache_key)
+                # 不传exif等元数据
+                img.save(temp_path, format=self.format, quality=self.quality)
+
+            return cache.put(cache_key, temp_path)
+        except Exception as e:
+            logger.warning(f"上传图片预处理失败，使用原图 {image_path}: {e}")
+            return image_path
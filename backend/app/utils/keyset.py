@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+按ID分批遍历查询结果（keyset分页）
+每批只查询 id > 上一批最大ID 的固定数量记录，内存占用与总数无关；
+遍历过程中可以提交事务，断点续跑时从记录的最后ID继续即可
+"""
+
+def iter_id_chunks(query, id_column, after_id=None, chunk_size=500):
+    """
+    按ID升序分批遍历查询结果
+    
+    Args:
+        query: 查询（不要带order_by/limit）
+        id_column: 用于分页的ID列，例如 Image.id
+        after_id: 从该ID之后开始（不含），None表示从头开始
+        chunk_size: 每批记录数
+    
+    Yields:
+        list: 一批记录
+    """
+    last_id = after_id
+    while True:
+        chunk_query = query
+        if last_id is not None:
+            chunk_query = chunk_query.filter(id_column > last_id)
+        rows = chunk_query.order_by(id_column).limit(chunk_size).all()
+        if not rows:
+            return
+        # 先记下本批最大ID，调用方处理过程中提交事务导致ORM对象过期也不会再次查询
+        last_id = getattr(rows[-1], id_column.key)
+        yield rows
+        if len(rows) < chunk_size:
+            return
+
+def iter_by_id(query, id_column, after_id=None, chunk_size=500):
+    """按ID升序逐条遍历查询结果（内部按iter_id_chunks分批读取）"""
+    for rows in iter_id_chunks(query, id_column, after_id, chunk_size):
+        for row in rows:
+            yield row
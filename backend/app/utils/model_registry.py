@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+进程内模型注册表
+每个模型在进程内只加载一次（首次使用时加载），加载失败也只尝试一次；
+提供预热和状态查询，推理时可按模型加锁，供多个线程共用同一份模型
+"""
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """进程内模型注册表（线程安全）"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._descriptions = {}
+        self._models = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._load_locks = {}
+        self._use_locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], object], description: str = ''):
+        """
+        注册模型加载函数
+
+        Args:
+            name: 模型名
+            loader: 无参加载函数，返回模型对象；返回None或抛出异常表示不可用
+            description: 模型说明
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._descriptions[name] = description
+            self._load_locks[name] = threading.Lock()
+            self._use_locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        """获取模型，首次调用时加载；不可用时返回None"""
+        if name in self._models:
+            return self._models[name]
+        with self._load_locks[name]:
+            if name not in self._models:
+                start = time.monotonic()
+                try:
+                    model = self._loaders[name]()
+                    self._errors.pop(name, None)
+                except Exception as e:
+                    logger.error(f"模型加载失败: {name}, error={e}", exc_info=True)
+                    model = None
+                    self._errors[name] = str(e)
+                self._load_seconds[name] = time.monotonic() - start
+                self._models[name] = model
+                if model is not None:
+                    logger.info(f"模型已加载: {name}, 耗时 {self._load_seconds[name]:.2f}s")
+            return self._models[name]
+
+    def lock(self, name: str) -> threading.Lock:
+        """模型推理锁（同一模型对象不支持多个线程同时推理时使用）"""
+        return self._use_locks[name]
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """预先加载模型（默认全部），返回各模型状态"""
+        for name in list(names if names is not None else self._loaders):
+            self.get(name)
+        return self.health()
+
+    def health(self) -> Dict[str, Dict]:
+        """
+        模型状态
+
+        Returns:
+            Dict: {name: {'description', 'loaded', 'available', 'error', 'load_seconds'}}
+        """
+        status = {}
+        for name in list(self._loaders):
+            loaded = name in self._models
+            status[name] = {
+                'description': self._descriptions.get(name, ''),
+                'loaded': loaded,
+                'available': loaded and self._models[name] is not None,
+                'error': self._errors.get(name),
+                'load_seconds': round(self._load_seconds[name], 3) if name in self._load_seconds else None
+            }
+        return status
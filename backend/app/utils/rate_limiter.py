@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+令牌桶限流器
+用于让多个并发调用方共享同一个外部API的调用配额（例如大模型接口的每分钟请求数）
+"""
+import threading
+import time
+from typing import Optional
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_second: 每秒补充的令牌数，<=0 表示不限流
+            capacity: 桶容量（允许的突发请求数），默认等于1秒的配额；不小于1，否则永远攒不够一个令牌
+        """
+        self.rate = rate_per_second
+        self.capacity = max(1.0, capacity if capacity is not None else rate_per_second)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: Optional[float] = None) -> 'TokenBucket':
+        """按每分钟请求数创建限流器"""
+        return cls(requests_per_minute / 60.0, burst)
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """尝试立即获取令牌，不阻塞"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        阻塞直到获取到令牌
+
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            bool: 是否获取成功（超时返回False）
+
+        Raises:
+            ValueError: 需要的令牌数超过桶容量，永远无法获取
+        """
+        if not self.enabled:
+            return True
+        if tokens > self.capacity:
+            raise ValueError(f"需要的令牌数 {tokens} 超过桶容量 {self.capacity}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+ArtiMuse美学评分服务的本地桩服务
+用于在没有真实评分服务时测试评分客户端和评分任务（并发、重试、熔断）
+
+用法:
+    python artimuse_stub_server.py [--port 5001] [--delay 0.5] [--failure-rate 0.1]
+"""
+import argparse
+import hashlib
+import random
+import time
+from flask import Flask, request, jsonify
+
+app = Flask(__name__)
+app.config['DELAY'] = 0.0
+app.config['FAILURE_RATE'] = 0.0
+
+def _fake_score(image_bytes):
+    """根据图片内容生成确定性的分数"""
+    digest = hashlib.md5(image_bytes).hexdigest()
+    return round(40 + int(digest[:8], 16) % 6000 / 100.0, 2)
+
+def _evaluate(with_reason):
+    if 'image' not in request.files:
+        return jsonify({'error': '缺少image字段'}), 400
+    
+    image_bytes = request.files['image'].read()
+    time.sleep(app.config['DELAY'])
+    if random.random() < app.config['FAILURE_RATE']:
+        return jsonify({'error': '模拟服务错误'}), 503
+    
+    result = {'score': _fake_score(image_bytes), 'size': len(image_bytes)}
+    if with_reason:
+        result['reason'] = '桩服务生成的评分理由'
+    return jsonify(result)
+
+@app.route('/api/evaluate', methods=['POST'])
+def evaluate():
+    return _evaluate(with_reason=True)
+
+@app.route('/api/evaluate_score', methods=['POST'])
+def evaluate_score():
+    return _evaluate(with_reason=False)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ArtiMuse桩服务')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--delay', type=float, default=0.5, help='每次评分的模拟耗时（秒）')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='返回503的概率')
+    args = parser.parse_args()
+    
+    app.config['DELAY'] = args.delay
+    app.config['FAILURE_RATE'] = args.failure_rate
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
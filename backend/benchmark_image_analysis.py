@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+图片检测性能基准测试脚本
+生成确定性的合成图片集（人脸、文字叠加、模糊、多人合成、普通图片，多种分辨率），
+分别计时解码、各检测器和完整的 analyze_image（全部检测 / 级联检测 / 只检测模糊），
+以JSON输出每项的吞吐（张/秒）、p50/p95延迟、峰值内存和每张图片的解码次数，便于在不同提交之间对比。
+不需要数据库。
+
+使用方法:
+    python benchmark_image_analysis.py                              输出到控制台
+    python benchmark_image_analysis.py --output bench.json          保存结果
+    python benchmark_image_analysis.py --compare bench.json         与之前的结果对比
+    python benchmark_image_analysis.py --sizes 640x480,4000x3000 --per-kind 3 --repeat 2
+"""
+import sys
+import os
+import json
+import time
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import Config
+from app.services.image_analysis_service import (
+    ImageAnalysisService, ImageAnalysisContext, DETECTOR_FEATURES, detector_registry, needs_full_resolution
+)
+
+# 合成图片类型
+CORPUS_KINDS = ('faces', 'text', 'blurred', 'multi_person', 'plain')
+DEFAULT_SIZES = '640x480,1920x1080,4000x3000'
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值内存（MB）"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t)
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+        )
+        return counters.PeakWorkingSetSize / 1024 / 1024
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS单位为字节，Linux为KB
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def _background(rng, width, height):
+    """带渐变和纹理的背景（避免纯色图片让检测器过早退出）"""
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    base = np.stack([80 + 100 * x + 0 * y, 120 + 60 * y + 0 * x, 90 + 50 * (x * y)], axis=-1)
+    noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+def _draw_face(img, cx, cy, r):
+    """卡通人脸：肤色椭圆、眼睛、眉毛、鼻子和嘴"""
+    cv2.ellipse(img, (cx, cy), (r, int(r * 1.25)), 0, 0, 360, (150, 180, 225), -1)
+    for dx in (-r // 2.5, r // 2.5):
+        ex = int(cx + dx)
+        cv2.ellipse(img, (ex, cy - r // 4), (r // 6, r // 10), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(img, (ex, cy - r // 4), max(2, r // 14), (40, 30, 20), -1)
+        cv2.line(img, (ex - r // 6, cy - r // 2), (ex + r // 6, cy - r // 2), (40, 40, 60), max(1, r // 20))
+    cv2.line(img, (cx, cy - r // 8), (cx, cy + r // 5), (110, 130, 180), max(1, r // 20))
+    cv2.ellipse(img, (cx, cy + r // 2), (r // 3, r // 8), 0, 0, 180, (60, 60, 160), max(1, r // 15))
+
+def _draw_person(img, cx, top, height):
+    """人物轮廓：头、躯干、手臂和腿"""
+    head = height // 8
+    color = (60, 70, 90)
+    cv2.circle(img, (cx, top + head), head, (150, 180, 225), -1)
+    body_top = top + head * 2
+    body_bottom = top + int(height * 0.6)
+    cv2.rectangle(img, (cx - head, body_top), (cx + head, body_bottom), color, -1)
+    thickness = max(2, head // 2)
+    cv2.line(img, (cx - head, body_top + head // 2), (cx - head * 2, body_bottom - head), color, thickness)
+    cv2.line(img, (cx + head, body_top + head // 2), (cx + head * 2, body_bottom - head), color, thickness)
+    cv2.line(img, (cx - head // 2, body_bottom), (cx - head, top + height), color, thickness)
+    cv2.line(img, (cx + head // 2, body_bottom), (cx + head, top + height), color, thickness)
+
+def _render(kind, rng, width, height):
+    img = _background(rng, width, height)
+    scale = min(width, height)
+    if kind == 'faces':
+        for _ in range(int(rng.integers(1, 4))):
+            r = int(scale * rng.uniform(0.08, 0.15))
+            _draw_face(img, int(rng.integers(r * 2, width - r * 2)), int(rng.integers(r * 2, height - r * 2)), r)
+    elif kind == 'text':
+        font_scale = scale / 400
+        thickness = max(1, int(font_scale * 2))
+        line_height = int(40 * font_scale)
+        for row in range(int(rng.integers(3, 8))):
+            words = ' '.join(''.join(chr(int(c)) for c in rng.integers(65, 91, int(rng.integers(3, 8))))
+                             for _ in range(4))
+            y = line_height * (row + 2)
+            if y >= height:
+                break
+            cv2.putText(img, words, (int(width * 0.05), y), cv2.FONT_HERSHEY_SIMPLEX, font_scale,
+                        (255, 255, 255), thickness, cv2.LINE_AA)
+    elif kind == 'blurred':
+        _draw_person(img, width // 2, int(height * 0.1), int(height * 0.8))
+        ksize = int(scale * 0.03) | 1
+        img = cv2.GaussianBlur(img, (ksize, ksize), 0)
+    elif kind == 'multi_person':
+        count = int(rng.integers(2, 5))
+        for i in range(count):
+            person_height = int(height * rng.uniform(0.5, 0.8))
+            cx = int(width * (i + 0.5) / count)
+            _draw_person(img, cx, int(rng.integers(0, height - person_height)), person_height)
+    return img
+
+def build_corpus(corpus_dir, sizes, per_kind, seed=20240101):
+    """
+    生成合成图片集（同样的参数生成同样的图片，已存在的文件不再重新生成）
+
+    Returns:
+        list: [{path, kind, width, height}]
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = []
+    for width, height in sizes:
+        for kind in CORPUS_KINDS:
+            for i in range(per_kind):
+                path = os.path.join(corpus_dir, f'{kind}_{width}x{height}_{i}.jpg')
+                if not os.path.exists(path):
+                    rng = np.random.default_rng([seed, width, height, CORPUS_KINDS.index(kind), i])
+                    cv2.imwrite(path, _render(kind, rng, width, height), [cv2.IMWRITE_JPEG_QUALITY, 90])
+                corpus.append({'path': path, 'kind': kind, 'width': width, 'height': height})
+    return corpus
+
+def _summarize(latencies, failed=0, decodes=None):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    total = float(latencies.sum())
+    stats = {
+        'images': int(len(latencies)),
+        'seconds': round(total, 4),
+        'images_per_sec': round(len(latencies) / total, 2) if total > 0 else None,
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 2) if len(latencies) else None,
+        'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 2) if len(latencies) else None,
+        'failed': failed,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+    if decodes is not None:
+        # 每张图片的解码次数，正常应为1，增加说明出现了重复解码
+        stats['decodes_per_image'] = round(decodes / len(latencies), 2) if len(latencies) else None
+    return stats
+
+def run_benchmark(corpus, repeat=1, max_side=None):
+    """
+    执行基准测试
+
+    Returns:
+        dict: {stage: 统计}，stage为 decode、detector:<name>、analyze_full、analyze_cascade、analyze_blur_only
+    """
+    if max_side is None:
+        max_side = Config.CLEANING_ANALYSIS_MAX_SIDE
+    service = ImageAnalysisService()
+    all_features = [f for features in DETECTOR_FEATURES.values() for f in features]
+    results = {}
+
+    # 解码（按分析分辨率）
+    latencies = []
+    for _ in range(repeat):
+        for item in corpus:
+            start = time.perf_counter()
+            ImageAnalysisContext(item['path'], max_side=max_side).bgr
+            latencies.append(time.perf_counter() - start)
+    results['decode'] = _summarize(latencies)
+
+    # 各检测器（不含解码）
+    for name in DETECTOR_FEATURES:
+        latencies = []
+        failed = 0
+        for _ in range(repeat):
+            for item in corpus:
+                context = ImageAnalysisContext(item['path'], max_side=max_side)
+                context.prepare(needs_full_resolution(name))
+                start = time.perf_counter()
+                service._compute_detector(name, item['path'], context)
+                latencies.append(time.perf_counter() - start)
+                failed += name in context.failed_detectors
+        results[f'detector:{name}'] = _summarize(latencies, failed)
+
+    # 完整分析（含解码），分别测全部检测、级联检测和只检测模糊（只需原图分辨率，应只解码一次）
+    stages = (
+        ('analyze_full', all_features, False),
+        ('analyze_cascade', all_features, True),
+        ('analyze_blur_only', list(DETECTOR_FEATURES['blur']), False),
+    )
+    for stage, features, stop_on_match in stages:
+        latencies = []
+        decodes = 0
+        for _ in range(repeat):
+            for item in corpus:
+                start = time.perf_counter()
+                context = ImageAnalysisContext(item['path'], max_side=max_side)
+                service.analyze_image(item['path'], features, stop_on_match=stop_on_match, context=context)
+                latencies.append(time.perf_counter() - start)
+                decodes += context.decode_count
+        results[stage] = _summarize(latencies, decodes=decodes)
+
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+def print_comparison(baseline, current):
+    """打印与之前结果的吞吐对比"""
+    print("=" * 80, file=sys.stderr)
+    print(f"对比: {baseline.get('meta', {}).get('git_commit')} -> {current['meta'].get('git_commit')}", file=sys.stderr)
+    print(f"{'阶段':<24}{'之前(张/秒)':>14}{'现在(张/秒)':>14}{'变化':>10}{'p95之前(ms)':>14}{'p95现在(ms)':>14}", file=sys.stderr)
+    for stage, stats in current['results'].items():
+        old = baseline.get('results', {}).get(stage)
+        if not old:
+            continue
+        old_ips, new_ips = old.get('images_per_sec'), stats.get('images_per_sec')
+        change = f"{(new_ips / old_ips - 1) * 100:+.1f}%" if old_ips and new_ips else 'N/A'
+        print(f"{stage:<24}{str(old_ips):>14}{str(new_ips):>14}{change:>10}{str(old.get('p95_ms')):>14}{str(stats.get('p95_ms')):>14}", file=sys.stderr)
+        old_decodes, new_decodes = old.get('decodes_per_image'), stats.get('decodes_per_image')
+        if old_decodes is not None and new_decodes is not None and new_decodes > old_decodes:
+            print(f"  警告: {stage} 每张图片解码次数 {old_decodes} -> {new_decodes}", file=sys.stderr)
+    print("=" * 80, file=sys.stderr)
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='图片检测性能基准测试')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'photo_platform_bench_corpus'),
+                        help='合成图片目录（已存在的图片直接复用）')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'图片分辨率列表（默认{DEFAULT_SIZES}）')
+    parser.add_argument('--per-kind', type=int, default=4, help='每种类型每种分辨率的图片数（默认4）')
+    parser.add_argument('--repeat', type=int, default=1, help='重复次数（默认1）')
+    parser.add_argument('--max-side', type=int, default=None,
+                        help='分析分辨率最长边（默认读取CLEANING_ANALYSIS_MAX_SIDE，0表示原图）')
+    parser.add_argument('--seed', type=int, default=20240101, help='合成图片的随机种子')
+    parser.add_argument('--output', help='结果JSON文件路径（默认输出到控制台）')
+    parser.add_argument('--compare', help='之前的结果JSON文件，打印吞吐对比')
+    args = parser.parse_args()
+
+    sizes = [tuple(int(v) for v in size.lower().split('x')) for size in args.sizes.split(',') if size.strip()]
+    corpus = build_corpus(args.corpus_dir, sizes, args.per_kind, args.seed)
+
+    # 预先加载检测模型，模型加载时间单独记录，不计入检测耗时
+    detectors = detector_registry.warm_up()
+
+    max_side = args.max_side if args.max_side is not None else Config.CLEANING_ANALYSIS_MAX_SIDE
+    results = run_benchmark(corpus, repeat=args.repeat, max_side=max_side)
+
+    report = {
+        'meta': {
+            'git_commit': _git_commit(),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'max_side': max_side,
+            'corpus': {
+                'dir': args.corpus_dir,
+                'sizes': [f'{w}x{h}' for w, h in sizes],
+                'kinds': list(CORPUS_KINDS),
+                'per_kind': args.per_kind,
+                'seed': args.seed,
+                'images': len(corpus)
+            },
+            'repeat': args.repeat,
+            'detectors': detectors
+        },
+        'results': results
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"结果已保存: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(json.load(f), report)
+
+if __name__ == '__main__':
+    # 确保控制台输出使用UTF-8
+    if sys.platform == 'win32':
+        try:
+            sys.stdout.reconfigure(encoding='utf-8')
+            sys.stderr.reconfigure(encoding='utf-8')
+        except:
+            pass
+    main()
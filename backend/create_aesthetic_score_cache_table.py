@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+创建美学评分缓存表
+"""
+import sys
+import os
+import pymysql
+from dotenv import load_dotenv
+
+# 修复Windows控制台编码问题
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# 加载环境变量
+load_dotenv()
+
+def create_table():
+    """创建表"""
+    connection = None
+    try:
+        # 连接数据库
+        connection = pymysql.connect(
+            host=os.getenv('MYSQL_HOST', 'localhost'),
+            port=int(os.getenv('MYSQL_PORT', 3306)),
+            user=os.getenv('MYSQL_USER', 'root'),
+            password=os.getenv('MYSQL_PASSWORD', ''),
+            database=os.getenv('MYSQL_DATABASE', 'photo_platform'),
+            charset='utf8mb4'
+        )
+        
+        with connection.cursor() as cursor:
+            # 创建表
+            sql = """
+            CREATE TABLE IF NOT EXISTS `aesthetic_score_cache` (
+                `id` INT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                `content_hash` VARCHAR(64) NOT NULL COMMENT '图片内容哈希值（SHA256）',
+                `evaluator_type` VARCHAR(50) NOT NULL COMMENT '评分器类型：artimuse, q_insight',
+                `score_mode` VARCHAR(50) NOT NULL COMMENT '评分模式：score_only, score_and_reason',
+                `scorer_version` VARCHAR(50) NOT NULL COMMENT '评分器版本',
+                `score` DECIMAL(10, 4) COMMENT '美学评分分数',
+                `details_json` TEXT COMMENT '接口返回的详细信息JSON',
+                `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+                CONSTRAINT `uk_content_evaluator_mode_version` UNIQUE (`content_hash`, `evaluator_type`, `score_mode`, `scorer_version`)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='美学评分缓存表';
+            """
+            
+            cursor.execute(sql)
+            connection.commit()
+            print("✓ 表 `aesthetic_score_cache` 创建成功")
+            
+    except Exception as e:
+        print(f"✗ 创建表失败: {e}")
+        raise
+    finally:
+        if connection:
+            connection.close()
+
+if __name__ == '__main__':
+    print("开始创建美学评分缓存表...")
+    create_table()
+    print("完成！")
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+创建图片检测器结果缓存表
+"""
+import sys
+import os
+import pymysql
+from dotenv import load_dotenv
+
+# 修复Windows控制台编码问题
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# 加载环境变量
+load_dotenv()
+
+def create_table():
+    """创建表"""
+    connection = None
+    try:
+        # 连接数据库
+        connection = pymysql.connect(
+            host=os.getenv('MYSQL_HOST', 'localhost'),
+            port=int(os.getenv('MYSQL_PORT', 3306)),
+            user=os.getenv('MYSQL_USER', 'root'),
+            password=os.getenv('MYSQL_PASSWORD', ''),
+            database=os.getenv('MYSQL_DATABASE', 'photo_platform'),
+            charset='utf8mb4'
+        )
+        
+        with connection.cursor() as cursor:
+            # 创建表
+            sql = """
+            CREATE TABLE IF NOT EXISTS `image_detector_results` (
+                `id` INT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                `image_hash` VARCHAR(64) NOT NULL COMMENT '图片内容哈希值（SHA256）',
+                `detector` VARCHAR(50) NOT NULL COMMENT '检测器：face, person, text, blur',
+                `detector_version` VARCHAR(50) NOT NULL COMMENT '检测器算法版本',
+                `params_hash` VARCHAR(64) NOT NULL COMMENT '检测参数哈希值（SHA256）',
+                `params_json` TEXT COMMENT '检测参数JSON',
+                `result_json` TEXT NOT NULL COMMENT '检测原始结果JSON（数量、位置、分数等）',
+                `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+                CONSTRAINT `uk_hash_detector_version_params` UNIQUE (`image_hash`, `detector`, `detector_version`, `params_hash`)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='图片检测器结果缓存表';
+            """
+            
+            cursor.execute(sql)
+            connection.commit()
+            print("✓ 表 `image_detector_results` 创建成功")
+            
+    except Exception as e:
+        print(f"✗ 创建表失败: {e}")
+        raise
+    finally:
+        if connection:
+            connection.close()
+
+if __name__ == '__main__':
+    print("开始创建图片检测器结果缓存表...")
+    create_table()
+    print("完成！")
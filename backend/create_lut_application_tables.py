@@ -62,6 +62,7 @@ def create_tables():
                 `width` INT COMMENT '图片宽度',
                 `height` INT COMMENT '图片高度',
                 `format` VARCHAR(20) COMMENT '图片格式',
+                `is_lazy` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否懒加载（首次访问时渲染并放入磁盘缓存）',
                 `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
                 KEY `idx_lut_application_id` (`lut_application_id`),
                 KEY `idx_lut_file_id` (`lut_file_id`),
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+OpenAI兼容的大模型本地桩服务
+用于在不消耗真实API配额的情况下测试图片打标（并发、限流、中断续跑）
+
+用法:
+    python openai_stub_server.py [--port 5002] [--delay 1.0] [--failure-rate 0.1] [--drop-rate 0.1]
+    然后设置环境变量 DASHSCOPE_BASE_URL=http://127.0.0.1:5002/v1 再启动后端
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from flask import Flask, request, jsonify
+
+app = Flask(__name__)
+app.config['DELAY'] = 0.0
+app.config['FAILURE_RATE'] = 0.0
+app.config['DROP_RATE'] = 0.0
+
+_stats_lock = threading.Lock()
+_stats = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+# prompt中输出格式的字段行，例如: "光线": "对应的值",
+FIELD_PATTERN = re.compile(r'"([^"]+)":\s*"对应的值"')
+# prompt中特征描述行，例如: - 光线：描述，可选值包括：顺光, 逆光
+VALUES_PATTERN = re.compile(r'^- ([^：，\n]+)(?:：.*?)?(?:，可选值包括：(.+))?$', re.MULTILINE)
+
+def _fake_value(seed, name, options):
+    """根据图片内容和特征名生成确定性的特征值"""
+    digest = int(hashlib.md5(f'{seed}:{name}'.encode('utf-8')).hexdigest()[:8], 16)
+    if options:
+        return options[digest % len(options)]
+    return f'{name}_{digest % 10}'
+
+def _build_content(messages):
+    """从请求消息中提取图片和prompt，生成JSON格式的回答"""
+    image_urls = []
+    prompt = ''
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            prompt += content
+            continue
+        for part in content or []:
+            if part.get('type') == 'image_url':
+                image_urls.append(part['image_url']['url'])
+            elif part.get('type') == 'text':
+                prompt += part.get('text', '')
+
+    options = {}
+    for name, values in VALUES_PATTERN.findall(prompt):
+        options[name.strip()] = [v.strip() for v in values.split(',')] if values else []
+    fields = FIELD_PATTERN.findall(prompt)
+
+    def fake_result(image_url):
+        seed = hashlib.md5(image_url.encode('utf-8')).hexdigest()
+        return {name: _fake_value(seed, name, options.get(name)) for name in fields}
+
+    # 多图批量打标：按图片顺序返回results数组，按DROP_RATE模拟缺失的结果
+    if '"results"' in prompt:
+        results = []
+        for i, image_url in enumerate(image_urls, start=1):
+            if random.random() < app.config['DROP_RATE']:
+                continue
+            results.append({'index': i, **fake_result(image_url)})
+        return {'results': results}
+    return fake_result(''.join(image_urls))
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.get_json(silent=True) or {}
+    with _stats_lock:
+        _stats['requests'] += 1
+        _stats['in_flight'] += 1
+        _stats['max_in_flight'] = max(_stats['max_in_flight'], _stats['in_flight'])
+    try:
+        time.sleep(app.config['DELAY'])
+        if random.random() < app.config['FAILURE_RATE']:
+            return jsonify({'error': {'message': '模拟服务错误', 'type': 'server_error'}}), 503
+
+        content = json.dumps(_build_content(data.get('messages', [])), ensure_ascii=False)
+        return jsonify({
+            'id': f'chatcmpl-stub-{random.getrandbits(32):08x}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': data.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        })
+    finally:
+        with _stats_lock:
+            _stats['in_flight'] -= 1
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """查看请求总数和最大并发数"""
+    with _stats_lock:
+        return jsonify(dict(_stats))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='OpenAI兼容的大模型桩服务')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--delay', type=float, default=1.0, help='每次请求的模拟耗时（秒）')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='返回503的概率')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='批量请求中单张图片结果缺失的概率')
+    args = parser.parse_args()
+
+    app.config['DELAY'] = args.delay
+    app.config['FAILURE_RATE'] = args.failure_rate
+    app.config['DROP_RATE'] = args.drop_rate
+    app.run(host='127.0.0.1', port=args.port, threaded=True)